@@ -24,20 +24,14 @@ def main():
     yane.set_max_generations(100)
     yane.set_min_fitness(length)
 
-    def evaluate(genome: Genome):
-        fitness = 0
-
-        for row in mnist_data:
-            label = row[0]
-            pixels = row[1:]
+    labels = mnist_data[:, 0]
+    pixels = mnist_data[:, 1:]
 
-            outputs = genome.forward_propagation(pixels, True)
-            result = np.argmax(outputs)
+    def evaluate(genome: Genome):
+        outputs = genome.forward_propagation_batch(pixels, chunk_size=10000, start_backwards=True)
+        results = np.argmax(outputs, axis=1)
 
-            if result == label:
-                fitness += 1
-                
-        return fitness
+        return int(np.sum(results == labels))
 
     yane.train(evaluate)
 
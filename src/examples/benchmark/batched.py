@@ -0,0 +1,66 @@
+import time
+
+import numpy as np
+
+from src.neural_network import YaneConfig
+from src.neural_network.NeuroEvolution import NeuroEvolution
+from src.neural_network.ParallelEvaluator import get_process_context
+
+# Run from the repository root: python -m src.examples.benchmark.batched
+# Trains XOR once with an evaluation function per genome and once with a batch evaluation function that scores all
+# children of a training step with one forward propagation of their CompiledPopulation. Both calculate the same
+# fitness values, so both trainings breed the same genomes. Every XOR sample is repeated, like a larger dataset.
+
+generations = 20
+repeats = 256
+dataset = [([0, 0], 0), ([0, 1], 1), ([1, 0], 1), ([1, 1], 0)]
+data_inputs = np.tile(np.array([data_input for data_input, _ in dataset], dtype=np.float64), (repeats, 1))
+target_outputs = np.tile(np.array([target_output for _, target_output in dataset], dtype=np.float64), repeats)
+
+yane_config = YaneConfig.load_json_config()
+
+
+def evaluate(genome):
+    outputs = genome.forward_propagation_batch(data_inputs)
+    return -np.abs(outputs[:, 0] - target_outputs).sum()
+
+
+def evaluate_batch(compiled_population):
+    outputs = compiled_population.forward_propagation_batch(data_inputs)
+    return -np.abs(outputs[:, :, 0] - target_outputs).sum(axis=1)
+
+
+def run_training(batched, results):
+    yane = NeuroEvolution()
+    yane.set_seed(0)
+    yane.set_number_of_outputs(1)
+    yane.set_max_generations(generations)
+
+    start = time.perf_counter()
+    if batched:
+        yane.train_batched(evaluate_batch, compiled=True)
+    else:
+        yane.train(evaluate)
+    duration = time.perf_counter() - start
+
+    evaluations = yane.get_generation() * YaneConfig.get_max_population_size(yane_config)
+    results.put((duration, evaluations, yane.get_best_fitness()))
+
+
+def main():
+    context = get_process_context()
+
+    for name, batched in [("Per genome", False), ("Batched", True)]:
+        # Every training in a new process, because the input positions of the nodes are counted per process
+        results = context.Queue()
+        process = context.Process(target=run_training, args=(batched, results))
+        process.start()
+        duration, evaluations, best_fitness = results.get()
+        process.join()
+
+        print(name.ljust(16) + str(round(duration, 2)) + " s  " + str(round(evaluations / duration, 1)) +
+              " evaluations/s  best fitness: " + str(best_fitness))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+import random
+
+import numpy as np
+
+# Genomes for the benchmarks and the tests
+
+
+def create_genomes(genome_class, genome_size, input_size, output_size, mutations=3):
+    '''
+    Every genome is a mutated copy of an earlier one, so the genomes are related like in a population
+    :param genome_class: Genome or CompactGenome
+    :param mutations: Number of mutations of every copy
+    '''
+    random.seed(0)
+    genome = genome_class(random_generator=np.random.default_rng(0))
+    genome.set_number_of_outputs(output_size)
+    genome.add_missing_input_nodes(input_size)
+
+    genomes = [genome]
+
+    while len(genomes) < genome_size:
+        child = random.choice(genomes).copy()
+
+        for _ in range(mutations):
+            child.mutate()
+
+        genomes.append(child)
+
+    return genomes
+
+
+def create_query(genomes):
+    '''
+    :return: Mutated copy of a random genome, like a new child
+    '''
+    child = random.choice(genomes).copy()
+    child.mutate()
+    return child
@@ -0,0 +1,58 @@
+import time
+
+import numpy as np
+
+from src.neural_network.Genome import Genome
+
+# Run from the repository root: python -m src.examples.benchmark.latency
+
+input_size = 8
+output_size = 2
+mutations = 300
+calls = 5000
+
+
+def create_genome():
+    genome = Genome(random_generator=np.random.default_rng(0))
+    genome.set_number_of_outputs(output_size)
+    genome.forward_propagation([0.0] * input_size)
+
+    for _ in range(mutations):
+        genome.mutate()
+
+    return genome
+
+
+def measure(name, call):
+    states = np.random.default_rng(0).uniform(-1, 1, (calls, input_size))
+    latencies = np.empty(calls, dtype=np.int64)
+
+    for i in range(calls):
+        state = states[i]
+        start = time.perf_counter_ns()
+        call(state)
+        latencies[i] = time.perf_counter_ns() - start
+
+    print(name.ljust(40) + " p50: " + str(np.round(np.percentile(latencies, 50) / 1000, 2)) + " us  p99: " + str(
+        np.round(np.percentile(latencies, 99) / 1000, 2)) + " us")
+
+
+def main():
+    genome = create_genome()
+    print("Nodes: " + str(len(genome.get_all_nodes())) + " Connections: " + str(len(genome.get_all_connections())))
+
+    handle = genome.compile_for_latency()
+    outputs = np.empty(handle.get_output_size())
+
+    measure("tick(list(state))", lambda state: genome.tick(list(state)))
+    measure("tick(list(state), compiled=True)", lambda state: genome.tick(list(state), compiled=True))
+    measure("handle.tick(state, out)", lambda state: handle.tick(state, outputs))
+
+    measure("forward_propagation(list(state))", lambda state: genome.forward_propagation(list(state)))
+    measure("forward_propagation(state, compiled=True)",
+            lambda state: genome.forward_propagation(state, compiled=True))
+    measure("handle.forward_propagation(state, out)", lambda state: handle.forward_propagation(state, outputs))
+
+
+if __name__ == '__main__':
+    main()
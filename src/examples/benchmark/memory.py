@@ -0,0 +1,63 @@
+import gc
+import time
+import tracemalloc
+
+import numpy as np
+
+from src.neural_network.CompactGenome import CompactGenome
+from src.neural_network.Genome import Genome
+
+# Run from the repository root: python -m src.examples.benchmark.memory
+
+input_size = 16
+output_size = 4
+min_connections = 200
+copies = 500
+
+
+def create_genome():
+    genome = Genome(random_generator=np.random.default_rng(0))
+    genome.set_number_of_outputs(output_size)
+    genome.add_missing_input_nodes(input_size)
+
+    while len(genome.get_all_connections()) < min_connections:
+        genome = genome.copy()
+        genome.mutate()
+
+    return genome
+
+
+def measure_memory(genome):
+    gc.collect()
+    tracemalloc.start()
+    genome_copies = [genome.copy() for _ in range(copies)]
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    del genome_copies
+    return memory / copies
+
+
+def measure_copy_time(genome):
+    start = time.perf_counter()
+
+    for _ in range(copies):
+        genome.copy()
+
+    return (time.perf_counter() - start) / copies
+
+
+def main():
+    genome = create_genome()
+    compact_genome = CompactGenome.from_genome(genome)
+    print("Nodes: " + str(compact_genome.get_node_size()) + " Connections: " + str(
+        compact_genome.get_connection_size()))
+
+    for name, current_genome in [("Genome", genome), ("CompactGenome", compact_genome)]:
+        memory = measure_memory(current_genome) / 1024
+        copy_time = measure_copy_time(current_genome) * 1e6
+        print(name.ljust(15) + " memory: " + str(round(memory, 1)) + " KiB  copy: " + str(round(copy_time, 1)) + " us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import time
+
+from src.neural_network import YaneConfig
+from src.neural_network.EvolutionServer import EvolutionServer
+from src.neural_network.EvolutionWorker import EvolutionWorker
+from src.neural_network.NeuroEvolution import NeuroEvolution
+from src.neural_network.ParallelEvaluator import get_process_context
+from src.neural_network.TaskScheduler import REPRODUCE, MUTATE, EVALUATE, SPECIATE
+
+# Run from the repository root: python -m src.examples.benchmark.scheduler
+# Trains XOR with local workers that can only do a part of the tasks. The server itself cannot evaluate, so every
+# generation needs the evaluate workers. The evaluation sleeps like a fitness function that waits for a simulator.
+
+evaluation_delay = 0.005
+generations = 1
+dataset = [([0, 0], 0), ([0, 1], 1), ([1, 0], 1), ([1, 1], 0)]
+
+yane_config = YaneConfig.load_json_config()
+
+# Name, then (number of workers, capabilities) of every kind of worker
+setups = [
+    ("1 evaluator, 1 breeder", [(1, [EVALUATE]), (1, [REPRODUCE, MUTATE])]),
+    ("1 evaluator", [(1, [EVALUATE])]),
+    ("2 evaluators", [(2, [EVALUATE])]),
+    ("4 evaluators", [(4, [EVALUATE])]),
+    ("4 evaluators, 1 speciator", [(4, [EVALUATE]), (1, [SPECIATE])]),
+]
+
+
+def evaluate(genome):
+    fitness = 0.0
+    for data_input, target_output in dataset:
+        genome.forward_propagation(data_input)
+        fitness -= abs(genome.get_outputs()[0] - target_output)
+
+    time.sleep(evaluation_delay)
+    return fitness
+
+
+def run_setup(workers, results):
+    yane = NeuroEvolution()
+    yane.set_seed(0)
+    yane.set_number_of_outputs(1)
+    yane.set_max_generations(generations)
+
+    with EvolutionServer(yane) as server:
+        processes = []
+        for size, capabilities in workers:
+            processes += EvolutionWorker.start_processes(evaluate, server.get_address(), size, 4, capabilities)
+
+        start = time.perf_counter()
+        server.train()
+        duration = time.perf_counter() - start
+
+    for process in processes:
+        process.join()
+
+    evaluations = yane.get_generation() * YaneConfig.get_max_population_size(yane_config)
+    results.put((duration, evaluations, yane.get_best_fitness()))
+
+
+def main():
+    context = get_process_context()
+
+    for name, workers in setups:
+        # Every setup in a new process, because the input positions of the nodes are counted per process
+        results = context.Queue()
+        process = context.Process(target=run_setup, args=(workers, results))
+        process.start()
+        duration, evaluations, best_fitness = results.get()
+        process.join()
+
+        print(name.ljust(28) + str(round(duration, 2)) + " s  " + str(round(evaluations / duration, 1)) +
+              " evaluations/s  best fitness: " + str(best_fitness))
+
+
+if __name__ == '__main__':
+    main()
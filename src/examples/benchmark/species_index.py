@@ -0,0 +1,87 @@
+import random
+import time
+
+from src.examples.benchmark.genomes import create_genomes, create_query
+from src.neural_network.CompactGenome import CompactGenome
+from src.neural_network.Population import Population
+from src.neural_network.SpeciesIndex import SpeciesIndex
+
+# Run from the repository root: python -m src.examples.benchmark.species_index
+# Compares the species that the species index finds with the species of an exact scan over all species.
+
+input_size = 8
+output_size = 2
+genome_size = 3000
+species_size = 500
+queries = 500
+compatibility_threshold = 5
+
+
+def main():
+    genomes = create_genomes(CompactGenome, genome_size, input_size, output_size)
+    population = Population()
+    population.compatibility_threshold = compatibility_threshold
+
+    representatives = random.sample(genomes, species_size)
+
+    for genome in representatives:
+        genome.set_fitness(0)
+        genome.set_net_cost(genome.calculate_net_cost())
+        population.add_species(genome)
+
+    # Like in training, most new genomes are children of a species, some are not
+    query_genomes = [create_query(representatives if random.random() < 0.8 else genomes) for _ in range(queries)]
+
+    start = time.perf_counter()
+    exact_results = [population.get_best_compatible_species_of(genome, population.get_species()) for genome in
+                     query_genomes]
+    exact_time = (time.perf_counter() - start) / queries
+
+    print("Species: " + str(species_size) + " Queries: " + str(queries))
+    print("Exact scan".ljust(32) + str(round(exact_time * 1e6, 1)) + " us")
+
+    for name, exact_fallback in [("Species index", True), ("Species index without fallback", False)]:
+        population.set_species_index(SpeciesIndex(exact_fallback=exact_fallback))
+        start = time.perf_counter()
+        index_results = [population.get_best_compatible_species(genome) for genome in query_genomes]
+        index_time = (time.perf_counter() - start) / queries
+
+        same_species, compatible, compatible_found, max_gap = compare(exact_results, index_results)
+
+        print(name.ljust(32) + str(round(index_time * 1e6, 1)) + " us  compatible species found: " + str(
+            compatible_found) + "/" + str(compatible) + "  same species: " + str(same_species) + "/" + str(
+            compatible) + "  largest compatibility difference: " + str(round(max_gap, 3)))
+
+        # With the fallback the index may pick a slightly worse species, but never misses a compatible species
+        if exact_fallback:
+            assert compatible_found == compatible
+
+        assert max_gap <= compatibility_threshold
+
+
+def compare(exact_results, index_results):
+    '''
+    Only counts queries that are compatible to at least one species. All other queries create a new species anyway
+    '''
+    same_species = 0
+    compatible = 0
+    compatible_found = 0
+    max_gap = 0
+
+    for (exact_species, exact_compatibility), (index_species, index_compatibility) in zip(exact_results,
+                                                                                          index_results):
+        if exact_compatibility > compatibility_threshold:
+            continue
+
+        compatible += 1
+        same_species += exact_species is index_species
+
+        if index_species is not None and index_compatibility <= compatibility_threshold:
+            compatible_found += 1
+            max_gap = max(max_gap, index_compatibility - exact_compatibility)
+
+    return same_species, compatible, compatible_found, max_gap
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import random
+import time
+
+from src.neural_network import YaneConfig
+from src.neural_network.NeuroEvolution import NeuroEvolution
+from src.neural_network.ParallelEvaluator import get_process_context
+
+# Run from the repository root: python -m src.examples.benchmark.steady_state
+# Trains XOR with an evaluation that sleeps between 2 and 20 ms, like episodes of very different length. Compares
+# the batch training, which waits for the slowest genome of every batch, with the steady state training.
+
+workers = 4
+generations = 2
+min_delay = 0.002
+max_delay = 0.02
+dataset = [([0, 0], 0), ([0, 1], 1), ([1, 0], 1), ([1, 1], 0)]
+
+yane_config = YaneConfig.load_json_config()
+
+
+def evaluate(genome):
+    fitness = 0.0
+    for data_input, target_output in dataset:
+        genome.forward_propagation(data_input)
+        fitness -= abs(genome.get_outputs()[0] - target_output)
+
+    time.sleep(random.uniform(min_delay, max_delay))
+    return fitness
+
+
+def run_training(steady_state, results):
+    yane = NeuroEvolution()
+    yane.set_seed(0)
+    yane.set_number_of_outputs(1)
+    yane.set_max_generations(generations)
+
+    start = time.perf_counter()
+    if steady_state:
+        yane.train_steady_state(evaluate, workers)
+    else:
+        yane.train(evaluate, workers)
+    duration = time.perf_counter() - start
+
+    evaluations = yane.get_generation() * YaneConfig.get_max_population_size(yane_config)
+    results.put((duration, evaluations, yane.get_best_fitness()))
+
+
+def main():
+    context = get_process_context()
+    average_delay = (min_delay + max_delay) / 2
+
+    for name, steady_state in [("Batches", False), ("Steady state", True)]:
+        # Every training in a new process, because the input positions of the nodes are counted per process
+        results = context.Queue()
+        process = context.Process(target=run_training, args=(steady_state, results))
+        process.start()
+        duration, evaluations, best_fitness = results.get()
+        process.join()
+
+        # Part of the time that the workers spend in the evaluation function
+        utilization = evaluations * average_delay / (duration * workers)
+
+        print(name.ljust(16) + str(round(duration, 2)) + " s  " + str(round(evaluations / duration, 1)) +
+              " evaluations/s  worker utilization: " + str(round(100 * utilization)) + "%  best fitness: " +
+              str(best_fitness))
+
+
+if __name__ == '__main__':
+    main()
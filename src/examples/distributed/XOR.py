@@ -0,0 +1,58 @@
+import sys
+
+import numpy as np
+
+from src.neural_network.EvolutionServer import EvolutionServer
+from src.neural_network.EvolutionWorker import EvolutionWorker
+from src.neural_network.Genome import Genome
+from src.neural_network.NeuroEvolution import NeuroEvolution
+
+# Run from the repository root:
+#   python -m src.examples.distributed.XOR                   server with 4 local workers
+#   python -m src.examples.distributed.XOR server            server only, waits for local workers on port 5555
+#   python -m src.examples.distributed.XOR server BIND_HOST  server only, e.g. 0.0.0.0 for workers on other machines
+#   python -m src.examples.distributed.XOR worker HOST       worker for the server on HOST
+# Messages are pickled, so everyone who can connect to the server can run code on it. Only bind to other hosts than
+# localhost in a trusted network.
+
+port = 5555
+
+dataset = [
+    {'input': [0, 0], 'output': [0]},
+    {'input': [0, 1], 'output': [1]},
+    {'input': [1, 0], 'output': [1]},
+    {'input': [1, 1], 'output': [0]},
+]
+
+
+def evaluate(genome: Genome):
+    fitness = 0.0
+    for sample in dataset:
+        genome.forward_propagation(sample['input'])
+        fitness -= np.abs(genome.get_outputs()[0] - sample['output'][0])
+
+    return fitness
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == 'worker':
+        EvolutionWorker(evaluate, (sys.argv[2], port)).run()
+        return
+
+    yane = NeuroEvolution()
+    yane.set_min_fitness(0)
+    yane.set_number_of_outputs(1)
+
+    host = sys.argv[2] if len(sys.argv) > 2 and sys.argv[1] == 'server' else 'localhost'
+
+    with EvolutionServer(yane, (host, port)) as server:
+        if len(sys.argv) > 1 and sys.argv[1] == 'server':
+            server.train()
+        else:
+            server.train(evaluate, local_workers=4)
+
+    yane.print()
+
+
+if __name__ == '__main__':
+    main()
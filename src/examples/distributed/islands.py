@@ -0,0 +1,41 @@
+import numpy as np
+
+from src.neural_network.Genome import Genome
+from src.neural_network.IslandModel import IslandModel, RING
+
+# Run from the repository root: python -m src.examples.distributed.islands
+# Evolves XOR on 4 islands, one process each, that exchange their 2 best genomes every 5 generations.
+
+dataset = [
+    {'input': [0, 0], 'output': [0]},
+    {'input': [0, 1], 'output': [1]},
+    {'input': [1, 0], 'output': [1]},
+    {'input': [1, 1], 'output': [0]},
+]
+
+
+def evaluate(genome: Genome):
+    fitness = 0.0
+    for sample in dataset:
+        genome.forward_propagation(sample['input'])
+        fitness -= np.abs(genome.get_outputs()[0] - sample['output'][0])
+
+    return fitness
+
+
+def main():
+    islands = IslandModel(islands=4, migration_interval=5, migration_size=2, topology=RING)
+    islands.set_min_fitness(-0.01)
+    islands.set_max_generations(500)
+
+    best_genome = islands.train(evaluate, 1)
+
+    for island_index, genome, generation in islands.get_island_results():
+        print("Island: " + str(island_index) + " Generation: " + str(np.round(generation)) + " Best fitness: " + str(
+            None if genome is None else genome.get_fitness()))
+
+    print("Best fitness of all islands: " + str(best_genome.get_fitness()))
+
+
+if __name__ == '__main__':
+    main()
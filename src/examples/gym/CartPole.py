@@ -20,7 +20,7 @@ def main():
         while not done:
             input_data = list(state)
 
-            outputs = genome.tick(input_data)
+            outputs = genome.tick(input_data, compiled=True)
             action = np.argmax(outputs)
 
             state, reward, done, _, _ = env.step(action)
@@ -48,7 +48,7 @@ def main():
     while not done:
         input_data = list(state)
 
-        outputs = best_genome.tick(input_data)
+        outputs = best_genome.tick(input_data, compiled=True)
         action = np.argmax(outputs)
 
         state, reward, done, _, _ = env.step(action)
@@ -46,6 +46,44 @@ class ActivationFunction(str, Enum):
         else:
             raise Exception("Activation function not found")
 
+    @classmethod
+    def activate_array(cls, activation_function, values, out=None):
+        '''
+        Same as activate, but works element wise on numpy arrays
+        :param out: Optional array the result is written to. Avoids allocating a new array
+        '''
+        if out is None:
+            if activation_function == cls.BINARY:
+                return np.where(values >= YaneConfig.get_binary_threshold(yane_config), 1.0, 0.0)
+
+            return cls.activate(activation_function, values)
+
+        if activation_function == cls.LINEAR:
+            np.copyto(out, values)
+        elif activation_function == cls.SIGMOID:
+            np.negative(values, out=out)
+            np.exp(out, out=out)
+            np.add(out, 1.0, out=out)
+            np.reciprocal(out, out=out)
+        elif activation_function == cls.TANH:
+            np.tanh(values, out=out)
+        elif activation_function == cls.RELU:
+            np.maximum(values, 0.0, out=out)
+        elif activation_function == cls.BINARY:
+            np.greater_equal(values, YaneConfig.get_binary_threshold(yane_config), out=out)
+        else:
+            raise Exception("Activation function not found")
+
+        return out
+
+    @classmethod
+    def get_code(cls, activation_function) -> int:
+        return ACTIVATION_CODES.index(activation_function)
+
+    @classmethod
+    def get_function_by_code(cls, code):
+        return ACTIVATION_CODES[code]
+
     @classmethod
     def linear(cls, value):
         return value
@@ -68,3 +106,6 @@ class ActivationFunction(str, Enum):
             return 1
         else:
             return 0
+
+
+ACTIVATION_CODES = list(ActivationFunction)
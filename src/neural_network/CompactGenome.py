@@ -0,0 +1,618 @@
+import numpy as np
+
+from src.neural_network import YaneConfig, InnovationIds
+from src.neural_network.ActivationFunction import ActivationFunction
+from src.neural_network.CompiledNetwork import CompiledNetwork
+from src.neural_network.Connection import Connection
+from src.neural_network.Genome import Genome
+from src.neural_network.GenomeSignature import GenomeSignature
+from src.neural_network.NeuralNetwork import NeuralNetwork
+from src.neural_network.Node import Node
+from src.neural_network.NodeTypes import NodeTypes
+from src.neural_network.exceptions.InvalidConnection import InvalidConnection
+from src.neural_network.exceptions.InvalidNode import InvalidNode
+
+yane_config = YaneConfig.load_json_config()
+
+NODE_TYPES = [NodeTypes.INPUT, NodeTypes.HIDDEN, NodeTypes.OUTPUT]
+INPUT = NODE_TYPES.index(NodeTypes.INPUT)
+HIDDEN = NODE_TYPES.index(NodeTypes.HIDDEN)
+OUTPUT = NODE_TYPES.index(NodeTypes.OUTPUT)
+
+
+class CompactGenome(Genome):
+    '''
+    Genome that stores its genes in typed numpy arrays instead of node and connection objects.
+
+    Nodes and connections are sorted by id. Connections reference their nodes by index. The genome uses much less
+    memory than a Genome and copying it only copies a few arrays. Mutation, crossover, compatibility and forward
+    propagation work directly on the arrays. get_brain builds a NeuralNetwork from the arrays for everything else,
+    e.g. tick or plot. This neural network is only a view and is built again after the genome changed.
+    '''
+
+    def __init__(self, node_genes=None, random_generator: np.random.Generator = None):
+        self.node_ids = np.zeros(0, dtype=np.int64)
+        self.node_types = np.zeros(0, dtype=np.int8)
+        self.activation_codes = np.zeros(0, dtype=np.int8)
+        self.input_positions = np.zeros(0, dtype=np.int64)
+        self.node_orders = np.zeros(0, dtype=np.int64)
+        self.next_node_order = 0
+
+        self.connection_ids = np.zeros(0, dtype=np.int64)
+        self.connection_in = np.zeros(0, dtype=np.int32)
+        self.connection_out = np.zeros(0, dtype=np.int32)
+        self.weights = np.zeros(0, dtype=np.float64)
+        self.shift_directions = np.zeros(0, dtype=bool)
+        self.recurrent = np.zeros(0, dtype=bool)
+
+        self.dag_only = YaneConfig.get_dag_only(yane_config)
+        self.last_weight_shift_connection = None
+        self.compiled_networks = {}
+        self.outputs = []
+
+        super().__init__(node_genes, random_generator)
+
+    @classmethod
+    def from_genome(cls, genome: Genome) -> 'CompactGenome':
+        brain = genome.get_brain()
+        nodes = sorted(brain.get_all_nodes(), key=lambda node: node.get_id())
+        connections = brain.get_all_connections()
+        positions = {node: index for index, node in enumerate(nodes)}
+
+        compact_genome = cls(random_generator=genome.get_random_generator())
+        compact_genome.node_ids = np.array([node.get_id() for node in nodes], dtype=np.int64)
+        compact_genome.node_types = np.array([NODE_TYPES.index(node.type) for node in nodes], dtype=np.int8)
+        compact_genome.activation_codes = np.array(
+            [ActivationFunction.get_code(node.get_activation()) for node in nodes], dtype=np.int8)
+        compact_genome.input_positions = np.array(
+            [-1 if node.get_input_position() is None else node.get_input_position() for node in nodes], dtype=np.int64)
+        compact_genome.node_orders = np.array([brain.topological_positions[node] for node in nodes], dtype=np.int64)
+        compact_genome.next_node_order = brain.next_topological_position
+
+        compact_genome.connection_ids = np.array([connection.get_id() for connection in connections], dtype=np.int64)
+        compact_genome.connection_in = np.array([positions[connection.get_in_node()] for connection in connections],
+                                                dtype=np.int32)
+        compact_genome.connection_out = np.array([positions[connection.get_out_node()] for connection in connections],
+                                                 dtype=np.int32)
+        compact_genome.weights = np.array([connection.get_weight() for connection in connections], dtype=np.float64)
+        compact_genome.shift_directions = np.array(
+            [connection.get_weight_shift_direction() for connection in connections], dtype=bool)
+        compact_genome.recurrent = np.array([brain.is_recurrent_connection(connection) for connection in connections],
+                                            dtype=bool)
+
+        compact_genome.dag_only = brain.dag_only
+        if brain.get_last_weight_shift_connection() is not None:
+            compact_genome.last_weight_shift_connection = brain.get_last_weight_shift_connection().get_id()
+
+        compact_genome.copy_evolution_state(genome)
+        return compact_genome
+
+    def to_genome(self) -> Genome:
+        genome = Genome()
+        genome.brain = self.to_neural_network()
+        genome.copy_evolution_state(self)
+        return genome
+
+    def to_neural_network(self) -> NeuralNetwork:
+        neural_network = NeuralNetwork(self.dag_only)
+        nodes = []
+
+        for node_id, node_type, activation_code, input_position in zip(
+                self.node_ids.tolist(), self.node_types.tolist(), self.activation_codes.tolist(),
+                self.input_positions.tolist()):
+            node = Node(NODE_TYPES[node_type], node_id, input_position if node_type == INPUT else None)
+            node.set_activation(ActivationFunction.get_function_by_code(activation_code))
+            neural_network.add_node(node)
+            nodes.append(node)
+
+        neural_network.set_topological_order(dict(zip(self.node_ids.tolist(), self.node_orders.tolist())))
+
+        for index in range(len(self.connection_ids)):
+            connection = Connection(nodes[self.connection_in[index]], nodes[self.connection_out[index]],
+                                    float(self.weights[index]), int(self.connection_ids[index]))
+            connection.weight_shift_direction = bool(self.shift_directions[index])
+            neural_network.add_connection(connection, bool(self.recurrent[index]))
+
+        if self.last_weight_shift_connection is not None:
+            neural_network.last_weight_shift_connection = neural_network.get_connection_by_id(
+                self.last_weight_shift_connection)
+
+        return neural_network
+
+    def create_brain(self) -> NeuralNetwork | None:
+        return None
+
+    def get_brain(self) -> NeuralNetwork:
+        if self.brain is None:
+            self.brain = self.to_neural_network()
+
+        return self.brain
+
+    def invalidate_cache(self):
+        self.brain = None
+        self.compiled_networks = {}
+        self.signature = None
+
+    def get_change_count(self):
+        # The genes only change through the methods of the genome, never through the neural network view
+        return 0
+
+    def get_node_size(self):
+        return len(self.node_ids)
+
+    def get_connection_size(self):
+        return len(self.connection_ids)
+
+    def calculate_net_cost(self):
+        return self.get_node_size() + self.get_connection_size()
+
+    def switch_last_weight_shift_direction(self):
+        if self.last_weight_shift_connection is None:
+            return
+
+        index = np.searchsorted(self.connection_ids, self.last_weight_shift_connection)
+        if index < len(self.connection_ids) and self.connection_ids[index] == self.last_weight_shift_connection:
+            self.shift_directions[index] = not self.shift_directions[index]
+
+    def copy(self):
+        new_genome = CompactGenome(random_generator=self.random_generator)
+
+        new_genome.node_ids = self.node_ids.copy()
+        new_genome.node_types = self.node_types.copy()
+        new_genome.activation_codes = self.activation_codes.copy()
+        new_genome.input_positions = self.input_positions.copy()
+        new_genome.node_orders = self.node_orders.copy()
+        new_genome.next_node_order = self.next_node_order
+
+        new_genome.connection_ids = self.connection_ids.copy()
+        new_genome.connection_in = self.connection_in.copy()
+        new_genome.connection_out = self.connection_out.copy()
+        new_genome.weights = self.weights.copy()
+        new_genome.shift_directions = self.shift_directions.copy()
+        new_genome.recurrent = self.recurrent.copy()
+
+        new_genome.dag_only = self.dag_only
+        new_genome.mutation_rates = dict(self.mutation_rates)
+        new_genome.mutation_num = dict(self.mutation_num)
+        new_genome.parent = self
+
+        return new_genome
+
+    def get_node_index(self, node_id):
+        '''
+        :return: Index of the node or None if the node does not exist
+        '''
+        index = int(np.searchsorted(self.node_ids, node_id))
+
+        if index < len(self.node_ids) and self.node_ids[index] == node_id:
+            return index
+
+        return None
+
+    def get_connection_index(self, connection_id):
+        '''
+        :return: Index of the connection or None if the connection does not exist
+        '''
+        index = int(np.searchsorted(self.connection_ids, connection_id))
+
+        if index < len(self.connection_ids) and self.connection_ids[index] == connection_id:
+            return index
+
+        return None
+
+    def add_node(self, node: Node):
+        if self.get_node_index(node.get_id()) is not None:
+            raise InvalidNode("node already exists in the neural network")
+
+        input_position = node.get_input_position() if node.type is NodeTypes.INPUT else -1
+        index = int(np.searchsorted(self.node_ids, node.get_id()))
+
+        self.node_ids = np.insert(self.node_ids, index, node.get_id())
+        self.node_types = np.insert(self.node_types, index, NODE_TYPES.index(node.type))
+        self.activation_codes = np.insert(self.activation_codes, index,
+                                          ActivationFunction.get_code(node.get_activation()))
+        self.input_positions = np.insert(self.input_positions, index, input_position)
+        self.node_orders = np.insert(self.node_orders, index, self.next_node_order)
+        self.next_node_order += 1
+
+        self.connection_in[self.connection_in >= index] += 1
+        self.connection_out[self.connection_out >= index] += 1
+        self.invalidate_cache()
+
+        return index
+
+    def add_missing_input_nodes(self, input_size):
+        missing_size = input_size - np.count_nonzero(self.node_types == INPUT)
+
+        for _ in range(missing_size):
+            self.add_node(Node(NodeTypes.INPUT))
+
+    def get_input_size(self):
+        return int(np.count_nonzero(self.node_types == INPUT))
+
+    def remove_node(self, remove_node: Node):
+        index = self.get_node_index(remove_node.get_id())
+
+        if index is not None:
+            self.remove_node_index(index)
+
+    def remove_node_index(self, index):
+        keep = (self.connection_in != index) & (self.connection_out != index)
+        self.filter_connections(keep)
+
+        self.node_ids = np.delete(self.node_ids, index)
+        self.node_types = np.delete(self.node_types, index)
+        self.activation_codes = np.delete(self.activation_codes, index)
+        self.input_positions = np.delete(self.input_positions, index)
+        self.node_orders = np.delete(self.node_orders, index)
+
+        self.connection_in[self.connection_in > index] -= 1
+        self.connection_out[self.connection_out > index] -= 1
+        self.invalidate_cache()
+
+    def filter_connections(self, keep):
+        self.connection_ids = self.connection_ids[keep]
+        self.connection_in = self.connection_in[keep]
+        self.connection_out = self.connection_out[keep]
+        self.weights = self.weights[keep]
+        self.shift_directions = self.shift_directions[keep]
+        self.recurrent = self.recurrent[keep]
+        self.invalidate_cache()
+
+    def add_connection(self, connection: Connection):
+        in_index = self.get_node_index(connection.get_in_node().get_id())
+        out_index = self.get_node_index(connection.get_out_node().get_id())
+
+        if in_index is None:
+            raise InvalidNode("node in is not in the neural network")
+
+        if out_index is None:
+            raise InvalidNode("node out is not in the neural network")
+
+        self.add_connection_index(in_index, out_index, connection.get_weight(), connection.get_id(),
+                                  connection.get_weight_shift_direction())
+
+    def add_connection_index(self, in_index, out_index, weight, connection_id, shift_direction=True):
+        if in_index == out_index:
+            raise InvalidConnection("Cannot add connection with same in and out neuron")
+
+        if np.any((self.connection_in == in_index) & (self.connection_out == out_index)):
+            raise InvalidConnection("Cannot add connection with same out neuron twice")
+
+        if self.get_connection_index(connection_id) is not None:
+            raise InvalidConnection("connection already exists in the neural network")
+
+        orders = self.node_orders.tolist()
+        next_nodes, previous_nodes = self.get_adjacency()
+        recurrent = self.insert_order(in_index, out_index, orders, next_nodes, previous_nodes)
+
+        if recurrent and self.dag_only:
+            raise InvalidConnection("Cannot add connection that creates a cycle")
+
+        index = int(np.searchsorted(self.connection_ids, connection_id))
+        self.connection_ids = np.insert(self.connection_ids, index, connection_id)
+        self.connection_in = np.insert(self.connection_in, index, in_index)
+        self.connection_out = np.insert(self.connection_out, index, out_index)
+        self.weights = np.insert(self.weights, index, weight)
+        self.shift_directions = np.insert(self.shift_directions, index, shift_direction)
+        self.recurrent = np.insert(self.recurrent, index, recurrent)
+        self.node_orders = np.array(orders, dtype=np.int64)
+        self.invalidate_cache()
+
+    def get_adjacency(self):
+        '''
+        :return: In and out nodes of every node over the connections that are not recurrent
+        '''
+        next_nodes = [[] for _ in range(len(self.node_ids))]
+        previous_nodes = [[] for _ in range(len(self.node_ids))]
+        forward = ~self.recurrent
+
+        for in_index, out_index in zip(self.connection_in[forward].tolist(), self.connection_out[forward].tolist()):
+            next_nodes[in_index].append(out_index)
+            previous_nodes[out_index].append(in_index)
+
+        return next_nodes, previous_nodes
+
+    @staticmethod
+    def insert_order(in_index, out_index, orders, next_nodes, previous_nodes):
+        '''
+        Same as NeuralNetwork.find_affected_nodes and NeuralNetwork.reorder_nodes for node indices.
+        Updates the orders and the adjacency lists if the connection is not recurrent.
+        :return: True if the connection creates a cycle
+        '''
+        lower_bound = orders[out_index]
+        upper_bound = orders[in_index]
+
+        if upper_bound > lower_bound:
+            if in_index == out_index:
+                return True
+
+            forward_nodes = [out_index]
+            visited = {out_index}
+
+            for node in forward_nodes:
+                for next_node in next_nodes[node]:
+                    if next_node == in_index:
+                        return True
+
+                    if next_node not in visited and orders[next_node] < upper_bound:
+                        visited.add(next_node)
+                        forward_nodes.append(next_node)
+
+            backward_nodes = [in_index]
+            visited = {in_index}
+
+            for node in backward_nodes:
+                for previous_node in previous_nodes[node]:
+                    if previous_node not in visited and orders[previous_node] > lower_bound:
+                        visited.add(previous_node)
+                        backward_nodes.append(previous_node)
+
+            backward_nodes.sort(key=orders.__getitem__)
+            forward_nodes.sort(key=orders.__getitem__)
+            nodes = backward_nodes + forward_nodes
+            positions = sorted(orders[node] for node in nodes)
+
+            for node, position in zip(nodes, positions):
+                orders[node] = position
+
+        next_nodes[in_index].append(out_index)
+        previous_nodes[out_index].append(in_index)
+        return False
+
+    def remove_connection(self, remove_connection: Connection):
+        index = self.get_connection_index(remove_connection.get_id())
+
+        if index is not None:
+            self.remove_connection_index(index)
+
+    def remove_connection_index(self, index):
+        keep = np.ones(len(self.connection_ids), dtype=bool)
+        keep[index] = False
+        self.filter_connections(keep)
+
+    def get_activation_codes(self) -> np.ndarray:
+        return self.activation_codes[self.node_types != INPUT]
+
+    def set_activation_codes(self, activation_codes: np.ndarray):
+        self.activation_codes[self.node_types != INPUT] = activation_codes
+
+    def add_random_node(self):
+        if self.get_connection_size() <= 0:
+            return None
+
+        index = int(self.random_generator.integers(self.get_connection_size()))
+        connection_id = int(self.connection_ids[index])
+        node_in_id = int(self.node_ids[self.connection_in[index]])
+        node_out_id = int(self.node_ids[self.connection_out[index]])
+        weight = float(self.weights[index])
+        shift_direction = bool(self.shift_directions[index])
+
+        new_node_id = InnovationIds.get_node_id(connection_id, node_in_id, node_out_id)
+
+        # The genome already got this split from a crossover
+        if self.get_node_index(new_node_id) is not None:
+            return None
+
+        new_node = self.create_node(NodeTypes.HIDDEN, new_node_id)
+        new_connection_id = InnovationIds.get_connection_id(node_in_id, new_node_id)
+
+        new_index = self.add_node(new_node)
+
+        # A ---> C
+        # A ---> B ---> C
+        # B ---> C is a new innovation, so A ---> C can be added again and means the same in every genome
+
+        self.remove_connection_index(index)
+        self.add_connection_index(self.get_node_index(node_in_id), new_index, 1.0, new_connection_id)
+        self.add_connection_index(new_index, self.get_node_index(node_out_id), weight,
+                                  InnovationIds.get_connection_id(new_node_id, node_out_id), shift_direction)
+
+        return new_node.get_id()
+
+    def remove_random_node(self):
+        hidden_indices = np.flatnonzero(self.node_types == HIDDEN)
+
+        if len(hidden_indices) > 0:
+            self.remove_node_index(int(hidden_indices[self.random_generator.integers(len(hidden_indices))]))
+
+    def get_weights(self) -> (np.ndarray, np.ndarray):
+        return self.weights, self.shift_directions
+
+    def set_weights(self, weights: np.ndarray, last_shift_index=None):
+        self.weights[:] = weights
+
+        if last_shift_index is not None:
+            self.last_weight_shift_connection = int(self.connection_ids[last_shift_index])
+
+        self.invalidate_cache()
+
+    def remove_random_connection(self):
+        if self.get_connection_size() > 0:
+            self.remove_connection_index(int(self.random_generator.integers(self.get_connection_size())))
+
+    def add_random_connection(self):
+        if self.get_node_size() <= 0:
+            return
+
+        in_index, out_index = self.random_generator.integers(self.get_node_size(), size=2).tolist()
+        weight = YaneConfig.get_random_mutation_weight(yane_config, self.random_generator)
+
+        connection_id = InnovationIds.get_connection_id(int(self.node_ids[in_index]), int(self.node_ids[out_index]))
+
+        try:
+            self.add_connection_index(in_index, out_index, weight, connection_id)
+        except InvalidConnection:
+            pass
+
+    @classmethod
+    def crossover(cls, genome1: 'CompactGenome', genome2: 'CompactGenome') -> 'CompactGenome':
+        '''
+        Aligns the genes of both genomes by id. Matching genes are taken from a random parent, all other genes from
+        the parent that has them. The child gets the mutation parameters of genome1. The order of the nodes is rebuilt,
+        so connections that create a cycle are recurrent again.
+        '''
+        child_genome = cls(random_generator=genome1.get_random_generator())
+        random_generator = child_genome.get_random_generator()
+
+        node_ids, node_sources, node_indices = cls.align_genes(genome1.node_ids, genome2.node_ids, random_generator)
+        child_genome.node_ids = node_ids
+        child_genome.node_types = cls.take_genes(genome1.node_types, genome2.node_types, node_sources, node_indices)
+        child_genome.activation_codes = cls.take_genes(genome1.activation_codes, genome2.activation_codes,
+                                                       node_sources, node_indices)
+        child_genome.input_positions = cls.take_genes(genome1.input_positions, genome2.input_positions, node_sources,
+                                                      node_indices)
+
+        connection_ids, connection_sources, connection_indices = cls.align_genes(
+            genome1.connection_ids, genome2.connection_ids, random_generator)
+        in_ids = cls.take_genes(genome1.node_ids[genome1.connection_in], genome2.node_ids[genome2.connection_in],
+                                connection_sources, connection_indices)
+        out_ids = cls.take_genes(genome1.node_ids[genome1.connection_out], genome2.node_ids[genome2.connection_out],
+                                 connection_sources, connection_indices)
+        weights = cls.take_genes(genome1.weights, genome2.weights, connection_sources, connection_indices)
+        shift_directions = cls.take_genes(genome1.shift_directions, genome2.shift_directions, connection_sources,
+                                          connection_indices)
+        recurrent = cls.take_genes(genome1.recurrent, genome2.recurrent, connection_sources, connection_indices)
+
+        connection_in = np.searchsorted(node_ids, in_ids).astype(np.int32)
+        connection_out = np.searchsorted(node_ids, out_ids).astype(np.int32)
+
+        # Different connections of both parents can connect the same nodes, only the oldest is kept
+        _, first = np.unique(connection_in.astype(np.int64) * len(node_ids) + connection_out, return_index=True)
+        keep = np.zeros(len(connection_ids), dtype=bool)
+        keep[first] = True
+
+        # Start with the order of the first parent and add the connections that were not recurrent first
+        orders = np.searchsorted(np.sort(genome1.node_orders), genome1.node_orders)
+        child_orders = np.full(len(node_ids), len(node_ids), dtype=np.int64)
+        child_orders[np.searchsorted(node_ids, genome1.node_ids)] = orders
+        orders = np.argsort(np.argsort(child_orders, kind='stable'), kind='stable').tolist()
+
+        next_nodes = [[] for _ in range(len(node_ids))]
+        previous_nodes = [[] for _ in range(len(node_ids))]
+        child_recurrent = np.zeros(len(connection_ids), dtype=bool)
+
+        for index in np.flatnonzero(keep)[np.argsort(recurrent[keep], kind='stable')].tolist():
+            if cls.insert_order(int(connection_in[index]), int(connection_out[index]), orders, next_nodes,
+                                previous_nodes):
+                if child_genome.dag_only:
+                    keep[index] = False
+                else:
+                    child_recurrent[index] = True
+
+        child_genome.node_orders = np.array(orders, dtype=np.int64)
+        child_genome.next_node_order = len(node_ids)
+        child_genome.connection_ids = connection_ids[keep]
+        child_genome.connection_in = connection_in[keep]
+        child_genome.connection_out = connection_out[keep]
+        child_genome.weights = weights[keep]
+        child_genome.shift_directions = shift_directions[keep]
+        child_genome.recurrent = child_recurrent[keep]
+        child_genome.mutation_rates = dict(genome1.mutation_rates)
+        child_genome.mutation_num = dict(genome1.mutation_num)
+        child_genome.parent = genome1
+
+        return child_genome
+
+    @staticmethod
+    def take_genes(values1, values2, from_second, indices) -> np.ndarray:
+        genes = np.empty(len(from_second), dtype=values1.dtype)
+        genes[~from_second] = values1[indices[0][~from_second]]
+        genes[from_second] = values2[indices[1][from_second]]
+        return genes
+
+    def create_signature(self) -> GenomeSignature:
+        return GenomeSignature(self.node_ids, self.connection_ids, self.weights.sum())
+
+    def compile(self, start_backwards=False) -> CompiledNetwork:
+        compiled_network = self.compiled_networks.get(start_backwards)
+
+        if compiled_network is None:
+            compiled_network = self.create_compiled_network(start_backwards)
+            self.compiled_networks[start_backwards] = compiled_network
+
+        return compiled_network
+
+    def create_compiled_network(self, start_backwards=False) -> CompiledNetwork:
+        '''
+        Same as CompiledNetwork.from_neural_network without building the node objects
+        '''
+        is_input = self.node_types == INPUT
+
+        if start_backwards:
+            has_input = np.zeros(len(self.node_ids), dtype=bool)
+            has_input[self.connection_out] = True
+            reached = CompactGenome.find_reachable_nodes((self.node_types == OUTPUT) & has_input, self.connection_out,
+                                                self.connection_in)
+            reached = CompactGenome.find_reachable_nodes(reached & is_input, self.connection_in, self.connection_out)
+        else:
+            reached = CompactGenome.find_reachable_nodes(is_input, self.connection_in, self.connection_out)
+
+        reached_indices = np.flatnonzero(reached)
+        order = reached_indices[np.argsort(self.node_orders[reached_indices], kind='stable')]
+        positions = np.full(len(self.node_ids), -1, dtype=np.int64)
+        positions[order] = np.arange(len(order))
+
+        activation_codes = self.activation_codes[order].copy()
+        activation_codes[is_input[order]] = ActivationFunction.get_code(ActivationFunction.LINEAR)
+        input_indices = np.flatnonzero(is_input[order])
+
+        connections = reached[self.connection_in] & reached[self.connection_out]
+
+        return CompiledNetwork(activation_codes, input_indices, self.input_positions[order[input_indices]],
+                               positions[self.connection_in[connections]], positions[self.connection_out[connections]],
+                               self.weights[connections], positions[self.node_types == OUTPUT])
+
+    @staticmethod
+    def find_reachable_nodes(start_mask, sources, targets) -> np.ndarray:
+        reached = start_mask.copy()
+        frontier = start_mask
+
+        while frontier.any():
+            next_nodes = targets[frontier[sources]]
+            frontier = np.zeros(len(reached), dtype=bool)
+            frontier[next_nodes] = True
+            frontier &= ~reached
+            reached |= frontier
+
+        return reached
+
+    def forward_propagation(self, data=None, start_backwards=False, compiled=False):
+        '''
+        Always uses the compiled network if data is given
+        '''
+        if data is None:
+            self.outputs = self.get_brain().forward_propagation(None, start_backwards)
+            return self.outputs
+
+        self.add_missing_input_nodes(len(data))
+        self.outputs = self.compile(start_backwards).forward_propagation(data).tolist()
+        return self.outputs
+
+    def forward_propagation_batch(self, data, chunk_size=None, start_backwards=False):
+        self.add_missing_input_nodes(len(data[0]) if len(data) > 0 else 0)
+        return self.compile(start_backwards).forward_propagation_batch(data, chunk_size)
+
+    def tick(self, data=None, compiled=False):
+        if data is not None:
+            self.add_missing_input_nodes(len(data))
+
+        self.outputs = self.get_brain().tick(data, compiled)
+        return self.outputs
+
+    def tick_batch(self, data=None, reset_mask=None):
+        if data is not None and len(data) > 0:
+            self.add_missing_input_nodes(len(data[0]))
+
+        return self.get_brain().tick_batch(data, reset_mask)
+
+    def get_outputs(self) -> list:
+        return self.outputs
+
+    def clear_hidden_output_nodes(self):
+        # The neural network is only needed for tick, dropping it frees the node objects
+        self.brain = None
+        self.outputs = [0.0] * int(np.count_nonzero(self.node_types == OUTPUT))
+
+        for compiled_network in self.compiled_networks.values():
+            compiled_network.clear_carry_values()
@@ -0,0 +1,289 @@
+import numpy as np
+
+from src.neural_network.ActivationFunction import ActivationFunction
+from src.neural_network.NodeTypes import NodeTypes
+
+
+class CompiledNetwork:
+    '''
+    Frozen copy of a neural network that is evaluated with numpy instead of walking the node objects.
+
+    The nodes are grouped into levels. A node only depends on nodes of previous levels, so a whole level can be
+    calculated at once. The incoming connections of every node are stored in CSR format (indptr, indices, weights).
+    The plan has to be rebuilt if the structure or the weights of the neural network change.
+
+    Connections to a node that already fired ("late" connections) are added after all levels, like the neural network
+    adds them after the node fired. Output nodes keep these values until the next forward propagation starts. Hidden
+    nodes start the next forward propagation with them, so forward_propagation keeps them as carry values.
+    '''
+
+    def __init__(self, activation_codes, input_indices, input_positions, sources, targets, weights, output_indices):
+        '''
+        Nodes are referenced by their position in the firing order of the neural network.
+        :param activation_codes: Activation code of every node. Input nodes are never activated
+        :param input_indices: Positions of the input nodes
+        :param input_positions: Index of the input data for each input node
+        :param sources: Position of the in node for each connection
+        :param targets: Position of the out node for each connection
+        :param weights: Weight of each connection
+        :param output_indices: Position of each output node or -1 if the output node is never fired
+        '''
+        activation_codes = np.asarray(activation_codes, dtype=np.int8)
+        input_indices = np.asarray(input_indices, dtype=np.int64)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float64)
+        output_indices = np.asarray(output_indices, dtype=np.int64)
+
+        node_size = len(activation_codes)
+
+        # Input nodes get new input data before the next forward propagation, so late connections to them do not count
+        is_output = np.zeros(node_size, dtype=bool)
+        is_output[output_indices[output_indices >= 0]] = True
+        is_unsorted_input = np.zeros(node_size, dtype=bool)
+        is_unsorted_input[input_indices] = True
+        forward = sources < targets
+        late = ~forward & is_output[targets]
+        carry = ~forward & ~is_output[targets] & ~is_unsorted_input[targets]
+
+        sources_forward = sources[forward]
+        targets_forward = targets[forward]
+        weights_forward = weights[forward]
+
+        levels = self.calculate_levels(node_size, sources_forward, targets_forward)
+
+        # Sort nodes by level but keep the firing order inside a level
+        order = np.lexsort((np.arange(node_size), levels))
+        new_index = np.empty(node_size, dtype=np.int64)
+        new_index[order] = np.arange(node_size)
+
+        # Sort connections by out node, then by firing order of the in node to sum in the same order as the nodes fire
+        edge_order = np.lexsort((sources_forward, new_index[targets_forward]))
+
+        self.node_size = node_size
+        self.activation_codes = activation_codes[order]
+        self.input_indices = new_index[input_indices]
+        self.input_positions = np.asarray(input_positions, dtype=np.int64)
+        self.output_mask = output_indices >= 0
+        self.output_indices = np.full(len(output_indices), -1, dtype=np.int64)
+        self.output_indices[self.output_mask] = new_index[output_indices[self.output_mask]]
+
+        self.indices = new_index[sources_forward[edge_order]]
+        self.weights = weights_forward[edge_order]
+        self.indptr = np.zeros(node_size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(new_index[targets_forward], minlength=node_size), out=self.indptr[1:])
+
+        level_sizes = np.bincount(levels, minlength=1) if node_size > 0 else np.zeros(0, dtype=np.int64)
+        self.level_pointers = np.zeros(len(level_sizes) + 1, dtype=np.int64)
+        np.cumsum(level_sizes, out=self.level_pointers[1:])
+
+        self.late_sources = new_index[sources[late]]
+        self.late_targets = new_index[targets[late]]
+        self.late_weights = weights[late]
+
+        # Hidden nodes with late connections, as positions in the firing order of the neural network
+        self.carry_positions, carry_targets = np.unique(targets[carry], return_inverse=True)
+        self.carry_indices = new_index[self.carry_positions]
+        self.carry_sources = new_index[sources[carry]]
+        self.carry_targets = carry_targets.reshape(-1)
+        self.carry_weights = weights[carry]
+        self.carry_values = np.zeros(len(self.carry_indices), dtype=np.float64)
+
+        self.initial_values = np.zeros(node_size, dtype=np.float64)
+        is_input = np.zeros(node_size, dtype=bool)
+        is_input[self.input_indices] = True
+        self.levels = [self.create_level(start, end, is_input) for start, end in
+                       zip(self.level_pointers[:-1], self.level_pointers[1:])]
+        self.level_matrices = None
+
+    @classmethod
+    def from_neural_network(cls, neural_network, start_backwards=False) -> 'CompiledNetwork':
+        if start_backwards:
+            nodes = neural_network.get_backward_order_list()
+        else:
+            nodes = neural_network.get_forward_order_list()
+
+        positions = {node: position for position, node in enumerate(nodes)}
+        linear_code = ActivationFunction.get_code(ActivationFunction.LINEAR)
+
+        activation_codes = []
+        input_indices = []
+        input_positions = []
+        sources = []
+        targets = []
+        weights = []
+
+        for position, node in enumerate(nodes):
+            if node.type is NodeTypes.INPUT:
+                activation_codes.append(linear_code)
+                input_indices.append(position)
+                input_positions.append(node.get_input_position())
+            else:
+                activation_codes.append(ActivationFunction.get_code(node.get_activation()))
+
+            for connection in node.get_next_connections():
+                target = positions.get(connection.get_out_node())
+                if target is not None:
+                    sources.append(position)
+                    targets.append(target)
+                    weights.append(connection.get_weight())
+
+        output_indices = [positions.get(node, -1) for node in neural_network.get_output_nodes()]
+
+        return cls(activation_codes, input_indices, input_positions, sources, targets, weights, output_indices)
+
+    @staticmethod
+    def calculate_levels(node_size, sources, targets):
+        '''
+        A node is one level above its highest in node. Requires sources < targets for every connection.
+        '''
+        levels = np.zeros(node_size, dtype=np.int64)
+
+        if len(targets) <= 0:
+            return levels
+
+        edge_order = np.argsort(targets, kind='stable')
+        sources = sources[edge_order]
+        targets = targets[edge_order]
+        boundaries = np.flatnonzero(np.diff(targets)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(targets)]))
+
+        # Targets are sorted by firing order, so all in nodes already have their final level
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            levels[targets[start]] = levels[sources[start:end]].max() + 1
+
+        return levels
+
+    def create_level(self, start, end, is_input):
+        edge_start = self.indptr[start]
+        edge_end = self.indptr[end]
+        rows = np.repeat(np.arange(end - start), np.diff(self.indptr[start:end + 1]))
+
+        activation_groups = []
+        codes = self.activation_codes[start:end]
+        active = ~is_input[start:end]
+
+        for code in np.unique(codes[active]):
+            activation_groups.append(
+                (ActivationFunction.get_function_by_code(code), np.flatnonzero(active & (codes == code))))
+
+        return start, end, edge_start, edge_end, rows, activation_groups
+
+    def get_level_matrices(self):
+        '''
+        Dense weight matrix of every level. The rows are the in nodes of the level, the columns are the level nodes.
+        Only used for batches, because a matrix product is faster than summing the connections for many samples.
+        '''
+        if self.level_matrices is not None:
+            return self.level_matrices
+
+        self.level_matrices = []
+
+        for start, end, edge_start, edge_end, rows, _ in self.levels:
+            in_nodes, columns = np.unique(self.indices[edge_start:edge_end], return_inverse=True)
+            matrix = np.zeros((len(in_nodes), end - start), dtype=np.float64)
+            np.add.at(matrix, (columns, rows), self.weights[edge_start:edge_end])
+            self.level_matrices.append((in_nodes, matrix))
+
+        return self.level_matrices
+
+    def get_input_size(self):
+        if len(self.input_positions) <= 0:
+            return 0
+
+        return int(self.input_positions.max()) + 1
+
+    def get_output_size(self):
+        return len(self.output_indices)
+
+    def get_carry_values(self) -> np.ndarray:
+        '''
+        :return: Values that the hidden nodes at carry_positions start the next forward propagation with
+        '''
+        return self.carry_values
+
+    def set_carry_values(self, carry_values):
+        self.carry_values[:] = carry_values
+
+    def clear_carry_values(self):
+        self.carry_values[:] = 0.0
+
+    def forward_propagation(self, data) -> np.ndarray:
+        '''
+        Starts with the carry values and replaces them with the values of the late connections to hidden nodes
+        :param data: Input data, indexed by the input position of the input nodes
+        :return: Values of the output nodes
+        '''
+        data = np.asarray(data, dtype=np.float64)
+        values = self.initial_values.copy()
+        values[self.input_indices] = data[self.input_positions]
+        values[self.carry_indices] = self.carry_values
+
+        for start, end, edge_start, edge_end, rows, activation_groups in self.levels:
+            if edge_end > edge_start:
+                incoming = self.weights[edge_start:edge_end] * values[self.indices[edge_start:edge_end]]
+                values[start:end] += np.bincount(rows, weights=incoming, minlength=end - start)
+
+            level_values = values[start:end]
+            for activation, group in activation_groups:
+                level_values[group] = ActivationFunction.activate_array(activation, level_values[group])
+
+        if len(self.carry_targets) > 0:
+            self.carry_values[:] = 0.0
+            np.add.at(self.carry_values, self.carry_targets, self.carry_weights * values[self.carry_sources])
+
+        if len(self.late_targets) > 0:
+            np.add.at(values, self.late_targets, self.late_weights * values[self.late_sources])
+
+        outputs = np.zeros(self.get_output_size(), dtype=np.float64)
+        outputs[self.output_mask] = values[self.output_indices[self.output_mask]]
+
+        return outputs
+
+    def forward_propagation_batch(self, data, chunk_size=None) -> np.ndarray:
+        '''
+        :param data: Input data with one sample per row
+        Every sample starts without carry values, like the first forward propagation after clear_values
+        :param chunk_size: Maximum number of samples that are calculated at once. Limits the memory usage to
+                chunk_size * number of nodes values. None calculates all samples at once
+        :return: Values of the output nodes with one sample per row
+        '''
+        data = np.asarray(data, dtype=np.float64)
+
+        if data.ndim != 2:
+            raise ValueError("Batch input data must be two dimensional (samples, inputs)")
+
+        sample_size = data.shape[0]
+
+        if chunk_size is None or chunk_size >= sample_size:
+            return self.forward_propagation_chunk(data)
+
+        outputs = np.empty((sample_size, self.get_output_size()), dtype=np.float64)
+
+        for start in range(0, sample_size, chunk_size):
+            outputs[start:start + chunk_size] = self.forward_propagation_chunk(data[start:start + chunk_size])
+
+        return outputs
+
+    def forward_propagation_chunk(self, data) -> np.ndarray:
+        values = np.zeros((data.shape[0], self.node_size), dtype=np.float64)
+        values[:, self.input_indices] = data[:, self.input_positions]
+
+        for (start, end, _, _, _, activation_groups), (in_nodes, matrix) in zip(self.levels,
+                                                                             self.get_level_matrices()):
+            if len(in_nodes) > 0:
+                values[:, start:end] += values[:, in_nodes] @ matrix
+
+            for activation, group in activation_groups:
+                columns = group + start
+                values[:, columns] = ActivationFunction.activate_array(activation, values[:, columns])
+
+        if len(self.late_targets) > 0:
+            late_values = values[:, self.late_sources] * self.late_weights
+            np.add.at(values, (slice(None), self.late_targets), late_values)
+
+        outputs = np.zeros((data.shape[0], self.get_output_size()), dtype=np.float64)
+        outputs[:, self.output_mask] = values[:, self.output_indices[self.output_mask]]
+
+        return outputs
@@ -0,0 +1,159 @@
+import numpy as np
+
+from src.neural_network.ActivationFunction import ActivationFunction
+
+
+class CompiledPopulation:
+    '''
+    Runs the same input batch through many genomes at once.
+
+    The compiled networks of the genomes are grouped by their number of levels and their size. Every group is packed
+    into padded weight tensors, so each level of a group is a single batched matrix product over all genomes.
+    '''
+
+    def __init__(self, genomes, start_backwards=False):
+        self.genomes = list(genomes)
+        self.start_backwards = start_backwards
+        self.input_size = None
+        self.groups = None
+
+    def get_genomes(self):
+        return self.genomes
+
+    def compile(self, input_size):
+        for genome in self.genomes:
+            genome.add_missing_input_nodes(input_size)
+
+        compiled_networks = [genome.compile(self.start_backwards) for genome in self.genomes]
+
+        group_indices = {}
+        for genome_index, compiled_network in enumerate(compiled_networks):
+            key = (len(compiled_network.levels), int(compiled_network.node_size).bit_length())
+            group_indices.setdefault(key, []).append(genome_index)
+
+        self.output_size = max([network.get_output_size() for network in compiled_networks], default=0)
+        self.groups = [CompiledGroup(np.array(indices), [compiled_networks[index] for index in indices],
+                                     self.output_size) for indices in group_indices.values()]
+        self.input_size = input_size
+
+    def forward_propagation_batch(self, data, chunk_size=None) -> np.ndarray:
+        '''
+        :param data: Input data with one sample per row. Every genome gets the same samples
+        :param chunk_size: Maximum number of samples that are calculated at once
+        :return: numpy array with the shape (genomes, samples, outputs)
+        '''
+        data = np.asarray(data, dtype=np.float64)
+
+        if data.ndim != 2:
+            raise ValueError("Batch input data must be two dimensional (samples, inputs)")
+
+        if self.groups is None or self.input_size != data.shape[1]:
+            self.compile(data.shape[1])
+
+        sample_size = data.shape[0]
+        outputs = np.zeros((len(self.genomes), sample_size, self.output_size), dtype=np.float64)
+
+        if chunk_size is None:
+            chunk_size = max(sample_size, 1)
+
+        for group in self.groups:
+            for start in range(0, sample_size, chunk_size):
+                outputs[group.genome_indices, start:start + chunk_size] = group.forward_propagation(
+                    data[start:start + chunk_size])
+
+        return outputs
+
+
+class CompiledGroup:
+    '''
+    Compiled networks with the same number of levels packed into padded tensors.
+    Every network gets one zero column to read padding from and one column to write padding to.
+    '''
+
+    def __init__(self, genome_indices, compiled_networks, output_size):
+        self.genome_indices = genome_indices
+        self.genome_size = len(compiled_networks)
+        self.column_size = max(network.node_size for network in compiled_networks) + 2
+        self.zero_column = self.column_size - 2
+        self.trash_column = self.column_size - 1
+
+        self.input_columns = self.pad([network.input_indices for network in compiled_networks], self.trash_column)
+        self.input_positions = self.pad([network.input_positions for network in compiled_networks], 0)
+
+        output_indices = [np.where(network.output_mask, network.output_indices, self.zero_column) for network in
+                          compiled_networks]
+        output_indices = [np.pad(indices, (0, output_size - len(indices)), constant_values=self.zero_column) for
+                          indices in output_indices]
+        self.output_columns = self.pad(output_indices, self.zero_column)
+
+        self.late_sources = self.pad([network.late_sources for network in compiled_networks], self.zero_column)
+        self.late_targets = self.pad([network.late_targets for network in compiled_networks], self.trash_column)
+        self.late_weights = self.pad([network.late_weights for network in compiled_networks], 0.0)
+
+        self.levels = []
+        level_size = len(compiled_networks[0].levels)
+
+        for level in range(level_size):
+            in_columns = []
+            level_columns = []
+            matrices = []
+            level_activation_groups = []
+            activation_masks = {}
+
+            for network in compiled_networks:
+                start, end, _, _, _, activation_groups = network.levels[level]
+                in_nodes, matrix = network.get_level_matrices()[level]
+                in_columns.append(in_nodes)
+                level_columns.append(np.arange(start, end))
+                matrices.append(matrix)
+                level_activation_groups.append(activation_groups)
+
+            in_columns = self.pad(in_columns, self.zero_column)
+            level_columns = self.pad(level_columns, self.trash_column)
+            padded_matrices = np.zeros((self.genome_size, in_columns.shape[1], level_columns.shape[1]))
+
+            for genome_index, (matrix, activation_groups) in enumerate(zip(matrices, level_activation_groups)):
+                padded_matrices[genome_index, :matrix.shape[0], :matrix.shape[1]] = matrix
+
+                for activation, group in activation_groups:
+                    if activation not in activation_masks:
+                        activation_masks[activation] = np.zeros(level_columns.shape, dtype=bool)
+                    activation_masks[activation][genome_index, group] = True
+
+            activation_masks = [(activation, np.nonzero(mask)) for activation, mask in activation_masks.items()]
+            self.levels.append((in_columns, level_columns, np.swapaxes(padded_matrices, 1, 2), activation_masks))
+
+    @staticmethod
+    def pad(arrays, fill_value) -> np.ndarray:
+        width = max((len(array) for array in arrays), default=0)
+        dtype = np.result_type(*[np.asarray(array).dtype for array in arrays])
+        padded = np.full((len(arrays), width), fill_value, dtype=dtype)
+
+        for index, array in enumerate(arrays):
+            padded[index, :len(array)] = array
+
+        return padded
+
+    def forward_propagation(self, data) -> np.ndarray:
+        # Values are stored as (genomes, nodes, samples), so gathering nodes copies contiguous rows
+        genome_rows = np.arange(self.genome_size)[:, None]
+        values = np.zeros((self.genome_size, self.column_size, data.shape[0]), dtype=np.float64)
+        values[genome_rows, self.input_columns] = data.T[self.input_positions]
+
+        for in_columns, level_columns, matrices, activation_masks in self.levels:
+            level_values = values[genome_rows, level_columns]
+
+            if in_columns.shape[1] > 0:
+                level_values += matrices @ values[genome_rows, in_columns]
+
+            for activation, (genome_indices, node_indices) in activation_masks:
+                level_values[genome_indices, node_indices] = ActivationFunction.activate_array(
+                    activation, level_values[genome_indices, node_indices])
+
+            values[genome_rows, level_columns] = level_values
+
+        if self.late_targets.shape[1] > 0:
+            late_values = values[genome_rows, self.late_sources] * self.late_weights[:, :, None]
+            np.add.at(values, (genome_rows, self.late_targets), late_values)
+
+        return np.swapaxes(values[genome_rows, self.output_columns], 1, 2)
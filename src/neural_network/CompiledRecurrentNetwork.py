@@ -0,0 +1,331 @@
+import numpy as np
+
+from src.neural_network.ActivationFunction import ActivationFunction
+from src.neural_network.NodeTypes import NodeTypes
+
+
+class CompiledRecurrentNetwork:
+    '''
+    Array based version of NeuralNetwork.tick.
+
+    The values of all nodes are stored in one vector and the triggered nodes in an array in the order of the trigger
+    list of the neural network. The neural network fires the triggered nodes one after another, so a triggered node
+    already gets the signals of the triggered nodes before it in the list. tick splits the triggered nodes into
+    groups that fire at the same time: a node fires in a later group than the triggered nodes before it that connect
+    to it, and not in an earlier group than the triggered nodes after it that it connects to. Usually the triggered
+    nodes are one or two groups.
+    '''
+
+    def __init__(self, nodes):
+        '''
+        :param nodes: All nodes of the neural network. The current values are used as start state
+        '''
+        self.nodes = nodes
+        positions = {node: position for position, node in enumerate(nodes)}
+        node_types = [node.type for node in nodes]
+
+        self.node_size = len(nodes)
+        self.is_input = np.array([node_type is NodeTypes.INPUT for node_type in node_types], dtype=bool)
+        self.is_output = np.array([node_type is NodeTypes.OUTPUT for node_type in node_types], dtype=bool)
+        self.input_indices = np.flatnonzero(self.is_input)
+        self.input_positions = np.array([nodes[index].get_input_position() for index in self.input_indices],
+                                        dtype=np.int64)
+        self.output_indices = np.flatnonzero(self.is_output)
+
+        sources = []
+        targets = []
+        weights = []
+
+        for position, node in enumerate(nodes):
+            for connection in node.get_next_connections():
+                target = positions.get(connection.get_out_node())
+                if target is not None:
+                    sources.append(position)
+                    targets.append(target)
+                    weights.append(connection.get_weight())
+
+        self.sources = np.array(sources, dtype=np.int64)
+        self.targets = np.array(targets, dtype=np.int64)
+        self.weights = np.array(weights, dtype=np.float64)
+
+        # The connections are sorted by in node, in the order of get_next_connections like in the neural network
+        self.connection_pointers = np.zeros(self.node_size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.sources, minlength=self.node_size), out=self.connection_pointers[1:])
+
+        codes = np.array([ActivationFunction.get_code(node.get_activation()) for node in nodes], dtype=np.int8)
+        self.activation_groups = []
+        for code in np.unique(codes[~self.is_input]):
+            self.activation_groups.append(
+                (ActivationFunction.get_function_by_code(code), np.flatnonzero(~self.is_input & (codes == code))))
+
+        self.resets = ~self.is_output
+
+        self.values = np.array([node.get_value() for node in nodes], dtype=np.float64)
+        self.trigger_order = np.zeros(0, dtype=np.int64)
+
+        # Every trigger list seen by tick_batch or an InferenceHandle gets a number with its fire groups and the
+        # numbers of the next trigger lists, so the fire groups of a trigger list are only computed once
+        self.trigger_states = {}
+        self.trigger_orders = []
+        self.fire_plans = []
+        self.next_trigger_states = []
+        self.empty_trigger_state = self.get_trigger_state(np.zeros(0, dtype=np.int64))
+
+        # State of independent streams for tick_batch, one row per stream
+        self.batch_values = None
+        self.batch_states = None
+
+    def set_triggered_nodes(self, nodes):
+        '''
+        :param nodes: Trigger list of the neural network
+        '''
+        positions = {node: position for position, node in enumerate(self.nodes)}
+        trigger_order = [positions[node] for node in nodes if node in positions]
+        self.trigger_order = CompiledRecurrentNetwork.unique_in_order(np.array(trigger_order, dtype=np.int64))
+
+    def get_triggered_nodes(self):
+        return [self.nodes[index] for index in self.trigger_order.tolist()]
+
+    def get_triggered_mask(self) -> np.ndarray:
+        triggered = np.zeros(self.node_size, dtype=bool)
+        triggered[self.trigger_order] = True
+        return triggered
+
+    def tick(self, data=None) -> np.ndarray:
+        '''
+        Same as NeuralNetwork.tick
+        :param data: Input data, indexed by the input position of the input nodes
+        :return: Values of the output nodes
+        '''
+        trigger_order = self.trigger_order
+        connections = self.get_connections_of(trigger_order)
+
+        # Like the trigger list of the neural network: the input nodes, then the nodes that the fired nodes reach
+        next_trigger_order = self.targets[connections]
+
+        if data is not None:
+            data = np.asarray(data, dtype=np.float64)
+            self.values[self.input_indices] = data[self.input_positions]
+            next_trigger_order = np.concatenate((self.input_indices, next_trigger_order))
+
+        for fire in self.get_fire_groups(trigger_order, connections):
+            self.fire(fire)
+
+        self.trigger_order = CompiledRecurrentNetwork.unique_in_order(next_trigger_order)
+
+        return self.values[self.output_indices]
+
+    def get_connections_of(self, trigger_order) -> np.ndarray:
+        '''
+        :return: Indices of the connections of the triggered nodes, in the order the neural network visits them
+        '''
+        starts = self.connection_pointers[trigger_order]
+        counts = self.connection_pointers[trigger_order + 1] - starts
+        connection_size = int(counts.sum())
+
+        if connection_size <= 0:
+            return np.zeros(0, dtype=np.int64)
+
+        return np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(connection_size)
+
+    @staticmethod
+    def unique_in_order(positions) -> np.ndarray:
+        if len(positions) <= 0:
+            return positions
+
+        _, first_indices = np.unique(positions, return_index=True)
+        return positions[np.sort(first_indices)]
+
+    def get_fire_groups(self, trigger_order, connections) -> list[np.ndarray]:
+        '''
+        Splits the triggered nodes into groups that fire at the same time, so the result is the same as firing them
+        one after another in the trigger order
+        :param connections: Indices of the connections of the triggered nodes
+        :return: Boolean mask of every group in firing order
+        '''
+        if len(trigger_order) <= 0:
+            return []
+
+        triggered = np.zeros(self.node_size, dtype=bool)
+        triggered[trigger_order] = True
+
+        list_positions = np.full(self.node_size, -1, dtype=np.int64)
+        list_positions[trigger_order] = np.arange(len(trigger_order))
+        sources = self.sources[connections]
+        targets = self.targets[connections]
+        source_positions = list_positions[sources]
+        target_positions = list_positions[targets]
+
+        # A signal to a triggered node that fires later in the list is part of its activation in this tick
+        early = source_positions < target_positions
+
+        if not early.any():
+            return [triggered]
+
+        # A signal to a triggered node that fired earlier in the list arrives after its reset, like in one group
+        late = (target_positions >= 0) & (source_positions > target_positions)
+        early_sources, early_targets = sources[early], targets[early]
+        late_sources, late_targets = sources[late], targets[late]
+
+        # Both kinds of connections go from an earlier to a later list position, so this ends after the longest chain
+        groups = np.zeros(self.node_size, dtype=np.int64)
+        while True:
+            next_groups = groups.copy()
+            np.maximum.at(next_groups, early_targets, groups[early_sources] + 1)
+            np.maximum.at(next_groups, late_sources, groups[late_targets])
+
+            if np.array_equal(next_groups, groups):
+                break
+
+            groups = next_groups
+
+        return [triggered & (groups == group) for group in range(int(groups[trigger_order].max()) + 1)]
+
+    def get_trigger_state(self, trigger_order) -> int:
+        '''
+        :param trigger_order: Positions of the triggered nodes in the order of the trigger list
+        :return: Number of the trigger list, the same trigger list always gets the same number
+        '''
+        trigger_order = np.asarray(trigger_order, dtype=np.int64)
+        key = trigger_order.tobytes()
+        state = self.trigger_states.get(key)
+
+        if state is None:
+            state = len(self.trigger_orders)
+            fire_groups = self.get_fire_groups(trigger_order, self.get_connections_of(trigger_order))
+
+            self.trigger_states[key] = state
+            self.trigger_orders.append(trigger_order)
+            self.fire_plans.append(np.array(fire_groups, dtype=bool).reshape(len(fire_groups), self.node_size))
+            # Next trigger list without and with new input data
+            self.next_trigger_states.append([None, None])
+
+        return state
+
+    def get_fire_plan(self, state) -> np.ndarray:
+        '''
+        :return: Boolean mask of every fire group of the trigger list, one row per group in firing order
+        '''
+        return self.fire_plans[state]
+
+    def get_next_trigger_state(self, state, has_data) -> int:
+        '''
+        :param has_data: New input data is given in the tick, so the input nodes are triggered next
+        :return: Number of the trigger list of the next tick
+        '''
+        next_states = self.next_trigger_states[state]
+        next_state = next_states[has_data]
+
+        if next_state is None:
+            trigger_order = self.trigger_orders[state]
+            next_trigger_order = self.targets[self.get_connections_of(trigger_order)]
+
+            if has_data:
+                next_trigger_order = np.concatenate((self.input_indices, next_trigger_order))
+
+            next_state = self.get_trigger_state(CompiledRecurrentNetwork.unique_in_order(next_trigger_order))
+            next_states[has_data] = next_state
+
+        return next_state
+
+    def fire(self, fire):
+        if not fire.any():
+            return
+
+        for activation, group in self.activation_groups:
+            activate = group[fire[group]]
+            if len(activate) > 0:
+                self.values[activate] = ActivationFunction.activate_array(activation, self.values[activate])
+
+        signals = self.values[self.sources] * self.weights * fire[self.sources]
+
+        # Output nodes keep their value after firing
+        self.values[fire & self.resets] = 0.0
+        self.values += np.bincount(self.targets, weights=signals, minlength=self.node_size)
+
+    def reset_batch(self, stream_size):
+        self.batch_values = np.zeros((stream_size, self.node_size), dtype=np.float64)
+        self.batch_states = np.full(stream_size, self.empty_trigger_state, dtype=np.int64)
+
+    def get_stream_size(self):
+        if self.batch_values is None:
+            return 0
+
+        return self.batch_values.shape[0]
+
+    def tick_batch(self, data=None, reset_mask=None) -> np.ndarray:
+        '''
+        Advances many independent streams (e.g. episodes or sequences) by one tick. Uses a separate state from tick.
+        Every stream gets the same result as tick: the fire groups of its trigger list fire one after another, the
+        streams with different trigger lists fire their groups in the same steps.
+        :param data: Input data with one row per stream or None if no new input is given
+        :param reset_mask: Boolean mask of the streams that are reset before the tick, e.g. finished episodes
+        :return: Values of the output nodes with one row per stream
+        '''
+        if data is not None:
+            data = np.asarray(data, dtype=np.float64)
+
+            if data.ndim != 2:
+                raise ValueError("Batch input data must be two dimensional (streams, inputs)")
+
+            if self.get_stream_size() != data.shape[0]:
+                self.reset_batch(data.shape[0])
+        elif self.batch_values is None:
+            raise ValueError("The number of streams is unknown. Call reset_batch or pass input data")
+
+        if reset_mask is not None:
+            self.batch_values[reset_mask] = 0.0
+            self.batch_states[reset_mask] = self.empty_trigger_state
+
+        if data is not None:
+            self.batch_values[:, self.input_indices] = data[:, self.input_positions]
+
+        # Streams with the same trigger list share one fire plan
+        states, stream_states = np.unique(self.batch_states, return_inverse=True)
+        fire_plans = [self.get_fire_plan(state) for state in states.tolist()]
+        group_size = max(len(fire_plan) for fire_plan in fire_plans)
+
+        if group_size > 0:
+            fire_groups = np.zeros((len(states), group_size, self.node_size), dtype=bool)
+            for index, fire_plan in enumerate(fire_plans):
+                fire_groups[index, :len(fire_plan)] = fire_plan
+
+            fire_groups = fire_groups[stream_states.ravel()]
+            for group in range(group_size):
+                self.fire_batch(fire_groups[:, group])
+
+        next_states = [self.get_next_trigger_state(state, data is not None) for state in states.tolist()]
+        self.batch_states = np.array(next_states, dtype=np.int64)[stream_states.ravel()]
+
+        return self.batch_values[:, self.output_indices]
+
+    def fire_batch(self, fire):
+        if not fire.any():
+            return
+
+        values = self.batch_values
+
+        for activation, group in self.activation_groups:
+            group_values = values[:, group]
+            values[:, group] = np.where(fire[:, group], ActivationFunction.activate_array(activation, group_values),
+                                        group_values)
+
+        signals = values[:, self.sources] * self.weights * fire[:, self.sources]
+
+        values[fire & self.resets] = 0.0
+
+        # Add the signals of all streams with one bincount by giving every stream its own range of targets
+        stream_size = values.shape[0]
+        targets = (np.arange(stream_size)[:, None] * self.node_size + self.targets).ravel()
+        values += np.bincount(targets, weights=signals.ravel(), minlength=stream_size * self.node_size).reshape(
+            stream_size, self.node_size)
+
+    def clear_values(self):
+        self.values[~self.is_input] = 0.0
+
+    def write_back(self):
+        '''
+        Copies the node values to the node objects
+        '''
+        for node, value in zip(self.nodes, self.values.tolist()):
+            node.set_value(value)
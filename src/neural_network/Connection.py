@@ -46,6 +46,9 @@ class Connection:
     def get_id(self) -> int:
         return self.id
 
+    def set_id(self, ID):
+        self.id = ID
+
     def copy(self) -> 'Connection':
         new_connection = Connection(self.in_node, self.out_node, self.weight, self.id)
         new_connection.weight_shift_direction = self.weight_shift_direction
@@ -0,0 +1,304 @@
+import itertools
+import os
+import socketserver
+import threading
+import time
+
+import numpy as np
+
+from src.neural_network import SocketProtocol, YaneConfig
+from src.neural_network.EvolutionWorker import EvolutionWorker, run_tasks
+from src.neural_network.Genome import Genome
+from src.neural_network.NeuroEvolution import NeuroEvolution
+from src.neural_network.ParallelEvaluator import ParallelEvaluator
+from src.neural_network.TaskScheduler import TaskScheduler, REPRODUCE, MUTATE, EVALUATE, SPECIATE
+
+yane_config = YaneConfig.load_json_config()
+
+
+class EvolutionServer:
+    '''
+    Holds the population of a NeuroEvolution and hands out the work of every generation to EvolutionWorkers over a
+    TCP or Unix socket.
+
+    A generation is split into reproduce, mutate, evaluate and speciate tasks. The TaskScheduler only hands out a
+    task to workers that registered its type and prefers the fastest of them. The server runs a stage itself if no
+    connected worker can do it, so workers that can only do a part of the work are enough. Only evaluate needs the
+    evaluation function on the server for that.
+
+    Every handed out task is leased to one connection. When the connection closes or the lease expires, the task is
+    handed out again and a late result of the first worker is ignored. The results are applied in the order of the
+    tasks, so the parent bookkeeping is the same as with serial evaluation.
+    '''
+
+    def __init__(self, neuro_evolution: NeuroEvolution, address=('localhost', 0), lease_duration=60.0,
+                 poll_duration=1.0):
+        '''
+        :param address: Path of a Unix socket or (host, port) of a TCP socket. Port 0 takes a free port. Messages are
+                pickled, so every client can run code on the server. Only use other hosts than localhost in a trusted
+                network
+        :param lease_duration: Seconds until a task that was handed out is handed out again
+        :param poll_duration: Seconds that a request of a worker waits for new tasks before it gets an empty answer
+        '''
+        self.neuro_evolution = neuro_evolution
+        self.lease_duration = lease_duration
+        self.poll_duration = poll_duration
+        self.callback_evaluation = None
+
+        self.condition = threading.Condition()
+        self.scheduler = TaskScheduler(lease_duration)
+        self.results = {}
+        self.stopped = False
+
+        handler = self.create_handler()
+
+        if isinstance(address, str):
+            if os.path.exists(address):
+                os.remove(address)
+            self.server = socketserver.ThreadingUnixStreamServer(address, handler)
+        else:
+            self.server = socketserver.ThreadingTCPServer(address, handler)
+
+        self.server.daemon_threads = True
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_address(self):
+        return self.server.server_address
+
+    def close(self):
+        '''
+        Tells the workers to stop at their next request and closes the server
+        '''
+        with self.condition:
+            if self.stopped:
+                return
+
+            self.stopped = True
+            self.condition.notify_all()
+
+        self.server.shutdown()
+        self.server.server_close()
+
+        if isinstance(self.get_address(), str) and os.path.exists(self.get_address()):
+            os.remove(self.get_address())
+
+    def train(self, callback_evaluation=None, local_workers=0, batch_size=8):
+        '''
+        Trains the NeuroEvolution with the connected workers until it reaches its min fitness or max generations
+        :param callback_evaluation: Evaluation function of the local workers and of the server if no connected
+                worker can evaluate
+        :param local_workers: Number of worker processes that are started on this machine
+        '''
+        self.callback_evaluation = callback_evaluation
+        processes = EvolutionWorker.start_processes(callback_evaluation, self.get_address(), local_workers,
+                                                    batch_size)
+        neuro_evolution = self.neuro_evolution
+
+        try:
+            self.wait_for_workers(local_workers)
+            neuro_evolution.prepare_training()
+
+            while True:
+                neuro_evolution.clear_bad_species_genomes()
+                self.create_next_genomes()
+                self.evaluate_next_genomes()
+                neuro_evolution.print_generation()
+
+                if neuro_evolution.check_best_fitness() or neuro_evolution.check_max_generation():
+                    break
+        finally:
+            self.close()
+
+            for process in processes:
+                process.join()
+
+    def wait_for_workers(self, size, timeout=None):
+        '''
+        Waits until at least size workers are connected
+        :return: False if the timeout ran out before
+        '''
+        with self.condition:
+            return self.condition.wait_for(lambda: len(self.scheduler.workers) >= size, timeout)
+
+    def create_next_genomes(self):
+        '''
+        Same as NeuroEvolution.create_next_genomes with reproduce and mutate tasks
+        '''
+        neuro_evolution = self.neuro_evolution
+
+        if neuro_evolution.get_genomes_size() <= 0:
+            return
+
+        parent_pairs = neuro_evolution.select_parents()
+        parents = [Genome.get_primary_parent(genome, partner) for genome, partner in parent_pairs]
+
+        packed_pairs = [(ParallelEvaluator.pack_genome(genome),
+                         None if partner is None else ParallelEvaluator.pack_genome(partner))
+                        for genome, partner in parent_pairs]
+        child_genomes = [ParallelEvaluator.unpack_genome(child, genome)
+                         for child, genome in zip(self.run_tasks(REPRODUCE, packed_pairs), parents)]
+
+        mutated_genomes = self.run_tasks(MUTATE, [ParallelEvaluator.pack_genome(genome) for genome in child_genomes])
+        child_genomes = [ParallelEvaluator.unpack_genome(mutated_genome, genome)
+                         for mutated_genome, genome in zip(mutated_genomes, child_genomes)]
+
+        neuro_evolution.set_child_parents(child_genomes, parents)
+        neuro_evolution.add_evaluation(child_genomes)
+
+    def evaluate_next_genomes(self):
+        '''
+        Same as NeuroEvolution.evaluate_next_genome with evaluate and speciate tasks
+        '''
+        neuro_evolution = self.neuro_evolution
+        population = neuro_evolution.get_population()
+        genomes = []
+
+        while len(neuro_evolution.get_evaluation_list()) > 0:
+            genomes.append(neuro_evolution.get_evaluation_list().pop())
+
+        if len(genomes) <= 0:
+            return
+
+        for genome in genomes:
+            genome.set_net_cost(genome.calculate_net_cost())
+
+        results = self.run_tasks(EVALUATE, [ParallelEvaluator.pack_genome(genome) for genome in genomes])
+
+        for genome, (fitness, input_size) in zip(genomes, results):
+            genome.add_missing_input_nodes(input_size)
+            genome.apply_fitness(fitness)
+
+        representatives = [species.get_best_genome().get_signature()
+                           for species in population.get_representative_species()]
+        compatibilities = None
+
+        # With a species index the population compares the genomes only with their candidates itself
+        if len(representatives) > 0 and population.get_species_index() is None:
+            compatibilities = np.vstack(
+                self.run_tasks(SPECIATE, [(genome.get_signature(), representatives) for genome in genomes]))
+
+        population.add_genomes(genomes, compatibilities)
+        neuro_evolution.generation += len(genomes) / YaneConfig.get_max_population_size(yane_config)
+
+    def run_tasks(self, task_type, payloads: list) -> list:
+        '''
+        Hands out the tasks to the workers and waits for all results. Runs the tasks itself if no connected worker
+        can do them
+        :return: Result of every payload
+        '''
+        with self.condition:
+            task_ids = self.scheduler.add_tasks(task_type, payloads)
+            self.condition.notify_all()
+
+        while True:
+            with self.condition:
+                if all(task_id in self.results for task_id in task_ids):
+                    return [self.results.pop(task_id) for task_id in task_ids]
+
+                local_tasks = []
+                if not self.scheduler.has_capable_worker(task_type) and self.can_run_locally(task_type):
+                    local_tasks = self.scheduler.take_queued_tasks(task_type)
+
+                if len(local_tasks) <= 0:
+                    self.condition.wait(self.lease_duration)
+                    self.scheduler.release_expired_leases()
+                    continue
+
+            local_task_ids, local_payloads = zip(*local_tasks)
+            local_results = run_tasks(task_type, list(local_payloads), self.callback_evaluation,
+                                      self.neuro_evolution.random_generator)
+
+            with self.condition:
+                self.results.update(self.scheduler.complete_tasks(None, task_type,
+                                                                  list(zip(local_task_ids, local_results))))
+
+    def can_run_locally(self, task_type):
+        return task_type != EVALUATE or self.callback_evaluation is not None
+
+    def register_worker(self, connection_id, capabilities):
+        with self.condition:
+            self.scheduler.register_worker(connection_id, capabilities)
+            self.condition.notify_all()
+
+    def take_tasks(self, connection_id, size) -> (str, list):
+        '''
+        Waits up to the poll duration for tasks that the worker can do
+        '''
+        with self.condition:
+            if connection_id not in self.scheduler.workers:
+                self.scheduler.register_worker(connection_id, [EVALUATE])
+
+            deadline = time.monotonic() + self.poll_duration
+
+            while True:
+                task_type, tasks = self.scheduler.take_tasks(connection_id, size)
+                remaining = deadline - time.monotonic()
+
+                if len(tasks) > 0 or self.stopped or remaining <= 0:
+                    return task_type, tasks
+
+                self.condition.wait(remaining)
+
+    def add_results(self, connection_id, task_type, results):
+        with self.condition:
+            self.results.update(self.scheduler.complete_tasks(connection_id, task_type, results))
+            self.condition.notify_all()
+
+    def release_connection(self, connection_id):
+        '''
+        Hands out the tasks of a closed connection again
+        '''
+        with self.condition:
+            self.scheduler.remove_worker(connection_id)
+            self.condition.notify_all()
+
+    def is_stopped(self):
+        with self.condition:
+            return self.stopped
+
+    def create_handler(self):
+        evolution_server = self
+        connection_ids = itertools.count()
+
+        class EvolutionRequestHandler(socketserver.BaseRequestHandler):
+            def handle(self):
+                connection_id = next(connection_ids)
+
+                try:
+                    while True:
+                        message = SocketProtocol.receive_message(self.request)
+
+                        if message is None:
+                            return
+
+                        if message["type"] == "register":
+                            evolution_server.register_worker(connection_id, message["capabilities"])
+                            continue
+
+                        if message["type"] == "results":
+                            evolution_server.add_results(connection_id, message["task_type"], message["results"])
+                            continue
+
+                        task_type, tasks = evolution_server.take_tasks(connection_id, message["size"])
+
+                        if len(tasks) > 0:
+                            SocketProtocol.send_message(self.request,
+                                                        {"type": "tasks", "task_type": task_type, "tasks": tasks})
+                        elif evolution_server.is_stopped():
+                            SocketProtocol.send_message(self.request, {"type": "stop"})
+                            return
+                        else:
+                            SocketProtocol.send_message(self.request, {"type": "wait", "delay": 0})
+                except OSError:
+                    pass
+                finally:
+                    evolution_server.release_connection(connection_id)
+
+        return EvolutionRequestHandler
@@ -0,0 +1,130 @@
+import time
+
+import numpy as np
+
+from src.neural_network import SocketProtocol
+from src.neural_network.Genome import Genome
+from src.neural_network.ParallelEvaluator import get_process_context
+from src.neural_network.TaskScheduler import REPRODUCE, MUTATE, EVALUATE, SPECIATE, TASK_TYPES
+
+
+class EvolutionWorker:
+    '''
+    Pulls tasks from an EvolutionServer, runs them and sends the results back.
+
+    Protocol (see SocketProtocol), the worker always starts:
+    - {"type": "register", "capabilities": [task types]}: first message, no answer. Workers that do not register
+      can only evaluate
+    - {"type": "request", "size": n}: asks for up to n tasks. The server answers with
+      {"type": "tasks", "task_type": task type, "tasks": [(task_id, payload), ...]},
+      {"type": "wait", "delay": seconds} or {"type": "stop"}
+    - {"type": "results", "task_type": task type, "results": [(task_id, result), ...]}: no answer
+
+    The payloads and results of every task type are described in run_tasks.
+    '''
+
+    def __init__(self, callback_evaluation, address, batch_size=8, capabilities=None):
+        '''
+        :param callback_evaluation: Function that takes a genome and returns its fitness. None if the worker does not
+                evaluate
+        :param address: Path of a Unix socket or (host, port) of a TCP socket
+        :param batch_size: Maximum number of tasks that are requested at once
+        :param capabilities: Task types that the worker does. All task types if None, except evaluate without
+                evaluation function
+        '''
+        if capabilities is None:
+            capabilities = [task_type for task_type in TASK_TYPES
+                            if task_type != EVALUATE or callback_evaluation is not None]
+
+        self.callback_evaluation = callback_evaluation
+        self.address = address
+        self.batch_size = batch_size
+        self.capabilities = list(capabilities)
+        self.random_generator = np.random.default_rng()
+
+    def run(self):
+        '''
+        Runs tasks until the server stops or closes the connection
+        '''
+        with SocketProtocol.create_connection(self.address) as connection:
+            SocketProtocol.send_message(connection, {"type": "register", "capabilities": self.capabilities})
+
+            while True:
+                SocketProtocol.send_message(connection, {"type": "request", "size": self.batch_size})
+                message = SocketProtocol.receive_message(connection)
+
+                if message is None or message["type"] == "stop":
+                    return
+
+                if message["type"] == "wait":
+                    time.sleep(message["delay"])
+                    continue
+
+                task_ids, payloads = zip(*message["tasks"])
+                results = run_tasks(message["task_type"], list(payloads), self.callback_evaluation,
+                                    self.random_generator)
+                SocketProtocol.send_message(connection, {"type": "results", "task_type": message["task_type"],
+                                                         "results": list(zip(task_ids, results))})
+
+    @staticmethod
+    def start_processes(callback_evaluation, address, workers, batch_size=8, capabilities=None) -> list:
+        '''
+        Starts local worker processes, e.g. to run the whole pipeline on one machine
+        :return: The started processes
+        '''
+        context = get_process_context()
+        processes = []
+
+        for _ in range(workers):
+            process = context.Process(target=run_worker,
+                                      args=(callback_evaluation, address, batch_size, capabilities), daemon=True)
+            process.start()
+            processes.append(process)
+
+        return processes
+
+
+def run_worker(callback_evaluation, address, batch_size, capabilities=None):
+    EvolutionWorker(callback_evaluation, address, batch_size, capabilities).run()
+
+
+def run_tasks(task_type, payloads: list, callback_evaluation=None, random_generator: np.random.Generator = None) \
+        -> list:
+    '''
+    Runs tasks of one type. The genomes are compact copies without parent, see ParallelEvaluator.pack_genome
+    - reproduce: (genome, crossover partner or None) -> child genome
+    - mutate: genome -> mutated genome. New genes get the same ids as in every other process, see InnovationIds
+    - evaluate: genome -> (fitness, number of input nodes after the evaluation)
+    - speciate: (genome signature, signatures of the species representatives) -> compatibility to every
+      representative
+    :param random_generator: Random generator for reproduce and mutate. Uses the generators of the genomes if None
+    :return: Result of every payload
+    '''
+    if task_type == REPRODUCE:
+        children = []
+
+        for genome, partner in payloads:
+            if random_generator is not None:
+                genome.set_random_generator(random_generator)
+
+            child = Genome.reproduce(genome, partner)
+            child.set_parent(None)
+            children.append(child)
+
+        return children
+
+    if task_type == MUTATE:
+        if random_generator is not None:
+            for genome in payloads:
+                genome.set_random_generator(random_generator)
+
+        Genome.mutate_genomes(payloads, random_generator)
+        return payloads
+
+    if task_type == EVALUATE:
+        return [(genome.evaluate(callback_evaluation), genome.get_input_size()) for genome in payloads]
+
+    if task_type == SPECIATE:
+        return [signature.get_compatibilities(representatives) for signature, representatives in payloads]
+
+    raise ValueError("Unknown task type: " + str(task_type))
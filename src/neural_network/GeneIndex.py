@@ -0,0 +1,94 @@
+import random
+
+
+class GeneIndex:
+    '''
+    Set of genes (nodes or connections) indexed by their id.
+
+    Membership, lookup by id, adding, removing and drawing a random gene are O(1). The genes sorted by id are cached
+    until the next change.
+    '''
+
+    def __init__(self, genes=None):
+        self.genes = {}
+        self.gene_list = []
+        self.positions = {}
+        self.sorted_genes = None
+
+        if genes is not None:
+            for gene in genes:
+                self.add(gene)
+
+    def __len__(self):
+        return len(self.gene_list)
+
+    def __iter__(self):
+        return iter(self.gene_list)
+
+    def __contains__(self, gene):
+        return self.genes.get(gene.get_id()) is gene
+
+    def contains_id(self, gene_id):
+        return gene_id in self.genes
+
+    def add(self, gene):
+        '''
+        :return: False if a gene with the same id already exists
+        '''
+        if gene.get_id() in self.genes:
+            return False
+
+        self.genes[gene.get_id()] = gene
+        self.positions[gene.get_id()] = len(self.gene_list)
+        self.gene_list.append(gene)
+        self.sorted_genes = None
+        return True
+
+    def remove(self, gene):
+        '''
+        :return: False if the gene is not in the index
+        '''
+        if gene not in self:
+            return False
+
+        # Move the last gene into the gap, so removing does not shift the list
+        position = self.positions.pop(gene.get_id())
+        last_gene = self.gene_list.pop()
+
+        if last_gene is not gene:
+            self.gene_list[position] = last_gene
+            self.positions[last_gene.get_id()] = position
+
+        del self.genes[gene.get_id()]
+        self.sorted_genes = None
+        return True
+
+    def clear(self):
+        self.genes.clear()
+        self.gene_list.clear()
+        self.positions.clear()
+        self.sorted_genes = None
+
+    def get_by_id(self, gene_id):
+        return self.genes.get(gene_id)
+
+    def get_random(self, random_generator=None):
+        '''
+        :param random_generator: numpy random generator to draw from, the random module is used if None
+        '''
+        if len(self.gene_list) <= 0:
+            return None
+
+        if random_generator is not None:
+            return self.gene_list[random_generator.integers(len(self.gene_list))]
+
+        return self.gene_list[random.randrange(len(self.gene_list))]
+
+    def get_sorted(self) -> list:
+        '''
+        Genes sorted by id. The list is shared and must not be changed
+        '''
+        if self.sorted_genes is None:
+            self.sorted_genes = sorted(self.gene_list, key=lambda gene: gene.get_id())
+
+        return self.sorted_genes
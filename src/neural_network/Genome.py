@@ -1,12 +1,16 @@
-import random
 from copy import deepcopy
 
 import matplotlib.pyplot as plt
 import networkx as nx
 import numpy as np
 
-from src.neural_network import YaneConfig
+from src.neural_network import YaneConfig, InnovationIds
+from src.neural_network.ActivationFunction import ActivationFunction
+from src.neural_network.CompiledNetwork import CompiledNetwork
+from src.neural_network.CompiledPopulation import CompiledPopulation
 from src.neural_network.Connection import Connection
+from src.neural_network.GenomeSignature import GenomeSignature
+from src.neural_network.InferenceHandle import InferenceHandle
 from src.neural_network.NeuralNetwork import NeuralNetwork
 from src.neural_network.Node import Node
 from src.neural_network.NodeTypes import NodeTypes
@@ -14,27 +18,42 @@ from src.neural_network.exceptions.InvalidConnection import InvalidConnection
 
 yane_config = YaneConfig.load_json_config()
 
+# Used by all genomes that did not get their own random generator
+default_random_generator = np.random.default_rng()
+
 
 class Genome:
-    def __init__(self, node_genes=None):
+    def __init__(self, node_genes=None, random_generator: np.random.Generator = None):
+        '''
+        :param node_genes: Nodes of the genome
+        :param random_generator: Random generator for all mutations. Children use the generator of their
+                parent. Uses a shared generator if None
+        '''
+        if random_generator is None:
+            random_generator = default_random_generator
+
+        self.random_generator = random_generator
         self.bad_reproduction_count = 0
-        self.brain: NeuralNetwork = NeuralNetwork()
+        self.brain: NeuralNetwork | None = self.create_brain()
         self.parent: Genome | None = None
         self.fitness = None
         self.net_cost = None
         self.reproduction_count = 0
+        self.signature: GenomeSignature | None = None
+        self.signature_change_count = None
 
         # TODO: Put connection and node related mutation rates in their respective classes
 
         # Mutation probability
+        random_rates = self.random_generator.random(7).tolist()
         self.mutation_rates = {
-            'activation_function_probability': random.random(),  # probability of mutating activation function
-            'add_connection_probability': random.random(),  # probability of adding connection
-            'remove_connection_probability': random.random(),  # probability of removing connection
-            'add_node_probability': random.random(),  # probability of adding node
-            'remove_node_probability': random.random(),  # probability of removing node
-            'shift_probability': random.random(),  # probability of shifting weight
-            'weight_probability': random.random(),  # probability of mutating weight
+            'activation_function_probability': random_rates[0],  # probability of mutating activation function
+            'add_connection_probability': random_rates[1],  # probability of adding connection
+            'remove_connection_probability': random_rates[2],  # probability of removing connection
+            'add_node_probability': random_rates[3],  # probability of adding node
+            'remove_node_probability': random_rates[4],  # probability of removing node
+            'shift_probability': random_rates[5],  # probability of shifting weight
+            'weight_probability': random_rates[6],  # probability of mutating weight
             'mutation_probability': 0.8,  # probability of mutating a mutation
         }
 
@@ -49,79 +68,101 @@ class Genome:
                 self.add_node(node)
 
     @classmethod
-    def crossover_connections(cls, genome1, genome2):
-        connection_genes1 = genome1.get_brain().get_all_connections()
-        connection_genes2 = genome2.get_brain().get_all_connections()
-
-        return Genome.crossover_genes(connection_genes1, connection_genes2)
-
-    @classmethod
-    def align_gene_ids(cls, genes1, genes2):
-        aligned_genes = []
-
-        index1 = 0
-        index2 = 0
-
-        while index1 < len(genes1) and index2 < len(genes2):
-            node1 = genes1[index1]
-            node2 = genes2[index2]
-
-            if node1.get_id() == node2.get_id():
-                aligned_genes.append((node1, node2))
-                index1 += 1
-                index2 += 1
-            elif node1.get_id() < node2.get_id():
-                aligned_genes.append((node1, None))
-                index1 += 1
-            elif node1.get_id() > node2.get_id():
-                aligned_genes.append((None, node2))
-                index2 += 1
-
-        while index1 < len(genes1):
-            aligned_genes.append((genes1[index1], None))
-            index1 += 1
-
-        while index2 < len(genes2):
-            aligned_genes.append((None, genes2[index2]))
-            index2 += 1
-
-        return aligned_genes
-
-    @classmethod
-    def crossover_genes(cls, gene1, gene2) -> list:
-        aligned_genes = Genome.align_gene_ids(gene1, gene2)
+    def crossover(cls, genome1: 'Genome', genome2: 'Genome') -> 'Genome':
+        '''
+        Aligns the genes of both genomes by id. Matching genes are taken from a random parent, all other genes from
+        the parent that has them. The child gets copies of the genes and the mutation parameters of genome1, so
+        genome1 should be the fitter parent. Connections that connect the same nodes as an older connection or
+        that would create a cycle in a dag only network are skipped.
+        '''
+        child_genome = cls(random_generator=genome1.get_random_generator())
+        random_generator = child_genome.get_random_generator()
+        child_brain = child_genome.get_brain()
+        brain1 = genome1.get_brain()
+        brain2 = genome2.get_brain()
+
+        nodes1 = sorted(brain1.get_all_nodes(), key=Node.get_id)
+        nodes2 = sorted(brain2.get_all_nodes(), key=Node.get_id)
+        node_genes = Genome.take_aligned_genes(nodes1, nodes2, random_generator)
+
+        for node in node_genes:
+            child_genome.add_node(node.copy())
+
+        child_brain.copy_topological_order(brain1)
+
+        connection_genes = Genome.take_aligned_genes(brain1.get_all_connections(), brain2.get_all_connections(),
+                                                     random_generator)
+
+        # Connections that were not recurrent first, so the order of genome1 changes as little as possible
+        recurrent_connections = brain1.recurrent_connections | brain2.recurrent_connections
+        connection_genes.sort(key=recurrent_connections.__contains__)
+
+        for connection in connection_genes:
+            new_connection = connection.copy()
+            new_connection.set_in_node(child_brain.get_node_by_id(connection.get_in_node().get_id()))
+            new_connection.set_out_node(child_brain.get_node_by_id(connection.get_out_node().get_id()))
 
-        new_genes = []
+            try:
+                child_brain.add_connection(new_connection)
+            except InvalidConnection:
+                pass
 
-        for gene1, gene2 in aligned_genes:
-            if gene1 is None:
-                new_genes.append(gene2)
-            elif gene2 is None:
-                new_genes.append(gene1)
-            else:
-                if random.random() < 0.5:
-                    new_genes.append(gene1)
-                else:
-                    new_genes.append(gene2)
+        child_genome.mutation_rates = dict(genome1.mutation_rates)
+        child_genome.mutation_num = dict(genome1.mutation_num)
+        child_genome.parent = genome1
 
-        return deepcopy(new_genes)
+        return child_genome
 
-    @classmethod
-    def crossover_nodes(cls, genome1, genome2) -> list:
-        node_genes1 = genome1.get_brain().get_all_nodes()
-        node_genes2 = genome2.get_brain().get_all_nodes()
+    @staticmethod
+    def align_genes(ids1, ids2, random_generator: np.random.Generator):
+        '''
+        Sorted merge of the gene ids of two genomes
+        :param ids1: Sorted gene ids of the first genome
+        :param ids2: Sorted gene ids of the second genome
+        :return: All ids of both genomes, True where the gene is taken from the second genome and the index of
+                every gene in both genomes (only valid where the gene is taken from that genome)
+        '''
+        ids = np.union1d(ids1, ids2)
+        indices1 = np.searchsorted(ids1, ids)
+        indices2 = np.searchsorted(ids2, ids)
+        in1 = ids1[np.minimum(indices1, len(ids1) - 1)] == ids if len(ids1) > 0 else np.zeros(len(ids), dtype=bool)
+        in2 = ids2[np.minimum(indices2, len(ids2) - 1)] == ids if len(ids2) > 0 else np.zeros(len(ids), dtype=bool)
+
+        from_second = in2 & (~in1 | (random_generator.random(len(ids)) < 0.5))
+        return ids, from_second, (indices1, indices2)
+
+    @staticmethod
+    def take_aligned_genes(genes1: list, genes2: list, random_generator: np.random.Generator) -> list:
+        '''
+        :param genes1: Genes of the first genome sorted by id
+        :param genes2: Genes of the second genome sorted by id
+        :return: The chosen genes of both genomes sorted by id. The genes are not copied
+        '''
+        ids1 = np.fromiter((gene.get_id() for gene in genes1), dtype=np.int64, count=len(genes1))
+        ids2 = np.fromiter((gene.get_id() for gene in genes2), dtype=np.int64, count=len(genes2))
+        _, from_second, (indices1, indices2) = Genome.align_genes(ids1, ids2, random_generator)
+
+        return [genes2[index2] if second else genes1[index1] for second, index1, index2 in
+                zip(from_second.tolist(), indices1.tolist(), indices2.tolist())]
+
+    def create_brain(self) -> NeuralNetwork | None:
+        return NeuralNetwork()
 
-        return Genome.crossover_genes(node_genes1, node_genes2)
+    def get_brain(self) -> NeuralNetwork:
+        return self.brain
 
-    @classmethod
-    def crossover(cls, genome1, genome2) -> 'Genome':
-        node_genes = Genome.crossover_nodes(genome1, genome2)
-        child_genome = Genome(node_genes)
+    def get_random_generator(self) -> np.random.Generator:
+        return self.random_generator
 
-        return child_genome
+    def set_random_generator(self, random_generator: np.random.Generator):
+        self.random_generator = random_generator
 
-    def get_brain(self) -> NeuralNetwork:
-        return self.brain
+    def set_seed(self, seed):
+        '''
+        Gives the genome and all its future children a new random generator with the given seed. All mutations of
+        the genome draw from it, the random module is not used
+        '''
+        self.random_generator = np.random.default_rng(seed)
 
     def get_fitness(self):
         return self.fitness
@@ -139,36 +180,115 @@ class Genome:
     # This function is used to evaluate the fitness of a genome
     # You have to implement this function yourself since it is specific to your problem
     def evaluate(self, callback_evaluator):
-        self.set_net_cost(self.get_brain().calculate_net_cost())
+        self.set_net_cost(self.calculate_net_cost())
         fitness_result = callback_evaluator(self)
 
         self.clear_hidden_output_nodes()
 
+        return self.apply_fitness(fitness_result)
+
+    async def evaluate_async(self, callback_evaluator):
+        '''
+        Same as evaluate, but callback_evaluator is a coroutine function
+        '''
+        self.set_net_cost(self.calculate_net_cost())
+        fitness_result = await callback_evaluator(self)
+
+        self.clear_hidden_output_nodes()
+
+        return self.apply_fitness(fitness_result)
+
+    @staticmethod
+    def evaluate_genomes(genomes: list['Genome'], callback_batch_evaluator, compiled=False) -> np.ndarray:
+        '''
+        Same as evaluate for every genome, but one call of callback_batch_evaluator scores all genomes, e.g. with
+        one vectorized computation. The fitness values are applied in the order of the genomes
+        :param callback_batch_evaluator: Function that takes the genomes and returns one fitness per genome
+        :param compiled: The function gets a CompiledPopulation of the genomes instead of the list
+        :return: Fitness of every genome
+        '''
+        for genome in genomes:
+            genome.set_net_cost(genome.calculate_net_cost())
+
+        batch = CompiledPopulation(genomes) if compiled else genomes
+        fitness_results = np.asarray(callback_batch_evaluator(batch), dtype=np.float64).reshape(-1)
+
+        if len(fitness_results) != len(genomes):
+            raise ValueError("Batch evaluation returned " + str(len(fitness_results)) + " fitness values for " +
+                             str(len(genomes)) + " genomes")
+
+        for genome, fitness_result in zip(genomes, fitness_results):
+            genome.clear_hidden_output_nodes()
+            genome.apply_fitness(fitness_result)
+
+        return fitness_results
+
+    def apply_fitness(self, fitness_result):
+        '''
+        Sets the fitness and updates the bookkeeping of the parent. Used by evaluate and for fitness values that
+        were calculated somewhere else, e.g. in another process
+        '''
         if self.parent is not None and fitness_result >= self.parent.get_fitness():
             self.parent.set_bad_reproduction_count(0)
 
         # Child genome is worse than parent genome
         if self.parent is not None and fitness_result < self.parent.get_fitness():
             self.parent.set_bad_reproduction_count(self.parent.get_bad_reproduction_count() + 1)
-
-            parent_connection = self.get_parent().get_brain().get_last_weight_shift_connection()
-            if parent_connection is not None:
-                parent_connection.switch_weight_shift_direction()
+            self.parent.switch_last_weight_shift_direction()
 
         self.set_fitness(fitness_result)
         return self.get_fitness()
 
+    def calculate_net_cost(self):
+        return self.get_brain().calculate_net_cost()
+
+    def switch_last_weight_shift_direction(self):
+        connection = self.get_brain().get_last_weight_shift_connection()
+
+        if connection is not None:
+            connection.switch_weight_shift_direction()
+
+    @staticmethod
+    def reproduce(genome: 'Genome', partner: 'Genome' = None) -> 'Genome':
+        '''
+        Copies the genome or crosses it with the partner. The fitter genome is the first parent, see
+        get_primary_parent
+        '''
+        if partner is None:
+            return genome.copy()
+
+        if Genome.get_primary_parent(genome, partner) is partner:
+            return genome.crossover(partner, genome)
+
+        return genome.crossover(genome, partner)
+
+    @staticmethod
+    def get_primary_parent(genome: 'Genome', partner: 'Genome' = None) -> 'Genome':
+        '''
+        :return: The parent that the child of reproduce takes its mutation parameters and weight shifts from. The
+                bookkeeping of the child belongs to this parent
+        '''
+        if partner is not None and partner.get_fitness() is not None and genome.get_fitness() is not None and \
+                partner.get_fitness() > genome.get_fitness():
+            return partner
+
+        return genome
+
     def copy(self):
-        new_genome = Genome()
+        new_genome = Genome(random_generator=self.random_generator)
+
+        new_brain = new_genome.get_brain()
 
         for node in self.get_brain().get_all_nodes():
             new_genome.add_node(node.copy())
 
+        new_brain.copy_topological_order(self.get_brain())
+
         for connection in self.get_brain().get_all_connections():
             new_connection = connection.copy()
-            new_connection.set_in_node(new_genome.get_brain().get_node_by_id(connection.get_in_node().get_id()))
-            new_connection.set_out_node(new_genome.get_brain().get_node_by_id(connection.get_out_node().get_id()))
-            new_genome.add_connection(new_connection)
+            new_connection.set_in_node(new_brain.get_node_by_id(connection.get_in_node().get_id()))
+            new_connection.set_out_node(new_brain.get_node_by_id(connection.get_out_node().get_id()))
+            new_brain.add_connection(new_connection, self.get_brain().is_recurrent_connection(connection))
 
         new_genome.mutation_rates = deepcopy(self.mutation_rates)
         new_genome.mutation_num = deepcopy(self.mutation_num)
@@ -176,51 +296,113 @@ class Genome:
 
         return new_genome
 
+    def copy_evolution_state(self, genome: 'Genome'):
+        '''
+        Takes over everything except the genes
+        '''
+        self.mutation_rates = dict(genome.mutation_rates)
+        self.mutation_num = dict(genome.mutation_num)
+        self.fitness = genome.fitness
+        self.net_cost = genome.net_cost
+        self.reproduction_count = genome.reproduction_count
+        self.bad_reproduction_count = genome.bad_reproduction_count
+        self.parent = genome.parent
+        self.random_generator = genome.random_generator
+
     def add_node(self, node: Node):
-        self.brain.add_node(node)
+        self.get_brain().add_node(node)
+        self.invalidate_cache()
 
     def mutate(self):
         self.mutate_nodes()
         self.mutate_connections()
         self.mutate_mutation_rates()
         self.mutate_mutation_nums()
+        self.invalidate_cache()
 
-    def mutate_nodes(self):
-        nodes = self.get_hidden_nodes() + self.get_output_nodes()
-
-        for node in nodes:
-            if random.random() < self.mutation_rates['activation_function_probability']:
-                node.mutate_activation_function()
+    def invalidate_cache(self):
+        self.get_brain().invalidate_cache()
+        self.signature = None
 
+    def mutate_nodes(self):
+        self.mutate_activation_functions()
+        self.mutate_node_structure()
+
+    def mutate_activation_functions(self):
+        activation_codes = self.get_activation_codes()
+        Genome.mutate_activation_codes(activation_codes, self.mutation_rates['activation_function_probability'],
+                                       self.random_generator)
+        self.set_activation_codes(activation_codes)
+
+    @staticmethod
+    def mutate_activation_codes(activation_codes: np.ndarray, probabilities, random_generator: np.random.Generator):
+        '''
+        Replaces activation codes in place by random activation functions of the config
+        :param probabilities: Mutation probability for all codes or for every single code
+        '''
+        choices = np.array([ActivationFunction.get_code(ActivationFunction.get_function(name)) for name in
+                            YaneConfig.get_activation_functions(yane_config)], dtype=np.int8)
+
+        mask = random_generator.random(len(activation_codes)) < probabilities
+        activation_codes[mask] = choices[random_generator.integers(len(choices), size=np.count_nonzero(mask))]
+
+    def get_activation_codes(self) -> np.ndarray:
+        '''
+        :return: Activation codes of the hidden and output nodes
+        '''
+        return np.array([ActivationFunction.get_code(node.get_activation()) for node in
+                         self.get_hidden_nodes() + self.get_output_nodes()], dtype=np.int8)
+
+    def set_activation_codes(self, activation_codes: np.ndarray):
+        for node, code in zip(self.get_hidden_nodes() + self.get_output_nodes(), activation_codes.tolist()):
+            node.set_activation(ActivationFunction.get_function_by_code(code))
+
+    def mutate_node_structure(self):
         for _ in range(self.mutation_num['num_structural_mutations_node']):
-            if random.random() < self.mutation_rates['add_node_probability']:
+            if self.random_generator.random() < self.mutation_rates['add_node_probability']:
                 self.add_random_node()
-            if random.random() < self.mutation_rates['remove_node_probability']:
+            if self.random_generator.random() < self.mutation_rates['remove_node_probability']:
                 self.remove_random_node()
 
+    def create_node(self, node_type: NodeTypes, node_id=None) -> Node:
+        '''
+        :return: New node with a random activation function drawn from the random generator of the genome
+        '''
+        activation = YaneConfig.get_random_activation_function(yane_config, self.random_generator)
+        return Node(node_type, node_id, activation=ActivationFunction.get_function(activation))
+
     def add_random_node(self):
 
-        if len(self.get_all_connections()) <= 0:
+        connection = self.get_brain().get_random_connection(self.random_generator)
+
+        if connection is None:
             return None
 
-        connection = random.choice(self.get_all_connections())
         node_in: Node = connection.get_in_node()
+        node_out_id = connection.get_out_node().get_id()
+        new_node_id = InnovationIds.get_node_id(connection.get_id(), node_in.get_id(), node_out_id)
+
+        # The genome already got this split from a crossover
+        if self.get_brain().get_node_by_id(new_node_id) is not None:
+            return None
 
-        new_node = Node(NodeTypes.HIDDEN)
-        new_connection = Connection(weight=1.0)
+        new_node = self.create_node(NodeTypes.HIDDEN, new_node_id)
+        new_connection = Connection(weight=1.0, ID=InnovationIds.get_connection_id(node_in.get_id(), new_node_id))
 
         self.add_node(new_node)
 
         # A ---> C
         # A ---> B ---> C
+        # B ---> C is a new innovation, so A ---> C can be added again and means the same in every genome
 
+        self.get_brain().remove_connection(connection)
+        connection.set_in_node(new_node)
+        connection.set_id(InnovationIds.get_connection_id(new_node_id, node_out_id))
         new_connection.set_in_node(node_in)
         new_connection.set_out_node(new_node)
-        connection.set_in_node(new_node)
-        node_in.remove_connection(connection)
-        new_node.add_connection(connection)
 
         self.add_connection(new_connection)
+        self.add_connection(connection)
 
         return new_node
 
@@ -228,61 +410,119 @@ class Genome:
         nodes = self.get_hidden_nodes()
 
         if len(nodes) > 0:
-            node = random.choice(nodes)
+            node = nodes[self.random_generator.integers(len(nodes))]
             self.remove_node(node)
 
     def remove_node(self, remove_node):
-        if remove_node in self.brain.input_nodes:
-            self.brain.input_nodes.remove(remove_node)
-        elif remove_node in self.brain.hidden_nodes:
-            self.brain.hidden_nodes.remove(remove_node)
-        elif remove_node in self.brain.output_nodes:
-            self.brain.output_nodes.remove(remove_node)
-
-        for previous_connection in remove_node.get_previous_connections():
-            previous_connection.get_in_node().remove_next_connection(previous_connection)
+        self.get_brain().remove_node(remove_node)
+        self.invalidate_cache()
 
-        for next_connection in remove_node.get_next_connections():
-            next_connection.get_out_node().remove_previous_connection(next_connection)
+    def get_connection_size(self):
+        return self.get_brain().get_connection_size()
 
     def mutate_connections(self):
-        connections = self.get_all_connections()
-
-        if len(connections) <= 0:
+        if self.get_connection_size() <= 0:
             self.add_random_connection()
             return
 
-        for connection in connections:
-            if random.random() < self.mutation_rates['weight_probability']:
-                connection.mutate_weight_random()
-            if random.random() < self.mutation_rates['shift_probability']:
-                self.brain.last_weight_shift_connection = connection.mutate_weight_shift()
+        weights, shift_directions = self.get_weights()
+        shift_mask = Genome.mutate_weights(weights, shift_directions, self.mutation_rates['weight_probability'],
+                                           self.mutation_rates['shift_probability'], self.random_generator)
+        self.set_weights(weights, Genome.get_last_index(shift_mask))
+        self.mutate_connection_structure()
 
+    def mutate_connection_structure(self):
         for _ in range(self.mutation_num['num_structural_mutations_connection']):
-            if random.random() < self.mutation_rates['add_connection_probability']:
+            if self.random_generator.random() < self.mutation_rates['add_connection_probability']:
                 self.add_random_connection()
-            if random.random() < self.mutation_rates['remove_connection_probability']:
+            if self.random_generator.random() < self.mutation_rates['remove_connection_probability']:
                 self.remove_random_connection()
 
-    def remove_random_connection(self):
+    def get_weights(self) -> (np.ndarray, np.ndarray):
+        '''
+        :return: Weights and shift directions of all connections sorted by id
+        '''
         connections = self.get_all_connections()
+        weights = np.array([connection.get_weight() for connection in connections], dtype=np.float64)
+        shift_directions = np.array([connection.get_weight_shift_direction() for connection in connections],
+                                    dtype=bool)
+
+        return weights, shift_directions
+
+    def set_weights(self, weights: np.ndarray, last_shift_index=None):
+        '''
+        :param weights: Weights of all connections sorted by id
+        :param last_shift_index: Index of the connection that was shifted last or None
+        '''
+        connections = self.get_all_connections()
+
+        for connection, weight in zip(connections, weights.tolist()):
+            connection.set_weight(weight)
+
+        if last_shift_index is not None:
+            self.get_brain().last_weight_shift_connection = connections[last_shift_index]
+
+        self.invalidate_cache()
+
+    @staticmethod
+    def mutate_weights(weights: np.ndarray, shift_directions: np.ndarray, weight_probabilities, shift_probabilities,
+                       random_generator: np.random.Generator) -> np.ndarray:
+        '''
+        Mutates the weights in place. Every weight is replaced by a random weight with the weight probability and
+        then shifted in its shift direction with the shift probability. All random numbers are drawn at once.
+        :param weights: Weights of all connections
+        :param shift_directions: Shift direction of all connections (True is positive)
+        :param weight_probabilities: Probability for a random weight, for all weights or for every single weight
+        :param shift_probabilities: Probability for a weight shift, for all weights or for every single weight
+        :return: Mask of the shifted weights
+        '''
+        weight_min = YaneConfig.get_mutation_weight_min(yane_config)
+        weight_max = YaneConfig.get_mutation_weight_max(yane_config)
+        shift_min = YaneConfig.get_weight_shift_min(yane_config)
+        shift_max = YaneConfig.get_weight_shift_max(yane_config)
+
+        random_values = random_generator.random((4, len(weights)))
+
+        random_mask = random_values[0] < weight_probabilities
+        weights[random_mask] = weight_min + random_values[1, random_mask] * (weight_max - weight_min)
+
+        shift_mask = random_values[2] < shift_probabilities
+        shifts = shift_min + random_values[3, shift_mask] * (shift_max - shift_min)
+        shifts[~shift_directions[shift_mask]] *= -1
+        weights[shift_mask] = np.clip(weights[shift_mask] + shifts, weight_min, weight_max)
+
+        return shift_mask
+
+    @staticmethod
+    def get_last_index(mask: np.ndarray):
+        indices = np.flatnonzero(mask)
+
+        if len(indices) <= 0:
+            return None
+
+        return int(indices[-1])
+
+    def remove_random_connection(self):
+        connection = self.get_brain().get_random_connection(self.random_generator)
 
-        if len(connections) > 0:
-            connection = random.choice(connections)
+        if connection is not None:
             self.remove_connection(connection)
 
     def remove_connection(self, remove_connection: Connection):
-        if remove_connection in self.get_all_connections():
-            remove_connection.get_in_node().remove_connection(remove_connection)
+        self.get_brain().remove_connection(remove_connection)
+        self.invalidate_cache()
 
     def add_random_connection(self):
         random_node_in: Node = self.get_random_node()
         random_node_out: Node = self.get_random_node()
 
-        connection = Connection()
+        if random_node_in is None or random_node_out is None:
+            return
+
+        connection = Connection(weight=YaneConfig.get_random_mutation_weight(yane_config, self.random_generator),
+                                ID=InnovationIds.get_connection_id(random_node_in.get_id(), random_node_out.get_id()))
         connection.set_in_node(random_node_in)
         connection.set_out_node(random_node_out)
-        connection.set_weight(YaneConfig.get_random_mutation_weight(yane_config))
 
         try:
             self.add_connection(connection)
@@ -311,29 +551,49 @@ class Genome:
 
         print()
 
-        self.brain.print()
+        self.get_brain().print()
 
     def get_all_nodes(self):
-        return self.brain.get_all_nodes()
+        return self.get_brain().get_all_nodes()
 
     def add_connection(self, connection):
-        self.brain.add_connection(connection)
+        self.get_brain().add_connection(connection)
+        self.invalidate_cache()
+
+    def add_missing_input_nodes(self, input_size):
+        self.get_brain().add_missing_input_nodes(input_size)
+        self.invalidate_cache()
+
+    def get_input_size(self):
+        return len(self.get_brain().get_input_nodes())
 
     def set_input_data(self, data):
-        self.brain.set_input_data(data)
+        self.get_brain().set_input_data(data)
+
+    def tick(self, data=None, compiled=False):
+        return self.get_brain().tick(data, compiled)
+
+    def tick_batch(self, data=None, reset_mask=None):
+        return self.get_brain().tick_batch(data, reset_mask)
 
-    def tick(self, data=None):
-        return self.brain.tick(data)
+    def forward_propagation(self, data=None, start_backwards=False, compiled=False):
+        return self.get_brain().forward_propagation(data, start_backwards, compiled)
 
-    def forward_propagation(self, data=None, start_backwards=False):
-        return self.brain.forward_propagation(data, start_backwards)
+    def forward_propagation_batch(self, data, chunk_size=None, start_backwards=False):
+        return self.get_brain().forward_propagation_batch(data, chunk_size, start_backwards)
+
+    def compile(self, start_backwards=False) -> CompiledNetwork:
+        return self.get_brain().get_compiled_network(start_backwards)
+
+    def compile_for_latency(self) -> InferenceHandle:
+        return InferenceHandle(self.get_brain())
 
     def get_outputs(self) -> list:
-        return self.brain.get_output_data()
+        return self.get_brain().get_output_data()
 
     def set_number_of_outputs(self, number_of_outputs):
         for _ in range(number_of_outputs):
-            output_node = Node(NodeTypes.OUTPUT)
+            output_node = self.create_node(NodeTypes.OUTPUT)
             self.add_node(output_node)
 
     def set_parent(self, parent: 'Genome'):
@@ -347,44 +607,49 @@ class Genome:
 
     # TODO: Replace lists with sets if possible
     # smaller is better
-    def get_species_compatibility(self, genome):
+    def get_signature(self) -> GenomeSignature:
+        '''
+        Sorted gene ids and weight sum of the genome. Cached until invalidate_cache is called or the neural network
+        changes, e.g. when it adds missing input nodes
+        '''
+        change_count = self.get_change_count()
 
-        node_difference = 0
-        connection_difference = 0
-        weight_difference = np.abs(self.get_average_weight() - genome.get_average_weight())
+        if self.signature is None or self.signature_change_count != change_count:
+            self.signature = self.create_signature()
+            self.signature_change_count = change_count
 
-        aligned_nodes = Genome.align_gene_ids(self.get_brain().get_all_nodes(),
-                                              genome.get_brain().get_all_nodes())
-        aligned_connections = Genome.align_gene_ids(self.get_brain().get_all_connections(),
-                                                    genome.get_brain().get_all_connections())
+        return self.signature
 
-        for node1, node2 in aligned_nodes:
-            if node1 is None or node2 is None:
-                node_difference += 1
+    def get_change_count(self):
+        return self.get_brain().change_count
 
-        for connection1, connection2 in aligned_connections:
-            if connection1 is None or connection2 is None:
-                connection_difference += 1
+    def create_signature(self) -> GenomeSignature:
+        brain = self.get_brain()
+        connections = brain.get_all_connections()
 
-        return YaneConfig.get_species_compatibility_node_factor(yane_config) * node_difference + \
-            YaneConfig.get_species_compatibility_connection_factor(yane_config) * connection_difference + \
-            YaneConfig.get_species_compatibility_weight_factor(yane_config) * weight_difference
-
-    def get_average_weight(self):
+        node_ids = np.sort(np.fromiter((node.get_id() for node in brain.get_all_nodes()), dtype=np.int64,
+                                       count=brain.get_node_size()))
+        connection_ids = np.fromiter((connection.get_id() for connection in connections), dtype=np.int64,
+                                     count=len(connections))
+        weight_sum = sum(connection.get_weight() for connection in connections)
 
-        sum_weight = 0
+        return GenomeSignature(node_ids, connection_ids, weight_sum)
 
-        if len(self.brain.get_all_connections()) == 0:
-            return 0
+    # smaller is better
+    def get_species_compatibility(self, genome):
+        return self.get_signature().get_compatibility(genome.get_signature())
 
-        for connection in self.brain.get_all_connections():
-            sum_weight += connection.get_weight()
+    def get_species_compatibilities(self, genomes: list['Genome']) -> np.ndarray:
+        '''
+        Species compatibility to all genomes in one call
+        '''
+        return self.get_signature().get_compatibilities([genome.get_signature() for genome in genomes])
 
-        return sum_weight / len(self.brain.get_all_connections())
+    def get_average_weight(self):
+        return self.get_signature().get_average_weight()
 
     def clear_hidden_output_nodes(self):
-        for node in self.brain.get_hidden_nodes() + self.brain.get_output_nodes():
-            node.set_value(0)
+        self.get_brain().clear_values()
 
     def get_parent(self):
         return self.parent
@@ -396,33 +661,112 @@ class Genome:
         return self.bad_reproduction_count
 
     def get_hidden_nodes(self):
-        return self.brain.get_hidden_nodes()
+        return self.get_brain().get_hidden_nodes()
 
     def get_output_nodes(self):
-        return self.brain.get_output_nodes()
+        return self.get_brain().get_output_nodes()
 
     def get_all_connections(self):
-        return self.brain.get_all_connections()
+        return self.get_brain().get_all_connections()
 
     def get_random_node(self):
-        return self.brain.get_random_node()
+        return self.get_brain().get_random_node(self.random_generator)
 
     def mutate_mutation_rates(self):
         for rate_name, rate_value in self.mutation_rates.items():
-            if random.random() < self.mutation_rates['mutation_probability']:
-                change = random.uniform(-0.5, 0.5)
+            if self.random_generator.random() < self.mutation_rates['mutation_probability']:
+                change = float(self.random_generator.uniform(-0.5, 0.5))
                 new_rate = rate_value + change
 
                 self.mutation_rates[rate_name] = min(max(new_rate, 0.01), 1)
 
     def mutate_mutation_nums(self):
         for num_name, num_value in self.mutation_num.items():
-            if random.random() < self.mutation_rates['mutation_probability']:
-                change = random.randint(-1, 1)
+            if self.random_generator.random() < self.mutation_rates['mutation_probability']:
+                change = int(self.random_generator.integers(-1, 2))
                 new_num_value = num_value + change
 
                 self.mutation_num[num_name] = max(new_num_value, 1)
 
+    @classmethod
+    def mutate_genomes(cls, genomes: list['Genome'], random_generator: np.random.Generator = None):
+        '''
+        Same as calling mutate on every genome, but the activation functions, the weights and the mutation rates of
+        all genomes are mutated together with one draw over the genes of all genomes. Only the structural
+        mutations are done genome by genome. Unlike mutate_mutation_rates, all mutation rates are mutated with the
+        mutation probability from before the mutation.
+        :param random_generator: Random generator for the vectorized mutations. Uses the generator of the first genome
+                if None
+        '''
+        if len(genomes) <= 0:
+            return
+
+        if random_generator is None:
+            random_generator = genomes[0].get_random_generator()
+
+        activation_codes = [genome.get_activation_codes() for genome in genomes]
+        probabilities = [genome.mutation_rates['activation_function_probability'] for genome in genomes]
+        sizes = [len(codes) for codes in activation_codes]
+        all_activation_codes = np.concatenate(activation_codes)
+        cls.mutate_activation_codes(all_activation_codes, np.repeat(probabilities, sizes), random_generator)
+
+        for genome, codes in zip(genomes, np.split(all_activation_codes, np.cumsum(sizes)[:-1])):
+            genome.set_activation_codes(codes)
+            genome.mutate_node_structure()
+
+        # Genomes without connections only get a random connection, like in mutate_connections
+        connected_genomes = []
+        for genome in genomes:
+            if genome.get_connection_size() <= 0:
+                genome.add_random_connection()
+            else:
+                connected_genomes.append(genome)
+
+        if len(connected_genomes) > 0:
+            weights, shift_directions = zip(*[genome.get_weights() for genome in connected_genomes])
+            sizes = [len(genome_weights) for genome_weights in weights]
+            weight_probabilities = [genome.mutation_rates['weight_probability'] for genome in connected_genomes]
+            shift_probabilities = [genome.mutation_rates['shift_probability'] for genome in connected_genomes]
+
+            all_weights = np.concatenate(weights)
+            shift_mask = cls.mutate_weights(all_weights, np.concatenate(shift_directions),
+                                            np.repeat(weight_probabilities, sizes),
+                                            np.repeat(shift_probabilities, sizes), random_generator)
+
+            splits = np.cumsum(sizes)[:-1]
+            for genome, genome_weights, genome_shift_mask in zip(connected_genomes, np.split(all_weights, splits),
+                                                                 np.split(shift_mask, splits)):
+                genome.set_weights(genome_weights, cls.get_last_index(genome_shift_mask))
+                genome.mutate_connection_structure()
+
+        cls.mutate_mutation_parameters(genomes, random_generator)
+
+        for genome in genomes:
+            genome.invalidate_cache()
+
+    @staticmethod
+    def mutate_mutation_parameters(genomes: list['Genome'], random_generator: np.random.Generator):
+        '''
+        Vectorized version of mutate_mutation_rates and mutate_mutation_nums for many genomes
+        '''
+        rate_names = list(genomes[0].mutation_rates)
+        num_names = list(genomes[0].mutation_num)
+
+        rates = np.array([[genome.mutation_rates[name] for name in rate_names] for genome in genomes])
+        nums = np.array([[genome.mutation_num[name] for name in num_names] for genome in genomes], dtype=np.int64)
+        probabilities = rates[:, rate_names.index('mutation_probability')][:, None]
+
+        rate_mask = random_generator.random(rates.shape) < probabilities
+        rates[rate_mask] = np.clip(rates[rate_mask] + random_generator.uniform(-0.5, 0.5, np.count_nonzero(rate_mask)),
+                                   0.01, 1)
+
+        num_mask = random_generator.random(nums.shape) < probabilities
+        nums[num_mask] = np.maximum(nums[num_mask] + random_generator.integers(-1, 2, np.count_nonzero(num_mask)), 1)
+
+        for genome, genome_rates, genome_nums in zip(genomes, rates.tolist(), nums.tolist()):
+            genome.mutation_rates = dict(zip(rate_names, genome_rates))
+            genome.mutation_num = dict(zip(num_names, genome_nums))
+
     def plot(self, interactive=False):
 
         if interactive:
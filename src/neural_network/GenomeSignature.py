@@ -0,0 +1,142 @@
+import numpy as np
+
+from src.neural_network import YaneConfig
+
+yane_config = YaneConfig.load_json_config()
+
+
+class GenomeSignature:
+    '''
+    Sorted node ids, sorted connection ids and the weight sum of a genome. Everything the species compatibility
+    needs, so it can be calculated with set operations on the id arrays instead of walking the genes.
+    '''
+
+    def __init__(self, node_ids, connection_ids, weight_sum):
+        '''
+        :param node_ids: Sorted and unique node ids
+        :param connection_ids: Sorted and unique connection ids
+        :param weight_sum: Sum of all connection weights
+        '''
+        self.node_ids = np.asarray(node_ids, dtype=np.int64)
+        self.connection_ids = np.asarray(connection_ids, dtype=np.int64)
+        self.weight_sum = float(weight_sum)
+
+    def get_node_ids(self) -> np.ndarray:
+        return self.node_ids
+
+    def get_connection_ids(self) -> np.ndarray:
+        return self.connection_ids
+
+    def get_average_weight(self):
+        if len(self.connection_ids) == 0:
+            return 0
+
+        return self.weight_sum / len(self.connection_ids)
+
+    # smaller is better
+    def get_compatibility(self, signature: 'GenomeSignature'):
+        node_difference = len(self.node_ids) + len(signature.node_ids) - 2 * len(
+            np.intersect1d(self.node_ids, signature.node_ids, assume_unique=True))
+        connection_difference = len(self.connection_ids) + len(signature.connection_ids) - 2 * len(
+            np.intersect1d(self.connection_ids, signature.connection_ids, assume_unique=True))
+        weight_difference = np.abs(self.get_average_weight() - signature.get_average_weight())
+
+        return YaneConfig.get_species_compatibility_node_factor(yane_config) * node_difference + \
+            YaneConfig.get_species_compatibility_connection_factor(yane_config) * connection_difference + \
+            YaneConfig.get_species_compatibility_weight_factor(yane_config) * weight_difference
+
+    def get_compatibilities(self, signatures: list['GenomeSignature']) -> np.ndarray:
+        '''
+        Compatibility to many signatures at once, e.g. to the representatives of all species
+        :return: One compatibility per signature, same as get_compatibility
+        '''
+        if len(signatures) <= 0:
+            return np.zeros(0, dtype=np.float64)
+
+        node_differences = GenomeSignature.count_differences(self.node_ids,
+                                                             [signature.node_ids for signature in signatures])
+        connection_differences = GenomeSignature.count_differences(
+            self.connection_ids, [signature.connection_ids for signature in signatures])
+        weight_differences = np.abs(self.get_average_weight() - np.array(
+            [signature.get_average_weight() for signature in signatures], dtype=np.float64))
+
+        return YaneConfig.get_species_compatibility_node_factor(yane_config) * node_differences + \
+            YaneConfig.get_species_compatibility_connection_factor(yane_config) * connection_differences + \
+            YaneConfig.get_species_compatibility_weight_factor(yane_config) * weight_differences
+
+    @staticmethod
+    def get_compatibility_matrix(signatures: list['GenomeSignature'],
+                                 other_signatures: list['GenomeSignature']) -> np.ndarray:
+        '''
+        Compatibility of every signature to every other signature
+        :return: Matrix with one row per signature and one column per other signature
+        '''
+        if len(signatures) <= 0 or len(other_signatures) <= 0:
+            return np.zeros((len(signatures), len(other_signatures)), dtype=np.float64)
+
+        node_differences = GenomeSignature.count_difference_matrix(
+            [signature.node_ids for signature in signatures], [signature.node_ids for signature in other_signatures])
+        connection_differences = GenomeSignature.count_difference_matrix(
+            [signature.connection_ids for signature in signatures],
+            [signature.connection_ids for signature in other_signatures])
+        average_weights = np.array([signature.get_average_weight() for signature in signatures], dtype=np.float64)
+        other_average_weights = np.array([signature.get_average_weight() for signature in other_signatures],
+                                         dtype=np.float64)
+        weight_differences = np.abs(average_weights[:, np.newaxis] - other_average_weights[np.newaxis, :])
+
+        return YaneConfig.get_species_compatibility_node_factor(yane_config) * node_differences + \
+            YaneConfig.get_species_compatibility_connection_factor(yane_config) * connection_differences + \
+            YaneConfig.get_species_compatibility_weight_factor(yane_config) * weight_differences
+
+    @staticmethod
+    def count_difference_matrix(ids: list[np.ndarray], other_ids: list[np.ndarray], max_chunk_size=1 << 22):
+        '''
+        Number of ids that are only in one of both arrays, for every pair of arrays. The arrays are turned into
+        membership matrices over all ids, so the shared ids of all pairs are a single matrix product
+        :param max_chunk_size: Maximum number of matrix entries that are created at once
+        '''
+        sizes = np.fromiter((len(array) for array in ids), dtype=np.int64, count=len(ids))
+        other_sizes = np.fromiter((len(array) for array in other_ids), dtype=np.int64, count=len(other_ids))
+        _, gene_indices = np.unique(np.concatenate(ids + other_ids), return_inverse=True)
+        gene_size = int(gene_indices.max()) + 1 if len(gene_indices) > 0 else 0
+
+        owners = np.repeat(np.arange(len(ids)), sizes)
+        other_owners = np.repeat(np.arange(len(other_ids)), other_sizes)
+        other_genes = np.zeros((gene_size, len(other_ids)), dtype=np.float32)
+        other_genes[gene_indices[len(owners):], other_owners] = 1
+
+        gene_indices = gene_indices[:len(owners)]
+        shared = np.empty((len(ids), len(other_ids)), dtype=np.float64)
+        chunk_size = max(1, max_chunk_size // max(gene_size, 1))
+        starts = np.searchsorted(owners, np.arange(0, len(ids), chunk_size))
+
+        for chunk, start in enumerate(starts.tolist()):
+            first = chunk * chunk_size
+            last = min(first + chunk_size, len(ids))
+            end = starts[chunk + 1] if chunk + 1 < len(starts) else len(owners)
+
+            genes = np.zeros((last - first, gene_size), dtype=np.float32)
+            genes[owners[start:end] - first, gene_indices[start:end]] = 1
+            shared[first:last] = genes @ other_genes
+
+        return sizes[:, np.newaxis] + other_sizes[np.newaxis, :] - 2 * shared
+
+    @staticmethod
+    def count_differences(ids, other_ids: list[np.ndarray]) -> np.ndarray:
+        '''
+        :param ids: Sorted and unique ids
+        :param other_ids: Sorted and unique ids of every other genome
+        :return: Number of ids that are only in one of both arrays, for every other genome
+        '''
+        sizes = np.fromiter((len(other) for other in other_ids), dtype=np.int64, count=len(other_ids))
+        all_ids = np.concatenate(other_ids)
+
+        if len(ids) > 0 and len(all_ids) > 0:
+            positions = np.minimum(np.searchsorted(ids, all_ids), len(ids) - 1)
+            matches = ids[positions] == all_ids
+            owners = np.repeat(np.arange(len(other_ids)), sizes)
+            shared = np.bincount(owners, weights=matches, minlength=len(other_ids))
+        else:
+            shared = np.zeros(len(other_ids), dtype=np.float64)
+
+        return len(ids) + sizes - 2 * shared
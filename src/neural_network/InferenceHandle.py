@@ -0,0 +1,243 @@
+import numpy as np
+
+from src.neural_network.ActivationFunction import ActivationFunction
+from src.neural_network.CompiledNetwork import CompiledNetwork
+from src.neural_network.CompiledRecurrentNetwork import CompiledRecurrentNetwork
+
+
+class InferenceHandle:
+    '''
+    Low latency single sample inference for real time control.
+
+    All buffers and array views are created once, so a call does not build lists or allocate node arrays. Only
+    networks with more than dense_node_limit nodes allocate one node vector per firing step. tick fires the triggered
+    nodes in the fire groups of CompiledRecurrentNetwork, which are computed the first time a trigger list occurs and
+    reused after that. The input can be
+    any object that numpy can view without copying (numpy arrays, memoryviews, array.array). The outputs are written
+    into the given out buffer. The handle is a snapshot of the neural network and has to be created again after
+    a mutation.
+    '''
+    dense_node_limit = 256
+
+    def __init__(self, neural_network):
+        recurrent_network = CompiledRecurrentNetwork(neural_network.get_all_nodes())
+        recurrent_network.set_triggered_nodes(neural_network.next_trigger_nodes)
+        self.init_tick(recurrent_network)
+
+        compiled_network = CompiledNetwork.from_neural_network(neural_network)
+        self.init_forward_propagation(compiled_network)
+
+        # Hidden nodes start the next forward propagation with the values of their late connections
+        nodes = neural_network.get_forward_order_list()
+        self.carry_values[:] = [nodes[position].get_value() for position in compiled_network.carry_positions.tolist()]
+
+    def init_tick(self, recurrent_network: CompiledRecurrentNetwork):
+        node_size = recurrent_network.node_size
+        input_size = len(recurrent_network.input_indices)
+
+        # Input nodes first, then the other nodes grouped by activation function, so every group is a slice
+        order = list(recurrent_network.input_indices)
+        group_slices = []
+        for activation, group in recurrent_network.activation_groups:
+            group_slices.append((activation, slice(len(order), len(order) + len(group))))
+            order.extend(group)
+
+        order = np.array(order, dtype=np.int64)
+        new_index = np.empty(node_size, dtype=np.int64)
+        new_index[order] = np.arange(node_size)
+
+        sources = new_index[recurrent_network.sources]
+        targets = new_index[recurrent_network.targets]
+        weights = recurrent_network.weights
+
+        self.input_size = input_size
+        self.input_positions = recurrent_network.input_positions
+        self.output_indices = new_index[recurrent_network.output_indices]
+        self.resets = recurrent_network.resets[order]
+
+        self.dense = node_size <= self.dense_node_limit
+        if self.dense:
+            self.weight_matrix = np.zeros((node_size, node_size), dtype=np.float64)
+            np.add.at(self.weight_matrix, (sources, targets), weights)
+            self.input_weight_matrix = self.weight_matrix[:input_size]
+        else:
+            self.sources = sources
+            self.targets = targets
+            self.weights = weights
+            self.edge_values = np.zeros(len(sources), dtype=np.float64)
+
+        self.values = recurrent_network.values[order]
+        self.activated_values = np.zeros(node_size, dtype=np.float64)
+        self.fired_values = np.zeros(node_size, dtype=np.float64)
+        self.signals = np.zeros(node_size, dtype=np.float64)
+        self.input_buffer = np.zeros(input_size, dtype=np.float64)
+        self.output_buffer = np.zeros(len(self.output_indices), dtype=np.float64)
+
+        self.input_values = self.values[:input_size]
+        self.other_values = self.values[input_size:]
+        self.fired_input_values = self.fired_values[:input_size]
+
+        # The trigger lists and their fire groups are numbered by the recurrent network, the masks and views of the
+        # fire groups are created the first time a trigger list occurs
+        self.recurrent_network = recurrent_network
+        self.node_order = order
+        self.group_slices = group_slices
+        self.tick_plans = []
+        self.trigger_state = recurrent_network.get_trigger_state(recurrent_network.trigger_order)
+
+    def get_tick_plan(self, state):
+        while len(self.tick_plans) <= state:
+            self.tick_plans.append(None)
+
+        tick_plan = self.tick_plans[state]
+        if tick_plan is None:
+            tick_plan = []
+
+            for fire in self.recurrent_network.get_fire_plan(state):
+                fire = fire[self.node_order]
+                group_views = [(activation, self.values[group_slice], self.activated_values[group_slice],
+                                fire[group_slice]) for activation, group_slice in self.group_slices
+                               if fire[group_slice].any()]
+                inputs_only = not fire[self.input_size:].any()
+                tick_plan.append((fire, fire & self.resets, group_views, inputs_only))
+
+            self.tick_plans[state] = tick_plan
+
+        return tick_plan
+
+    def init_forward_propagation(self, compiled_network: CompiledNetwork):
+        self.forward_input_indices = compiled_network.input_indices
+        self.forward_input_positions = compiled_network.input_positions
+        self.forward_output_indices = np.where(compiled_network.output_mask, compiled_network.output_indices,
+                                               compiled_network.node_size)
+        self.forward_values = np.zeros(compiled_network.node_size + 1, dtype=np.float64)
+        self.forward_input_buffer = np.zeros(len(self.forward_input_indices), dtype=np.float64)
+        self.late_sources = compiled_network.late_sources
+        self.late_targets = compiled_network.late_targets
+        self.late_weights = compiled_network.late_weights
+        self.late_buffer = np.zeros(len(self.late_targets), dtype=np.float64)
+        self.carry_indices = compiled_network.carry_indices
+        self.carry_sources = compiled_network.carry_sources
+        self.carry_targets = compiled_network.carry_targets
+        self.carry_weights = compiled_network.carry_weights
+        self.carry_values = np.zeros(len(self.carry_indices), dtype=np.float64)
+        self.carry_buffer = np.zeros(len(self.carry_targets), dtype=np.float64)
+
+        self.forward_levels = []
+        for (start, end, _, _, _, activation_groups), (in_nodes, matrix) in zip(
+                compiled_network.levels, compiled_network.get_level_matrices()):
+            level_masks = []
+            for activation, group in activation_groups:
+                mask = np.zeros(end - start, dtype=bool)
+                mask[group] = True
+                level_masks.append((activation, mask))
+
+            self.forward_levels.append((self.forward_values[start:end], in_nodes, matrix,
+                                        np.zeros(len(in_nodes), dtype=np.float64),
+                                        np.zeros(end - start, dtype=np.float64), level_masks))
+
+    def get_output_size(self):
+        return len(self.output_buffer)
+
+    @staticmethod
+    def take_input(data, input_positions, input_buffer):
+        data = np.asarray(data)
+
+        # Only float64 input can be copied into the buffer directly, other types need one conversion
+        if data.dtype == np.float64:
+            return np.take(data, input_positions, out=input_buffer)
+
+        return np.take(data, input_positions)
+
+    def tick(self, data=None, out=None) -> np.ndarray:
+        '''
+        Same as NeuralNetwork.tick
+        :param data: Input data, indexed by the input position of the input nodes
+        :param out: Buffer for the output values. An internal buffer is used if None
+        :return: The output buffer
+        '''
+        tick_plan = self.get_tick_plan(self.trigger_state)
+        self.trigger_state = self.recurrent_network.get_next_trigger_state(self.trigger_state, data is not None)
+        values = self.values
+
+        if data is not None:
+            self.input_values[:] = self.take_input(data, self.input_positions, self.input_buffer)
+
+        for fire, reset_mask, group_views, inputs_only in tick_plan:
+            for activation, group_values, activated_values, group_fire in group_views:
+                ActivationFunction.activate_array(activation, group_values, out=activated_values)
+                np.copyto(group_values, activated_values, where=group_fire)
+
+            np.multiply(values, fire, out=self.fired_values)
+
+            # Only the input nodes fire, e.g. the first group of a tick with new input data
+            if inputs_only and self.dense:
+                signals = np.dot(self.fired_input_values, self.input_weight_matrix, out=self.signals)
+            else:
+                signals = self.propagate(self.weight_matrix if self.dense else None)
+
+            np.copyto(values, 0.0, where=reset_mask)
+            values += signals
+
+        if out is None:
+            out = self.output_buffer
+
+        np.take(values, self.output_indices, out=out, mode='clip')
+        return out
+
+    def propagate(self, matrix):
+        '''
+        :param matrix: Dense weight matrix that is multiplied with the fired values
+        :return: Signals of the fired nodes to every node
+        '''
+        if self.dense:
+            return np.dot(self.fired_values, matrix, out=self.signals)
+
+        np.take(self.fired_values, self.sources, out=self.edge_values, mode='clip')
+        self.edge_values *= self.weights
+        return np.bincount(self.targets, weights=self.edge_values, minlength=len(self.values))
+
+    def forward_propagation(self, data, out=None) -> np.ndarray:
+        '''
+        Same as NeuralNetwork.forward_propagation with compiled=True
+        :param data: Input data, indexed by the input position of the input nodes
+        :param out: Buffer for the output values. An internal buffer is used if None
+        :return: The output buffer
+        '''
+        values = self.forward_values
+        values.fill(0.0)
+
+        values.put(self.forward_input_indices,
+                   self.take_input(data, self.forward_input_positions, self.forward_input_buffer))
+        values.put(self.carry_indices, self.carry_values)
+
+        for level_values, in_nodes, matrix, in_values, activated_values, level_masks in self.forward_levels:
+            if len(in_nodes) > 0:
+                np.take(values, in_nodes, out=in_values, mode='clip')
+                level_values += np.dot(in_values, matrix, out=activated_values)
+
+            for activation, mask in level_masks:
+                ActivationFunction.activate_array(activation, level_values, out=activated_values)
+                np.copyto(level_values, activated_values, where=mask)
+
+        if len(self.carry_targets) > 0:
+            np.take(values, self.carry_sources, out=self.carry_buffer, mode='clip')
+            self.carry_buffer *= self.carry_weights
+            self.carry_values.fill(0.0)
+            np.add.at(self.carry_values, self.carry_targets, self.carry_buffer)
+
+        if len(self.late_targets) > 0:
+            np.take(values, self.late_sources, out=self.late_buffer, mode='clip')
+            self.late_buffer *= self.late_weights
+            np.add.at(values, self.late_targets, self.late_buffer)
+
+        if out is None:
+            out = self.output_buffer
+
+        np.take(values, self.forward_output_indices, out=out, mode='clip')
+        return out
+
+    def reset(self):
+        self.other_values.fill(0.0)
+        self.carry_values.fill(0.0)
+        self.trigger_state = self.recurrent_network.empty_trigger_state
@@ -0,0 +1,31 @@
+import hashlib
+import struct
+
+# Ids of structural innovations only depend on the genes they come from, so every process creates the same id for
+# the same innovation without asking anyone. They are hashed into the upper half of the positive int64 range, where
+# the counters of Node and Connection never get to.
+INNOVATION_ID_OFFSET = 1 << 62
+INNOVATION_ID_MASK = INNOVATION_ID_OFFSET - 1
+
+NODE_INNOVATION = 0
+CONNECTION_INNOVATION = 1
+
+
+def get_innovation_id(innovation_type, *gene_ids) -> int:
+    data = struct.pack('>B' + 'q' * len(gene_ids), innovation_type, *gene_ids)
+    digest = hashlib.blake2b(data, digest_size=8).digest()
+    return INNOVATION_ID_OFFSET | (int.from_bytes(digest, 'big') & INNOVATION_ID_MASK)
+
+
+def get_node_id(connection_id, in_node_id, out_node_id) -> int:
+    '''
+    :return: Id of the node that splits the connection from the in node to the out node
+    '''
+    return get_innovation_id(NODE_INNOVATION, connection_id, in_node_id, out_node_id)
+
+
+def get_connection_id(in_node_id, out_node_id) -> int:
+    '''
+    :return: Id of a new connection from the in node to the out node
+    '''
+    return get_innovation_id(CONNECTION_INNOVATION, in_node_id, out_node_id)
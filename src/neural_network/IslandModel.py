@@ -0,0 +1,190 @@
+import queue
+
+from src.neural_network import YaneConfig
+from src.neural_network.CompactGenome import CompactGenome
+from src.neural_network.Genome import Genome
+from src.neural_network.NeuroEvolution import NeuroEvolution
+from src.neural_network.ParallelEvaluator import ParallelEvaluator, get_process_context
+
+yane_config = YaneConfig.load_json_config()
+
+RING = "ring"
+FULLY_CONNECTED = "fully_connected"
+
+
+class IslandModel:
+    '''
+    Evolves independent NeuroEvolution populations ("islands") in separate processes. Every migration interval
+    generations, every island sends copies of its top genomes to its neighbours and takes the genomes that arrived
+    from its neighbours so far. Islands never wait for each other. The first island that reaches the min fitness stops
+    all islands.
+
+    All islands start with copies of one seed genome that was evaluated once in this process, so the input and output
+    nodes have the same ids and input positions everywhere. New genes get the same id on every island for the same
+    innovation, see InnovationIds. Migrants are CompactGenomes without parent and keep the fitness of their home
+    island.
+    '''
+
+    def __init__(self, islands=4, migration_interval=5, migration_size=2, topology=RING, seed=None):
+        '''
+        :param islands: Number of islands, one process each
+        :param migration_interval: Generations between two migrations
+        :param migration_size: Number of top genomes that are sent to every neighbour
+        :param topology: RING sends to the next island, FULLY_CONNECTED to all other islands
+        :param seed: Island i uses the seed + i if not None
+        '''
+        if topology not in (RING, FULLY_CONNECTED):
+            raise ValueError("Unknown topology: " + str(topology))
+
+        self.islands = islands
+        self.migration_interval = migration_interval
+        self.migration_size = migration_size
+        self.topology = topology
+        self.seed = seed
+        self.min_fitness = None
+        self.max_generations = None
+        self.island_results = []
+
+    def set_min_fitness(self, min_fitness):
+        self.min_fitness = min_fitness
+
+    def set_max_generations(self, generations):
+        self.max_generations = generations
+
+    def get_neighbours(self, island_index) -> list:
+        if self.islands <= 1:
+            return []
+
+        if self.topology == RING:
+            return [(island_index + 1) % self.islands]
+
+        return [index for index in range(self.islands) if index != island_index]
+
+    def train(self, callback_evaluation, number_of_outputs) -> Genome:
+        '''
+        Runs all islands until one reaches the min fitness or all reach the max generations
+        :param callback_evaluation: Function that takes a genome and returns its fitness
+        :return: Best genome of all islands
+        '''
+        if self.min_fitness is None and self.max_generations is None:
+            raise ValueError("Islands need a min fitness or max generations to stop")
+
+        seed_genome = NeuroEvolution.create_genome(number_of_outputs)
+        seed_genome.evaluate(callback_evaluation)
+
+        context = get_process_context()
+        inboxes = [context.Queue() for _ in range(self.islands)]
+        results = context.Queue()
+        stop_event = context.Event()
+        processes = []
+
+        for island_index in range(self.islands):
+            process = context.Process(target=self.run_island, args=(
+                island_index, callback_evaluation, ParallelEvaluator.pack_genome(seed_genome), inboxes, results,
+                stop_event))
+            process.start()
+            processes.append(process)
+
+        self.island_results = [(island_index, IslandModel.unpack_genome(genome), generation)
+                               for island_index, genome, generation in
+                               sorted(results.get() for _ in range(self.islands))]
+
+        for process in processes:
+            process.join()
+
+        return self.get_best_genome()
+
+    def get_island_results(self) -> list:
+        '''
+        :return: (island index, best genome, generation) of every island after training
+        '''
+        return self.island_results
+
+    def get_best_genome(self) -> Genome | None:
+        best_genome = None
+
+        for _, genome, _ in self.get_island_results():
+            if genome is not None and (best_genome is None or genome.get_fitness() > best_genome.get_fitness()):
+                best_genome = genome
+
+        return best_genome
+
+    def get_best_fitness(self):
+        best_genome = self.get_best_genome()
+        return None if best_genome is None else best_genome.get_fitness()
+
+    def run_island(self, island_index, callback_evaluation, seed_genome: CompactGenome, inboxes, results,
+                   stop_event):
+        neuro_evolution = NeuroEvolution()
+        neuro_evolution.set_seed(None if self.seed is None else self.seed + island_index)
+        neuro_evolution.set_min_fitness(self.min_fitness)
+        neuro_evolution.set_max_generations(self.max_generations)
+        neuro_evolution.add_evaluation(IslandModel.unpack_genome(seed_genome, neuro_evolution.random_generator))
+
+        next_migration = self.migration_interval
+
+        while not stop_event.is_set():
+            neuro_evolution.train_step(callback_evaluation)
+
+            if neuro_evolution.get_generation() >= next_migration:
+                next_migration += self.migration_interval
+                self.migrate(neuro_evolution, island_index, inboxes)
+                print("Island: " + str(island_index), end=" ")
+                neuro_evolution.print_generation()
+
+            if neuro_evolution.check_best_fitness():
+                stop_event.set()
+
+            if neuro_evolution.check_max_generation():
+                break
+
+        best_genome = neuro_evolution.get_best_species_genome()[1] if neuro_evolution.get_genomes_size() > 0 \
+            else None
+        results.put((island_index, None if best_genome is None else ParallelEvaluator.pack_genome(best_genome),
+                     neuro_evolution.get_generation()))
+
+        # Migrants that nobody takes anymore must not keep the process alive
+        for inbox in inboxes:
+            inbox.cancel_join_thread()
+
+    def migrate(self, neuro_evolution: NeuroEvolution, island_index, inboxes):
+        '''
+        Sends the top genomes to the neighbours and adds the genomes that arrived to the population
+        '''
+        migrants = []
+
+        for genome in neuro_evolution.get_population().get_top_genomes(self.migration_size):
+            if all(genome is not migrant for migrant in migrants):
+                migrants.append(genome)
+
+        packed_migrants = [ParallelEvaluator.pack_genome(genome) for genome in migrants]
+
+        for neighbour in self.get_neighbours(island_index):
+            inboxes[neighbour].put(packed_migrants)
+
+        immigrants = []
+
+        while True:
+            try:
+                immigrants += inboxes[island_index].get_nowait()
+            except queue.Empty:
+                break
+
+        neuro_evolution.get_population().add_genomes(
+            [IslandModel.unpack_genome(genome, neuro_evolution.random_generator) for genome in immigrants])
+
+    @staticmethod
+    def unpack_genome(genome: CompactGenome | None, random_generator=None) -> Genome | None:
+        '''
+        :return: The genome with the configured genome class
+        '''
+        if genome is None:
+            return None
+
+        if random_generator is not None:
+            genome.set_random_generator(random_generator)
+
+        if YaneConfig.get_compact_genomes(yane_config):
+            return genome
+
+        return genome.to_genome()
@@ -1,10 +1,13 @@
 import bisect
-import random
 
 from src.neural_network import YaneConfig
+from src.neural_network.CompiledNetwork import CompiledNetwork
+from src.neural_network.CompiledRecurrentNetwork import CompiledRecurrentNetwork
 from src.neural_network.Connection import Connection
+from src.neural_network.GeneIndex import GeneIndex
 from src.neural_network.Node import Node
 from src.neural_network.NodeTypes import NodeTypes
+from src.neural_network.exceptions.InvalidConnection import InvalidConnection
 from src.neural_network.exceptions.InvalidNode import InvalidNode
 from src.neural_network.exceptions.InvalidNodeTypeException import InvalidNodeTypeException
 
@@ -12,26 +15,184 @@ yane_config = YaneConfig.load_json_config()
 
 
 class NeuralNetwork:
-    def __init__(self):
+    def __init__(self, dag_only=None):
+        '''
+        :param dag_only: Reject connections that would create a cycle. Uses the config if None
+        '''
+        if dag_only is None:
+            dag_only = YaneConfig.get_dag_only(yane_config)
+
+        self.dag_only = dag_only
         self.next_trigger_nodes = []
         self.last_weight_shift_connection = None
         self.input_nodes = []
         self.hidden_nodes = []
         self.output_nodes = []
+        self.all_nodes = None
         self.forward_order_list = None
         self.backward_order_list = None
+        self.compiled_networks = {}
+        self.compiled_recurrent_network = None
+        # Counts the calls of invalidate_cache, so caches outside of the neural network can see changes
+        self.change_count = 0
+
+        # Topological order of the nodes, maintained incrementally when connections are added.
+        # Connections that would close a cycle are recurrent connections and are ignored by the order.
+        self.topological_positions: dict[Node, int] = {}
+        self.next_topological_position = 0
+        self.recurrent_connections: set[Connection] = set()
+
+        # Nodes and connections indexed by id
+        self.node_index = GeneIndex()
+        self.connection_index = GeneIndex()
 
     def get_all_nodes(self) -> list[Node]:
-        return [node for node in self.input_nodes + self.hidden_nodes + self.output_nodes]
+        '''
+        Input nodes, hidden nodes and output nodes, each sorted by id. The list is shared and must not be changed
+        '''
+        if self.all_nodes is None:
+            self.all_nodes = self.input_nodes + self.hidden_nodes + self.output_nodes
+
+        return self.all_nodes
 
-    def add_connection(self, connection: Connection):
-        if self.get_all_nodes().__contains__(connection.get_in_node()) is False:
+    def contains_node(self, node: Node):
+        return node in self.node_index
+
+    def contains_connection(self, connection: Connection):
+        return connection in self.connection_index
+
+    def add_connection(self, connection: Connection, recurrent=False):
+        '''
+        :param recurrent: Add the connection as recurrent connection without checking for a cycle. Used to copy
+                connections that were recurrent before
+        '''
+        if connection.get_in_node() not in self.node_index:
             raise InvalidNode("node in is not in the neural network")
 
-        if self.get_all_nodes().__contains__(connection.get_out_node()) is False:
+        if connection.get_out_node() not in self.node_index:
             raise InvalidNode("node out is not in the neural network")
 
+        if self.connection_index.contains_id(connection.get_id()):
+            raise InvalidConnection("connection already exists in the neural network")
+
+        if recurrent:
+            affected_nodes = None
+        else:
+            affected_nodes = self.find_affected_nodes(connection.get_in_node(), connection.get_out_node())
+
+        if affected_nodes is None and self.dag_only:
+            raise InvalidConnection("Cannot add connection that creates a cycle")
+
         connection.get_in_node().add_connection(connection)
+        self.connection_index.add(connection)
+
+        if affected_nodes is None:
+            self.recurrent_connections.add(connection)
+        else:
+            self.reorder_nodes(*affected_nodes)
+
+        self.invalidate_cache()
+
+    def remove_connection(self, connection: Connection):
+        if connection not in self.connection_index:
+            return
+
+        connection.get_in_node().remove_connection(connection)
+        self.connection_index.remove(connection)
+        self.recurrent_connections.discard(connection)
+        self.invalidate_cache()
+
+    def find_affected_nodes(self, in_node: Node, out_node: Node):
+        '''
+        Pearce-Kelly dynamic topological sort. Only the nodes between the out node and the in node in the current order
+        are searched.
+        :return: None if the connection creates a cycle, otherwise the nodes that have to be reordered
+                (nodes before the in node, nodes after the out node)
+        '''
+        lower_bound = self.topological_positions[out_node]
+        upper_bound = self.topological_positions[in_node]
+
+        if upper_bound < lower_bound:
+            return [], []
+
+        if in_node is out_node:
+            return None
+
+        forward_nodes = [out_node]
+        visited = {out_node}
+
+        for node in forward_nodes:
+            for connection in node.get_next_connections():
+                next_node = connection.get_out_node()
+
+                if next_node is in_node:
+                    if connection not in self.recurrent_connections:
+                        return None
+                    continue
+
+                if next_node not in visited and self.topological_positions[next_node] < upper_bound and \
+                        connection not in self.recurrent_connections:
+                    visited.add(next_node)
+                    forward_nodes.append(next_node)
+
+        backward_nodes = [in_node]
+        visited = {in_node}
+
+        for node in backward_nodes:
+            for connection in node.get_previous_connections():
+                previous_node = connection.get_in_node()
+
+                if previous_node not in visited and self.topological_positions[previous_node] > lower_bound and \
+                        connection not in self.recurrent_connections:
+                    visited.add(previous_node)
+                    backward_nodes.append(previous_node)
+
+        return backward_nodes, forward_nodes
+
+    def reorder_nodes(self, backward_nodes, forward_nodes):
+        '''
+        Moves the backward nodes in front of the forward nodes and reuses their positions
+        '''
+        if len(backward_nodes) <= 0:
+            return
+
+        backward_nodes.sort(key=self.topological_positions.__getitem__)
+        forward_nodes.sort(key=self.topological_positions.__getitem__)
+        nodes = backward_nodes + forward_nodes
+        positions = sorted(self.topological_positions[node] for node in nodes)
+
+        for node, position in zip(nodes, positions):
+            self.topological_positions[node] = position
+
+    def is_recurrent_connection(self, connection: Connection):
+        return connection in self.recurrent_connections
+
+    def get_topological_order(self) -> list[Node]:
+        return sorted(self.topological_positions, key=self.topological_positions.__getitem__)
+
+    def copy_topological_order(self, neural_network: 'NeuralNetwork'):
+        '''
+        Takes over the order of another neural network for all nodes with the same id.
+        Has to be called before connections are added.
+        '''
+        self.set_topological_order(
+            {node.get_id(): position for node, position in neural_network.topological_positions.items()})
+
+    def set_topological_order(self, positions: dict[int, int]):
+        '''
+        Sets the order of the nodes. Has to be called before connections are added.
+        :param positions: Topological position by node id. Nodes without a position are moved to the end
+        '''
+        self.next_topological_position = max(positions.values(), default=-1) + 1
+
+        for node in self.topological_positions:
+            position = positions.get(node.get_id())
+
+            if position is None:
+                position = self.next_topological_position
+                self.next_topological_position += 1
+
+            self.topological_positions[node] = position
 
     def add_input_node(self, node: Node):
         if node.type is not NodeTypes.INPUT:
@@ -39,6 +200,7 @@ class NeuralNetwork:
                 "Invalid node type. Can only add InputNode")
 
         bisect.insort(self.input_nodes, node, key=lambda x: x.get_id())
+        self.all_nodes = None
 
     def add_hidden_node(self, node: Node):
         if node.type is not NodeTypes.HIDDEN:
@@ -46,6 +208,7 @@ class NeuralNetwork:
                 "Invalid node type. Can only add HiddenNode")
 
         bisect.insort(self.hidden_nodes, node, key=lambda x: x.get_id())
+        self.all_nodes = None
 
     def add_output_node(self, node: Node):
         if node.type is not NodeTypes.OUTPUT:
@@ -53,10 +216,11 @@ class NeuralNetwork:
                 "Invalid node type. Can only add OutputNode")
 
         bisect.insort(self.output_nodes, node, key=lambda x: x.get_id())
+        self.all_nodes = None
 
     def add_node(self, node: Node):
 
-        if self.get_all_nodes().__contains__(node):
+        if self.node_index.contains_id(node.get_id()):
             raise InvalidNode("node already exists in the neural network")
 
         if node.type is NodeTypes.INPUT:
@@ -69,6 +233,39 @@ class NeuralNetwork:
             raise InvalidNodeTypeException(
                 "Invalid node type. Can only add InputNode, HiddenNode or OutputNode")
 
+        self.node_index.add(node)
+        self.topological_positions[node] = self.next_topological_position
+        self.next_topological_position += 1
+        self.invalidate_cache()
+
+    def remove_node(self, node: Node):
+        if not self.node_index.remove(node):
+            return
+
+        if node.type is NodeTypes.INPUT:
+            nodes = self.input_nodes
+        elif node.type is NodeTypes.HIDDEN:
+            nodes = self.hidden_nodes
+        else:
+            nodes = self.output_nodes
+
+        del nodes[bisect.bisect_left(nodes, node.get_id(), key=lambda x: x.get_id())]
+        self.all_nodes = None
+
+        # Sorted by id, so the order of the connection index does not depend on the order of the sets
+        for previous_connection in sorted(node.get_previous_connections(), key=Connection.get_id):
+            previous_connection.get_in_node().remove_next_connection(previous_connection)
+            self.recurrent_connections.discard(previous_connection)
+            self.connection_index.remove(previous_connection)
+
+        for next_connection in sorted(node.get_next_connections(), key=Connection.get_id):
+            next_connection.get_out_node().remove_previous_connection(next_connection)
+            self.recurrent_connections.discard(next_connection)
+            self.connection_index.remove(next_connection)
+
+        del self.topological_positions[node]
+        self.invalidate_cache()
+
     def get_input_nodes(self) -> list[Node]:
         return self.input_nodes
 
@@ -79,24 +276,35 @@ class NeuralNetwork:
         return self.output_nodes
 
     def get_node_by_id(self, node_id) -> Node | None:
-        node: Node
-
-        for node in self.get_all_nodes():
-            if node.get_id() == node_id:
-                return node
+        return self.node_index.get_by_id(node_id)
 
-        return None
+    def get_connection_by_id(self, connection_id) -> Connection | None:
+        return self.connection_index.get_by_id(connection_id)
 
     def get_all_connections(self) -> list[Connection]:
-        connections = []
-        for node in self.get_all_nodes():
-            connections += node.get_next_connections()
-        return connections
+        '''
+        All connections sorted by id. The list is shared and must not be changed
+        '''
+        return self.connection_index.get_sorted()
 
-    def set_input_data(self, data, start_backwards=False):
-        while len(data) > len(self.input_nodes):
+    def get_connection_size(self):
+        return len(self.connection_index)
+
+    def get_node_size(self):
+        return len(self.node_index)
+
+    def add_missing_input_nodes(self, input_size):
+        if input_size <= len(self.input_nodes):
+            return
+
+        while input_size > len(self.input_nodes):
             new_node = Node(NodeTypes.INPUT)
-            self.add_input_node(new_node)
+            self.add_node(new_node)
+
+        self.invalidate_cache()
+
+    def set_input_data(self, data, start_backwards=False):
+        self.add_missing_input_nodes(len(data))
 
         if start_backwards:
             nodes = self.get_backward_order_list()
@@ -108,13 +316,18 @@ class NeuralNetwork:
                 node.set_value(data[node.get_input_position()])
                 node.set_original_input_data(node.value)
 
-    def tick(self, data):
+    def tick(self, data, compiled=False):
         '''
         Every tick the neural network will fire all triggered nodes
         :param data:
+        :param compiled: Use the array based tick, see CompiledRecurrentNetwork. Same result as firing the nodes one
+                after another
         :return:
         '''
 
+        if compiled:
+            return self.tick_compiled(data)
+
         trigger_nodes = self.next_trigger_nodes
         self.next_trigger_nodes = []
 
@@ -122,21 +335,58 @@ class NeuralNetwork:
             self.set_input_data(data)
             self.next_trigger_nodes.extend(self.get_input_nodes())
 
+        next_trigger_nodes = set(self.next_trigger_nodes)
+
         for node in trigger_nodes:
             node.fire()
             for connection in node.get_next_connections():
-                if connection.get_out_node() not in self.next_trigger_nodes:
+                if connection.get_out_node() not in next_trigger_nodes:
+                    next_trigger_nodes.add(connection.get_out_node())
                     self.next_trigger_nodes.append(connection.get_out_node())
 
         return self.get_output_data()
 
-    def forward_propagation(self, data=None, start_backwards=False):
+    def tick_compiled(self, data):
+        if data is not None:
+            self.add_missing_input_nodes(len(data))
+
+        outputs = self.get_compiled_recurrent_network().tick(data)
+
+        for node, value in zip(self.output_nodes, outputs.tolist()):
+            node.set_value(value)
+
+        return self.get_output_data()
+
+    def tick_batch(self, data=None, reset_mask=None):
+        '''
+        Ticks many independent streams at once with the array based tick. Does not change the values of the nodes.
+        :param data: Input data with one row per stream
+        :param reset_mask: Boolean mask of the streams that are reset before the tick
+        :return: numpy array with the output data of one stream per row
+        '''
+        if data is not None and len(data) > 0:
+            self.add_missing_input_nodes(len(data[0]))
+
+        return self.get_compiled_recurrent_network().tick_batch(data, reset_mask)
+
+    def get_compiled_recurrent_network(self) -> CompiledRecurrentNetwork:
+        if self.compiled_recurrent_network is None:
+            self.compiled_recurrent_network = CompiledRecurrentNetwork(self.get_all_nodes())
+            self.compiled_recurrent_network.set_triggered_nodes(self.next_trigger_nodes)
+
+        return self.compiled_recurrent_network
+
+    def forward_propagation(self, data=None, start_backwards=False, compiled=False):
         '''
         :param data: Input data to be set in the input nodes
         :param start_backwards: Use backwards order instead of forward order to increase performance
                 if you have a lot of input nodes
+        :param compiled: Use the compiled network instead of firing every node. Only used if data is given
         :return: Output data from the output nodes
         '''
+        if compiled and data is not None:
+            return self.forward_propagation_compiled(data, start_backwards)
+
         self.clear_output()
 
         if data is not None:
@@ -151,6 +401,62 @@ class NeuralNetwork:
 
         return self.get_output_data()
 
+    def forward_propagation_compiled(self, data, start_backwards=False):
+        self.add_missing_input_nodes(len(data))
+        compiled_network = self.get_compiled_network(start_backwards)
+
+        # Hidden nodes keep the values of late connections for the next forward propagation, also between both versions
+        carry_nodes = compiled_network.carry_positions.tolist()
+        if len(carry_nodes) > 0:
+            nodes = self.get_backward_order_list() if start_backwards else self.get_forward_order_list()
+            carry_nodes = [nodes[position] for position in carry_nodes]
+            compiled_network.set_carry_values([node.get_value() for node in carry_nodes])
+
+        outputs = compiled_network.forward_propagation(data)
+
+        for node, value in zip(carry_nodes, compiled_network.get_carry_values().tolist()):
+            node.set_value(value)
+
+        for node, value in zip(self.output_nodes, outputs.tolist()):
+            node.set_value(value)
+
+        return self.get_output_data()
+
+    def forward_propagation_batch(self, data, chunk_size=None, start_backwards=False):
+        '''
+        Calculates many samples at once with the compiled network. Does not change the values of the nodes.
+        :param data: Input data with one sample per row
+        :param chunk_size: Maximum number of samples that are calculated at once
+        :param start_backwards: Use backwards order instead of forward order
+        :return: numpy array with the output data of one sample per row
+        '''
+        self.add_missing_input_nodes(len(data[0]) if len(data) > 0 else 0)
+        return self.get_compiled_network(start_backwards).forward_propagation_batch(data, chunk_size)
+
+    def get_compiled_network(self, start_backwards=False) -> CompiledNetwork:
+        compiled_network = self.compiled_networks.get(start_backwards)
+
+        if compiled_network is None:
+            compiled_network = CompiledNetwork.from_neural_network(self, start_backwards)
+            self.compiled_networks[start_backwards] = compiled_network
+
+        return compiled_network
+
+    def invalidate_cache(self):
+        '''
+        Has to be called after the structure or the weights of the neural network changed
+        '''
+        self.change_count += 1
+        self.forward_order_list = None
+        self.backward_order_list = None
+        self.compiled_networks.clear()
+
+        # Keep the state of the array based tick, so switching between both tick versions is possible
+        if self.compiled_recurrent_network is not None:
+            self.compiled_recurrent_network.write_back()
+            self.next_trigger_nodes = self.compiled_recurrent_network.get_triggered_nodes()
+            self.compiled_recurrent_network = None
+
     def clear_values(self):
         for node in self.hidden_nodes:
             node.set_value(0.0)
@@ -158,26 +464,38 @@ class NeuralNetwork:
         for node in self.output_nodes:
             node.set_value(0.0)
 
+        if self.compiled_recurrent_network is not None:
+            self.compiled_recurrent_network.clear_values()
+
     def get_forward_order_list(self, start_nodes=None) -> list[Node]:
+        '''
+        All nodes that can be reached from the start nodes in topological order
+        :param start_nodes: Input nodes are used if None
+        '''
 
-        if self.forward_order_list is not None:
+        if start_nodes is None and self.forward_order_list is not None:
             return self.forward_order_list
 
-        self.forward_order_list = []
-
         if start_nodes is None:
-            self.forward_order_list.extend(self.get_input_nodes())
-        else:
-            self.forward_order_list.extend(start_nodes)
+            start_nodes = self.get_input_nodes()
+
+        reached_nodes = set(start_nodes)
+        nodes = list(start_nodes)
 
         node: Node
 
-        for node in self.forward_order_list:
+        for node in nodes:
             for connection in node.get_next_connections():
-                if connection.get_out_node() not in self.forward_order_list:
-                    self.forward_order_list.append(connection.get_out_node())
+                if connection.get_out_node() not in reached_nodes:
+                    reached_nodes.add(connection.get_out_node())
+                    nodes.append(connection.get_out_node())
+
+        nodes.sort(key=self.topological_positions.__getitem__)
 
-        return self.forward_order_list
+        if start_nodes is self.get_input_nodes():
+            self.forward_order_list = nodes
+
+        return nodes
 
     def get_backward_order_list(self) -> list[Node]:
         '''
@@ -189,19 +507,22 @@ class NeuralNetwork:
         if self.backward_order_list is not None:
             return self.backward_order_list
 
-        self.backward_order_list = []
+        reached_nodes = set()
+        nodes = []
         input_nodes = []
 
         for node in self.get_output_nodes():
             if len(node.get_previous_connections()) > 0:
-                self.backward_order_list.append(node)
+                reached_nodes.add(node)
+                nodes.append(node)
 
         node: Node
 
-        for node in self.backward_order_list:
+        for node in nodes:
             for connection in node.get_previous_connections():
-                if connection.get_in_node() not in self.backward_order_list:
-                    self.backward_order_list.append(connection.get_in_node())
+                if connection.get_in_node() not in reached_nodes:
+                    reached_nodes.add(connection.get_in_node())
+                    nodes.append(connection.get_in_node())
                     if connection.get_in_node().type is NodeTypes.INPUT:
                         input_nodes.append(connection.get_in_node())
 
@@ -217,21 +538,21 @@ class NeuralNetwork:
         return output_data
 
     def calculate_net_cost(self):
-        net_cost = len(self.get_all_connections())
-        net_cost += len(self.get_all_nodes())
-        return net_cost
+        return len(self.connection_index) + len(self.node_index)
 
     def remove_all_connections(self):
         for node in self.get_all_nodes():
-            node.next_connections = []
+            node.remove_all_connections()
 
-    def get_random_node(self):
-        nodes = self.get_all_nodes()
+        self.connection_index.clear()
+        self.recurrent_connections.clear()
+        self.invalidate_cache()
 
-        if len(nodes) > 0:
-            return random.choice(nodes)
-        else:
-            return None
+    def get_random_node(self, random_generator=None):
+        return self.node_index.get_random(random_generator)
+
+    def get_random_connection(self, random_generator=None):
+        return self.connection_index.get_random(random_generator)
 
     def print(self):
         print("Neural Network:")
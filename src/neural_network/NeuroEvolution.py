@@ -1,7 +1,13 @@
+import asyncio
+from concurrent import futures
+
 import numpy as np
 
 from src.neural_network import YaneConfig
+from src.neural_network.CompactGenome import CompactGenome
+from src.neural_network.CompiledPopulation import CompiledPopulation
 from src.neural_network.Genome import Genome
+from src.neural_network.ParallelEvaluator import ParallelEvaluator
 from src.neural_network.Population import Population
 from src.neural_network.Species import Species
 
@@ -15,6 +21,7 @@ class NeuroEvolution:
         self.generation = 0
         self.population = Population()
         self.evaluation_list: list[Genome] = []
+        self.random_generator = np.random.default_rng()
 
     def get_population(self):
         return self.population
@@ -25,25 +32,142 @@ class NeuroEvolution:
     def get_generation(self):
         return self.generation
 
-    def train(self, callback_evaluation):
-        if self.get_genomes_size() > 0:
-            for genome in self.get_population().get_all_genomes():
-                self.add_evaluation(genome)
+    def set_seed(self, seed):
+        '''
+        Makes training reproducible. The selection of the parents and all genomes use one random generator with the
+        seed, so all mutations follow it. The random module is not seeded.
+        '''
+        self.random_generator = np.random.default_rng(seed)
+
+        for genome in self.get_evaluation_list() + self.get_population().get_all_genomes():
+            genome.set_random_generator(self.random_generator)
+
+    def train(self, callback_evaluation, workers=None):
+        '''
+        :param callback_evaluation: Function that takes a genome and returns its fitness
+        :param workers: Number of processes that create and evaluate the genomes. Everything runs in this process if
+                None or 1. With more workers, the evaluation function gets a CompactGenome copy of every genome and
+                the mutations do not follow the seed of set_seed
+        '''
+        if workers is not None and workers > 1:
+            with ParallelEvaluator(callback_evaluation, workers) as evaluator:
+                self.train_generations(callback_evaluation, evaluator)
+        else:
+            self.train_generations(callback_evaluation)
 
-            self.clear_population()
+    def train_generations(self, callback_evaluation, evaluator: ParallelEvaluator = None):
+        self.prepare_training()
+
+        while True:
+            self.train_step(callback_evaluation, evaluator)
+            self.print_generation()
+
+            if self.check_best_fitness() or self.check_max_generation():
+                break
+
+    def train_step(self, callback_evaluation, evaluator: ParallelEvaluator = None):
+        '''
+        Removes bad genomes, reproduces the upper genomes of a random species and evaluates the children
+        '''
+        self.clear_bad_species_genomes()
+        self.create_next_genomes(evaluator)
+        self.evaluate_next_genome(callback_evaluation, evaluator)
+
+    async def train_async(self, callback_evaluation, concurrency=8):
+        '''
+        Trains with a coroutine evaluation function, e.g. for fitness functions that wait for a simulator. Up to
+        concurrency genomes are evaluated at the same time on the running event loop and every genome is added to
+        the population as soon as its evaluation is done
+        :param callback_evaluation: Coroutine function that takes a genome and returns its fitness
+        :param concurrency: Maximum number of evaluations at the same time
+        '''
+        self.prepare_training()
 
         while True:
             self.clear_bad_species_genomes()
             self.create_next_genomes()
-            self.evaluate_next_genome(callback_evaluation)
+            await self.evaluate_next_genome_async(callback_evaluation, concurrency)
+            self.print_generation()
+
+            if self.check_best_fitness() or self.check_max_generation():
+                break
 
-            print("Generation: " + str(np.round(self.get_generation())) + " Best fitness: " + str(
-                self.get_best_fitness()) + " Average fitness: " + str(self.get_average_fitness()),
-                  "Number of species: " + str(self.get_population().get_species_size()))
+    def train_batched(self, callback_batch_evaluation, batch_size=None, compiled=False):
+        '''
+        Trains with an evaluation function that scores many genomes with one call, e.g. with one vectorized
+        computation over all genomes
+        :param callback_batch_evaluation: Function that takes a list of genomes and returns a fitness for every genome
+        :param batch_size: Maximum number of genomes per call. All genomes of a generation in one call if None
+        :param compiled: The evaluation function gets a CompiledPopulation of the genomes instead of the list, see
+                forward_propagation_batch
+        '''
+        self.prepare_training()
+
+        while True:
+            self.clear_bad_species_genomes()
+            self.create_next_genomes()
+            self.evaluate_next_genome_batched(callback_batch_evaluation, batch_size, compiled)
+            self.print_generation()
 
             if self.check_best_fitness() or self.check_max_generation():
                 break
 
+    def train_steady_state(self, callback_evaluation, workers=4):
+        '''
+        Trains without waiting for whole batches. Whenever a worker is done, its genome goes into the population and
+        a new child of the current population is evaluated. This keeps all workers busy even if the evaluation time
+        differs a lot between genomes
+        :param callback_evaluation: Function that takes a genome and returns its fitness
+        :param workers: Number of processes that evaluate the genomes
+        '''
+        with ParallelEvaluator(callback_evaluation, workers) as evaluator:
+            self.prepare_training()
+
+            # The genomes from before are evaluated together, so there is a population to breed from
+            self.evaluate_next_genome(callback_evaluation, evaluator)
+            self.print_generation()
+            running: dict[futures.Future, Genome] = {}
+
+            try:
+                while not self.check_best_fitness() and not self.check_max_generation():
+                    while len(running) < workers and (
+                            len(self.get_evaluation_list()) > 0 or self.get_genomes_size() > 0):
+                        genome = self.get_evaluation_list().pop() if len(self.get_evaluation_list()) > 0 \
+                            else self.create_child_genome()
+                        running[evaluator.submit(genome)] = genome
+
+                    if len(running) <= 0:
+                        break
+
+                    done, _ = futures.wait(running.keys(), return_when=futures.FIRST_COMPLETED)
+                    last_generation = int(self.get_generation())
+
+                    for future in done:
+                        genome = running.pop(future)
+                        genome.apply_fitness(future.result())
+                        self.get_population().add_genome(genome)
+                        self.generation += 1 / YaneConfig.get_max_population_size(yane_config)
+
+                    self.clear_bad_species_genomes()
+
+                    if int(self.get_generation()) > last_generation:
+                        self.print_generation()
+            finally:
+                for future in running:
+                    future.cancel()
+
+    def prepare_training(self):
+        if self.get_genomes_size() > 0:
+            for genome in self.get_population().get_all_genomes():
+                self.add_evaluation(genome)
+
+            self.clear_population()
+
+    def print_generation(self):
+        print("Generation: " + str(np.round(self.get_generation())) + " Best fitness: " + str(
+            self.get_best_fitness()) + " Average fitness: " + str(self.get_average_fitness()),
+              "Number of species: " + str(self.get_population().get_species_size()))
+
     def print(self):
         print("Population size: " + str(self.get_genomes_size()))
         print("Number of species: " + str(self.get_population().get_species_size()))
@@ -87,21 +211,83 @@ class NeuroEvolution:
 
     def set_number_of_outputs(self, number_of_outputs):
         if self.get_genomes_size() <= 0:
-            genome = Genome()
-            genome.set_number_of_outputs(number_of_outputs)
-
-            self.add_evaluation(genome)
+            self.add_evaluation(self.create_genome(number_of_outputs, self.random_generator))
         else:
             for genome in self.get_population().get_all_genomes():
                 genome.set_number_of_outputs(number_of_outputs)
 
-    def evaluate_next_genome(self, callback_evaluation):
+    @staticmethod
+    def create_genome(number_of_outputs, random_generator: np.random.Generator = None) -> Genome:
+        '''
+        :return: New genome of the configured genome class with only output nodes
+        '''
+        if YaneConfig.get_compact_genomes(yane_config):
+            genome = CompactGenome(random_generator=random_generator)
+        else:
+            genome = Genome(random_generator=random_generator)
+
+        genome.set_number_of_outputs(number_of_outputs)
+        return genome
+
+    def evaluate_next_genome(self, callback_evaluation, evaluator: ParallelEvaluator = None):
+        evaluated_genomes = []
+
+        while len(self.get_evaluation_list()) > 0:
+            evaluated_genomes.append(self.get_evaluation_list().pop())
+
+        if evaluator is None:
+            for genome in evaluated_genomes:
+                genome.evaluate(callback_evaluation)
+        else:
+            # Fitness values are applied in the same order as above, so the parents are updated the same way
+            evaluator.evaluate(evaluated_genomes)
+
+        for _ in evaluated_genomes:
+            self.generation += 1 / YaneConfig.get_max_population_size(yane_config)
+
+        self.get_population().add_genomes(evaluated_genomes)
+
+    def evaluate_next_genome_batched(self, callback_batch_evaluation, batch_size=None, compiled=False):
+        evaluated_genomes = []
+
         while len(self.get_evaluation_list()) > 0:
-            genome = self.get_evaluation_list().pop()
-            genome.evaluate(callback_evaluation)
-            self.add_population(genome)
+            evaluated_genomes.append(self.get_evaluation_list().pop())
+
+        if batch_size is None:
+            batch_size = max(len(evaluated_genomes), 1)
+
+        for start in range(0, len(evaluated_genomes), batch_size):
+            Genome.evaluate_genomes(evaluated_genomes[start:start + batch_size], callback_batch_evaluation, compiled)
+
+        for _ in evaluated_genomes:
             self.generation += 1 / YaneConfig.get_max_population_size(yane_config)
 
+        self.get_population().add_genomes(evaluated_genomes)
+
+    async def evaluate_next_genome_async(self, callback_evaluation, concurrency):
+        '''
+        Evaluates the evaluation list with at most concurrency running evaluations. A genome is only taken from the
+        list when an evaluation slot is free and goes into the population when its evaluation is done
+        '''
+        running: dict[asyncio.Task, Genome] = {}
+
+        try:
+            while len(self.get_evaluation_list()) > 0 or len(running) > 0:
+                while len(self.get_evaluation_list()) > 0 and len(running) < concurrency:
+                    genome = self.get_evaluation_list().pop()
+                    running[asyncio.ensure_future(genome.evaluate_async(callback_evaluation))] = genome
+
+                done, _ = await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    genome = running.pop(task)
+                    task.result()
+                    self.get_population().add_genome(genome)
+                    self.generation += 1 / YaneConfig.get_max_population_size(yane_config)
+        finally:
+            for task in running:
+                task.cancel()
+
     def add_evaluation(self, genome):
         if isinstance(genome, list):
             self.evaluation_list.extend(genome)
@@ -111,22 +297,101 @@ class NeuroEvolution:
     def get_evaluation_list(self):
         return self.evaluation_list
 
-    def create_next_genomes(self):
+    def forward_propagation_batch(self, data, genomes=None, chunk_size=None):
+        '''
+        Runs the same input data through many genomes at once
+        :param data: Input data with one sample per row
+        :param genomes: Genomes to calculate. Uses the evaluation list if None
+        :param chunk_size: Maximum number of samples that are calculated at once
+        :return: numpy array with the shape (genomes, samples, outputs)
+        '''
+        if genomes is None:
+            genomes = self.get_evaluation_list()
+
+        return CompiledPopulation(genomes).forward_propagation_batch(data, chunk_size)
+
+    def create_next_genomes(self, evaluator: ParallelEvaluator = None):
+        '''
+        :param evaluator: Creates the children in its worker processes if not None
+        '''
         if self.get_genomes_size() <= 0:
             return
 
-        random_species = self.get_population().get_random_species()
+        parent_pairs = self.select_parents()
 
-        # TODO: Add different crossover methods
+        if evaluator is None:
+            child_genomes = [Genome.reproduce(genome, partner) for genome, partner in parent_pairs]
+            Genome.mutate_genomes(child_genomes, self.random_generator)
+        else:
+            child_genomes = evaluator.create_children(parent_pairs)
 
-        child_genomes: list[Genome] = [genome.copy() for genome in random_species.get_upper_genomes()]
+        self.set_child_parents(child_genomes, [Genome.get_primary_parent(genome, partner)
+                                               for genome, partner in parent_pairs])
+        self.add_evaluation(child_genomes)
 
-        for child, parent in zip(child_genomes, random_species.get_upper_genomes()):
+    def create_child_genome(self) -> Genome:
+        '''
+        Breeds one mutated child of a random upper genome of a random species, for steady state training
+        '''
+        upper_genomes = self.get_population().get_random_species(self.random_generator).get_upper_genomes()
+        genome = upper_genomes[self.random_generator.integers(len(upper_genomes))]
+        partner = None
+
+        if len(upper_genomes) > 1 and self.random_generator.random() < YaneConfig.get_crossover_fraction(
+                yane_config):
+            partner = self.choose_crossover_partner(genome, upper_genomes, self.random_generator)
+
+        child_genome = Genome.reproduce(genome, partner)
+        self.set_child_parents([child_genome], [Genome.get_primary_parent(genome, partner)])
+        Genome.mutate_genomes([child_genome], self.random_generator)
+
+        return child_genome
+
+    def select_parents(self) -> list:
+        '''
+        Takes the upper genomes of a random species and gives a part of them a random crossover partner
+        :return: (genome, partner) for every child. The partner is None if the child is a copy
+        '''
+        random_species = self.get_population().get_random_species(self.random_generator)
+        upper_genomes = random_species.get_upper_genomes()
+
+        crossover_size = int(np.round(YaneConfig.get_crossover_fraction(yane_config) * len(upper_genomes)))
+        crossover_parents = set()
+
+        if len(upper_genomes) > 1:
+            crossover_parents = set(
+                self.random_generator.choice(len(upper_genomes), crossover_size, replace=False).tolist())
+
+        parent_pairs = []
+
+        for index, genome in enumerate(upper_genomes):
+            if index in crossover_parents:
+                partner = self.choose_crossover_partner(genome, upper_genomes, self.random_generator)
+                parent_pairs.append((genome, partner))
+            else:
+                parent_pairs.append((genome, None))
+
+        return parent_pairs
+
+    @staticmethod
+    def set_child_parents(child_genomes: list[Genome], parents: list[Genome]):
+        for child, parent in zip(child_genomes, parents):
             child.set_parent(parent)
-            child.mutate()
             parent.set_reproduction_count(parent.get_reproduction_count() + 1)
 
-        self.add_evaluation(child_genomes)
+    @staticmethod
+    def choose_crossover_partner(genome: Genome, partners: list[Genome],
+                                 random_generator: np.random.Generator) -> Genome | None:
+        '''
+        :return: A random other genome of the list or None if there is no other genome
+        '''
+        # The same genome can be in a species more than once
+        partners = [partner for partner in partners if partner is not genome]
+
+        if len(partners) <= 0:
+            return None
+
+        return partners[random_generator.integers(len(partners))]
 
     def get_best_species_genome(self) -> (Species, Genome):
         return self.get_population().get_best_species_genome()
@@ -137,15 +402,14 @@ class NeuroEvolution:
     def clear_overpopulated_species(self):
         for species in self.get_population().get_species():
             while species.get_size() > YaneConfig.get_species_size_reference(yane_config):
-                species.pop_genome()
+                self.get_population().pop_genome(species)
 
     def clear_stagnated_species(self, species: Species):
-
-        top_genomes = self.get_population().get_top_genomes(YaneConfig.get_elitism(yane_config))
+        elitism = YaneConfig.get_elitism(yane_config)
 
         if species.get_generations_without_improvement() > YaneConfig.get_species_stagnation_duration(yane_config):
             for genome in species.get_genomes():
-                if genome in top_genomes:
+                if self.get_population().is_top_genome(genome, elitism):
                     self.add_evaluation(species.get_best_genome())
             self.remove_species(species)
 
@@ -153,12 +417,13 @@ class NeuroEvolution:
         self.min_fitness = min_fitness
 
     def clear_bad_reproducers(self, species: Species):
-        top_genomes = self.get_population().get_top_genomes(YaneConfig.get_elitism(yane_config))
+        elitism = YaneConfig.get_elitism(yane_config)
 
+        # Removing genomes that are not in the top genomes does not change the top genomes
         for genome in species.get_genomes()[:]:
             if genome.get_bad_reproduction_count() > YaneConfig.get_max_bad_reproductions_in_row(
-                    yane_config) and genome not in top_genomes:
-                species.remove_genome(genome)
+                    yane_config) and not self.get_population().is_top_genome(genome, elitism):
+                self.get_population().remove_genome(species, genome)
 
     def clear_population(self):
         self.get_population().clear()
@@ -166,6 +431,10 @@ class NeuroEvolution:
     def clear_bad_species_genomes(self):
         for species in self.get_population().get_species()[:]:
             self.clear_stagnated_species(species)
+
+            if not self.get_population().has_species(species):
+                continue
+
             self.clear_bad_reproducers(species)
             self.clear_empty_species(species)
 
@@ -10,16 +10,25 @@ class Node:
     global_node_id = 0
     global_input_pos = 0
 
-    def __init__(self, node_type: NodeTypes, node_id=None, input_pos=None):
+    def __init__(self, node_type: NodeTypes, node_id=None, input_pos=None, activation=None):
+        '''
+        :param activation: Activation function, a random one of the config if None
+        '''
         self.value = 0.0
         self.next_connections = set()
         self.previous_connections = set()
-        self.activation = ActivationFunction.get_function(YaneConfig.get_random_activation_function(yane_config))
+        # Connected nodes, used to find duplicate connections in O(1)
+        self.next_nodes = {}
+        self.previous_nodes = {}
+        self.activation = activation
         self.type = node_type
         self.id = node_id
         self.input_pos = input_pos
         self.original_input_data = None
 
+        if activation is None:
+            self.activation = ActivationFunction.get_function(YaneConfig.get_random_activation_function(yane_config))
+
         if node_id is None:
             self.id = Node.global_node_id
             Node.global_node_id += 1
@@ -73,11 +82,11 @@ class Node:
         if connection.get_out_node() == self and connection.get_in_node() == self:
             raise InvalidConnection("Cannot add connection with same in and out neuron")
 
-        for previous_connection in self.previous_connections:
-            if previous_connection.get_in_node() == connection.get_in_node():
-                raise InvalidConnection("Cannot add connection with same in neuron twice")
+        if connection.get_in_node() in self.previous_nodes:
+            raise InvalidConnection("Cannot add connection with same in neuron twice")
 
         self.previous_connections.add(connection)
+        self.previous_nodes[connection.get_in_node()] = connection
 
     def add_next_connection(self, connection: Connection):
         if connection in self.next_connections:
@@ -92,11 +101,11 @@ class Node:
         if connection.get_out_node() == self and connection.get_in_node() == self:
             raise InvalidConnection("Cannot add connection with same in and out neuron")
 
-        for next_connection in self.next_connections:
-            if next_connection.get_out_node() == connection.get_out_node():
-                raise InvalidConnection("Cannot add connection with same out neuron twice")
+        if connection.get_out_node() in self.next_nodes:
+            raise InvalidConnection("Cannot add connection with same out neuron twice")
 
         self.next_connections.add(connection)
+        self.next_nodes[connection.get_out_node()] = connection
 
     def activate(self):
         self.value = ActivationFunction.activate(self.activation, self.value)
@@ -109,9 +118,7 @@ class Node:
 
     # Avoid deep copy because of recursion
     def copy(self):
-        new_node = Node(self.type, self.id, self.input_pos)
-        new_node.set_activation(self.activation)
-        return new_node
+        return Node(self.type, self.id, self.input_pos, self.activation)
 
     def fire(self, keep_input=False):
 
@@ -134,9 +141,17 @@ class Node:
 
     def remove_next_connection(self, connection):
         self.next_connections.remove(connection)
+        del self.next_nodes[connection.get_out_node()]
 
     def remove_previous_connection(self, connection):
         self.previous_connections.remove(connection)
+        del self.previous_nodes[connection.get_in_node()]
+
+    def remove_all_connections(self):
+        self.next_connections = set()
+        self.previous_connections = set()
+        self.next_nodes = {}
+        self.previous_nodes = {}
 
     def remove_connection(self, connection: Connection):
         if connection in self.next_connections:
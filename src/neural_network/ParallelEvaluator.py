@@ -0,0 +1,179 @@
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+
+from src.neural_network.CompactGenome import CompactGenome
+from src.neural_network.Genome import Genome
+
+# Evaluation function and random generator of the worker process, set once when the worker starts
+worker_callback_evaluation = None
+worker_random_generator = None
+
+
+def initialize_worker(callback_evaluation):
+    global worker_callback_evaluation, worker_random_generator
+    worker_callback_evaluation = callback_evaluation
+    worker_random_generator = np.random.default_rng()
+
+
+def evaluate_in_worker(genome: CompactGenome):
+    return worker_callback_evaluation(genome)
+
+
+def create_children_in_worker(parent_pairs: list) -> list:
+    children = []
+
+    for genome, partner in parent_pairs:
+        genome.set_random_generator(worker_random_generator)
+        child = Genome.reproduce(genome, partner)
+        child.set_parent(None)
+        children.append(child)
+
+    Genome.mutate_genomes(children, worker_random_generator)
+    return children
+
+
+def get_process_context():
+    '''
+    Forked processes inherit the evaluation function and the config, even if they are not picklable
+    '''
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+
+    return multiprocessing.get_context()
+
+
+class ParallelEvaluator:
+    '''
+    Evaluates genomes and creates children in a pool of worker processes.
+
+    The workers get a CompactGenome copy of every genome without the parent, so only a few arrays are sent. The
+    fitness values come back in the same order as the genomes and are applied with Genome.apply_fitness in the
+    calling process, so the parent bookkeeping is the same as with serial evaluation. Changes that the evaluation
+    function makes to the genome copy are lost. Genomes without input nodes get them during their first evaluation,
+    so they are evaluated in the calling process.
+
+    New genes of children get ids that do not depend on the process, see InnovationIds, so children of different
+    workers can be compared and crossed like children of this process.
+    '''
+
+    def __init__(self, callback_evaluation, workers):
+        '''
+        :param callback_evaluation: Function that takes a genome and returns its fitness. Where fork is not
+                available, it has to be picklable (defined at module level)
+        :param workers: Number of worker processes
+        '''
+        self.callback_evaluation = callback_evaluation
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=get_process_context(),
+                                            initializer=initialize_worker, initargs=(callback_evaluation,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown()
+
+    @staticmethod
+    def pack_genome(genome: Genome) -> CompactGenome:
+        '''
+        :return: CompactGenome copy of the genome without the parent
+        '''
+        # New genomes draw random mutation rates. Training has to continue with the same random state as without
+        # workers
+        random_generator = genome.get_random_generator()
+        random_state = random_generator.bit_generator.state
+
+        if isinstance(genome, CompactGenome):
+            packed_genome = genome.copy()
+            packed_genome.copy_evolution_state(genome)
+        else:
+            packed_genome = CompactGenome.from_genome(genome)
+
+        random_generator.bit_generator.state = random_state
+        packed_genome.set_parent(None)
+        return packed_genome
+
+    @staticmethod
+    def unpack_genome(genome: CompactGenome, reference: Genome) -> Genome:
+        '''
+        :return: The genome that came back from another process with the genome class and random generator of the
+                reference
+        '''
+        genome.set_random_generator(reference.get_random_generator())
+
+        if isinstance(reference, CompactGenome):
+            return genome
+
+        return genome.to_genome()
+
+    def create_children(self, parent_pairs: list) -> list[Genome]:
+        '''
+        Copies or crosses and mutates the genomes in the workers, like NeuroEvolution.create_next_genomes
+        :param parent_pairs: (genome, crossover partner or None) for every child
+        :return: Child of every pair without parent
+        '''
+        if len(parent_pairs) <= 0:
+            return []
+
+        packed_pairs = [(ParallelEvaluator.pack_genome(genome),
+                         None if partner is None else ParallelEvaluator.pack_genome(partner))
+                        for genome, partner in parent_pairs]
+
+        # One chunk per worker, so the mutations of every chunk are drawn together
+        chunk_size = -(-len(packed_pairs) // self.workers)
+        chunks = [packed_pairs[start:start + chunk_size] for start in range(0, len(packed_pairs), chunk_size)]
+        children = [child for chunk in self.executor.map(create_children_in_worker, chunks) for child in chunk]
+
+        return [ParallelEvaluator.unpack_genome(child, genome) for child, (genome, _) in zip(children, parent_pairs)]
+
+    def calculate_fitness(self, genomes: list[Genome]) -> list:
+        '''
+        :return: Fitness of every genome, in the same order
+        '''
+        if len(genomes) <= 0:
+            return []
+
+        chunk_size = max(1, len(genomes) // (self.workers * 4))
+        return list(self.executor.map(evaluate_in_worker, [ParallelEvaluator.pack_genome(genome) for genome in genomes],
+                                      chunksize=chunk_size))
+
+    def submit(self, genome: Genome) -> Future:
+        '''
+        Starts the evaluation of one genome. The fitness of the future still has to be applied with
+        Genome.apply_fitness
+        '''
+        genome.set_net_cost(genome.calculate_net_cost())
+
+        if genome.get_input_size() <= 0:
+            future = Future()
+            future.set_result(self.callback_evaluation(genome))
+            genome.clear_hidden_output_nodes()
+            return future
+
+        return self.executor.submit(evaluate_in_worker, ParallelEvaluator.pack_genome(genome))
+
+    def evaluate(self, genomes: list[Genome]) -> list:
+        '''
+        Calculates the fitness of all genomes in the workers and applies it in the order of the list
+        :return: Fitness of every genome
+        '''
+        remote_genomes = [genome for genome in genomes if genome.get_input_size() > 0]
+
+        for genome in remote_genomes:
+            genome.set_net_cost(genome.calculate_net_cost())
+
+        remote_results = iter(self.calculate_fitness(remote_genomes))
+        fitness_results = []
+
+        for genome in genomes:
+            if genome.get_input_size() > 0:
+                fitness_results.append(genome.apply_fitness(next(remote_results)))
+            else:
+                fitness_results.append(genome.evaluate(self.callback_evaluation))
+
+        return fitness_results
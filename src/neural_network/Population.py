@@ -1,29 +1,80 @@
+import bisect
+import heapq
+import itertools
 import random
 
+import numpy as np
+
 from src.neural_network import YaneConfig, Genome
+from src.neural_network.GenomeSignature import GenomeSignature
 from src.neural_network.Species import Species
+from src.neural_network.SpeciesIndex import SpeciesIndex
 
 yane_config = YaneConfig.load_json_config()
 
 
 class Population:
+    '''
+    Keeps running statistics of all species, so size, average fitness and best genome are available without walking
+    the population. Genomes must therefore be added to and removed from species through the population.
+    '''
+
     def __init__(self):
         self.species: list[Species] = []
         self.compatibility_threshold = 3
         self.last_checked_species_size = 0
+        self.species_index = SpeciesIndex() if YaneConfig.get_species_index(yane_config) else None
+
+        self.genomes_size = 0
+        self.average_fitness_sum = 0.0
+
+        # Species are numbered in the order they were added, so ties are resolved like in the species list
+        self.species_numbers: dict[Species, int] = {}
+        self.next_species_number = 0
+
+        # Heap of (-fitness, species number, entry number, species, genome). Outdated entries are skipped lazily
+        self.best_genomes = []
+        self.best_genome_entries = itertools.count()
+        self.pushed_best_genomes: dict[Species, Genome] = {}
+
+        # All genomes sorted like get_top_genomes returns them: by fitness, then like get_all_genomes orders them.
+        # Entries are (-fitness, species number, net cost, entry number, genome)
+        self.genome_order = []
+        self.genome_entries: dict[Genome, list[tuple]] = {}
+        self.genome_entry_numbers = itertools.count()
+
+    def get_species_index(self) -> SpeciesIndex | None:
+        return self.species_index
+
+    def set_species_index(self, species_index: SpeciesIndex | None):
+        '''
+        :param species_index: Index to find compatible species faster or None to always compare with all species
+        '''
+        self.species_index = species_index
+
+        if species_index is not None:
+            species_index.clear()
+
+            for species in self.species:
+                species_index.update(species)
 
     def get_species(self):
         return self.species
 
-    def get_random_species(self) -> Species:
+    def has_species(self, species) -> bool:
+        return species in self.species_numbers
+
+    def get_random_species(self, random_generator: np.random.Generator = None) -> Species:
+        '''
+        :param random_generator: numpy random generator to draw from, the random module is used if None
+        '''
+        if random_generator is not None:
+            return self.species[random_generator.integers(len(self.species))]
+
         return random.choice(self.species)
 
     def get_genomes_size(self):
-        population_size = 0
-        for species in self.species:
-            population_size += species.get_size()
-
-        return population_size
+        return self.genomes_size
 
     def get_species_size(self):
         return len(self.species)
@@ -32,11 +83,7 @@ class Population:
         if self.get_genomes_size() <= 0:
             return None
 
-        sum_fitness = 0
-        for species in self.species:
-            sum_fitness += species.get_average_fitness()
-
-        return sum_fitness / self.get_species_size()
+        return self.average_fitness_sum / self.get_species_size()
 
     def get_best_fitness(self):
         if self.get_genomes_size() <= 0:
@@ -53,26 +100,162 @@ class Population:
         if self.get_genomes_size() <= 0:
             return None
 
-        best_genome = None
-        best_species = None
-
-        for species in self.species:
-            if species.get_best_genome() is None:
-                continue
-            if best_genome is None or species.get_best_fitness() > best_genome.get_fitness():
-                best_genome = species.get_best_genome()
-                best_species = species
+        # Skip entries of removed species and of genomes that are no longer the best of their species
+        while not self.is_best_genome_entry(self.best_genomes[0]):
+            heapq.heappop(self.best_genomes)
 
+        _, _, _, best_species, best_genome = self.best_genomes[0]
         return best_species, best_genome
 
     def add_genome(self, genome):
         if self.get_species_size() <= 0:
-            species = Species()
-            species.add_genome(genome)
-            self.species.append(species)
+            self.add_species(genome)
             return
 
         species, compatibility = self.get_best_compatible_species(genome)
+        self.update_compatibility_threshold()
+
+        if species is not None and compatibility <= self.compatibility_threshold:
+            self.remove_species_statistics(species)
+            self.add_genome_order(species, [genome], species.add_genome(genome))
+            self.add_species_statistics(species)
+
+            if self.species_index is not None and species.get_best_genome() is genome:
+                self.species_index.update(species)
+            return
+
+        self.add_species(genome)
+
+    def add_genomes(self, genomes: list, compatibilities: np.ndarray = None):
+        '''
+        Adds a whole batch of evaluated genomes. The most compatible species of every genome is found with
+        get_best_compatible_species_batch and every species gets its new genomes at once. Genomes that fit no species
+        start new species one after another, like add_genome would do, and the compatibility threshold is only
+        updated when a new species was created.
+        :param compatibilities: Distance matrix of the genomes and the species of get_representative_species, if it
+                was already calculated somewhere else. The species index is not used then
+        '''
+        if len(genomes) <= 0:
+            return
+
+        if self.get_species_size() > 0:
+            self.update_compatibility_threshold()
+
+        species_list = self.get_representative_species()
+        new_genomes = {species: [] for species in species_list}
+
+        # Most compatible species of every genome that is not assigned yet
+        if compatibilities is None:
+            best_species, best_compatibilities = self.get_best_compatible_species_batch(genomes, species_list)
+        elif len(species_list) > 0:
+            best_indices = np.argmin(compatibilities, axis=1)
+            best_species = [species_list[best_index] for best_index in best_indices.tolist()]
+            best_compatibilities = compatibilities[np.arange(len(genomes)), best_indices]
+        else:
+            best_species = [None] * len(genomes)
+            best_compatibilities = np.full(len(genomes), np.inf)
+
+        remaining_genomes = genomes
+
+        while True:
+            compatible = best_compatibilities <= self.compatibility_threshold
+
+            for genome, species, is_compatible in zip(remaining_genomes, best_species, compatible.tolist()):
+                if is_compatible:
+                    new_genomes[species].append(genome)
+
+            remaining = np.flatnonzero(~compatible)
+
+            if len(remaining) <= 0:
+                break
+
+            remaining_genomes = [remaining_genomes[index] for index in remaining.tolist()]
+            best_species = [best_species[index] for index in remaining.tolist()]
+            best_compatibilities = best_compatibilities[remaining]
+
+            # The first genome that fits no species starts a new one, the others might fit into it
+            species = Species()
+            self.append_species(species)
+            new_genomes[species] = [remaining_genomes[0]]
+
+            compatibilities = remaining_genomes[0].get_species_compatibilities(remaining_genomes[1:])
+            closer = compatibilities < best_compatibilities[1:]
+            remaining_genomes = remaining_genomes[1:]
+            best_species = [species if is_closer else best for best, is_closer in
+                            zip(best_species[1:], closer.tolist())]
+            best_compatibilities = np.where(closer, compatibilities, best_compatibilities[1:])
+
+            self.update_compatibility_threshold()
+
+        for species, species_genomes in new_genomes.items():
+            if len(species_genomes) <= 0:
+                continue
+
+            best_genome = species.get_best_genome()
+            self.remove_species_statistics(species)
+            self.add_genome_order(species, species_genomes, species.add_genomes(species_genomes))
+            self.add_species_statistics(species)
+
+            if self.species_index is not None and species.get_best_genome() is not best_genome:
+                self.species_index.update(species)
+
+    def get_best_compatible_species_batch(self, genomes: list, species_list: list[Species]) -> (list, np.ndarray):
+        '''
+        Same as get_best_compatible_species for many genomes. The genomes that are compared with all species, all
+        genomes without a species index, are compared in one distance matrix
+        :param species_list: Species of get_representative_species
+        :return: Most compatible species of every genome and the compatibility, None and inf if there is none
+        '''
+        best_species = [None] * len(genomes)
+        best_compatibilities = np.full(len(genomes), np.inf)
+
+        if len(species_list) <= 0:
+            return best_species, best_compatibilities
+
+        exact_indices = list(range(len(genomes)))
+
+        if self.species_index is not None:
+            exact_indices = []
+
+            for index, genome in enumerate(genomes):
+                species, compatibility = self.get_best_compatible_species_of(
+                    genome, self.species_index.get_candidates(genome))
+
+                if species is not None:
+                    best_species[index] = species
+                    best_compatibilities[index] = compatibility
+
+                if self.species_index.get_exact_fallback() and (
+                        species is None or compatibility > self.compatibility_threshold):
+                    exact_indices.append(index)
+
+        if len(exact_indices) <= 0:
+            return best_species, best_compatibilities
+
+        compatibilities = GenomeSignature.get_compatibility_matrix(
+            [genomes[index].get_signature() for index in exact_indices],
+            [species.get_best_genome().get_signature() for species in species_list])
+        best_indices = np.argmin(compatibilities, axis=1)
+
+        for index, best_index, compatibility in zip(
+                exact_indices, best_indices.tolist(),
+                compatibilities[np.arange(len(exact_indices)), best_indices].tolist()):
+            best_species[index] = species_list[best_index]
+            best_compatibilities[index] = compatibility
+
+        return best_species, best_compatibilities
+
+    def get_representative_species(self) -> list[Species]:
+        '''
+        :return: Species that new genomes are compared with in add_genomes
+        '''
+        return [species for species in self.species if species.get_size() > 0]
+
+    def update_compatibility_threshold(self):
+        '''
+        Raises the threshold if there are too many species and they are still growing, lowers it if there are too
+        few and they are still shrinking
+        '''
         has_species_size_increased = self.last_checked_species_size < self.get_species_size()
         has_species_size_decreased = self.last_checked_species_size > self.get_species_size()
         self.last_checked_species_size = self.get_species_size()
@@ -84,24 +267,45 @@ class Population:
                 yane_config) and has_species_size_decreased:
             self.compatibility_threshold /= 1.5  # increases the number of species
 
-        if compatibility <= self.compatibility_threshold:
-            species.add_genome(genome)
-            return
-
+    def add_species(self, genome) -> Species:
         species = Species()
-        species.add_genome(genome)
-        self.species.append(species)
+        self.append_species(species)
+        self.add_genome_order(species, [genome], species.add_genome(genome))
+        self.add_species_statistics(species)
+
+        if self.species_index is not None:
+            self.species_index.update(species)
+
+        return species
 
     def get_best_compatible_species(self, genome) -> (Species, float):
-        best_species_compatibility = None
-        best_species = None
-        for species in self.species:
-            species_compatibility = species.get_species_compatibility(genome)
-            if best_species_compatibility is None or species_compatibility < best_species_compatibility:
-                best_species_compatibility = species_compatibility
-                best_species = species
+        '''
+        Only compares with the candidates of the species index if there is one. Falls back to comparing with all
+        species if no candidate is compatible enough and the index allows it
+        '''
+        if self.species_index is not None:
+            species, compatibility = self.get_best_compatible_species_of(genome,
+                                                                         self.species_index.get_candidates(genome))
+
+            if not self.species_index.get_exact_fallback() or (
+                    species is not None and compatibility <= self.compatibility_threshold):
+                return species, compatibility
+
+        return self.get_best_compatible_species_of(genome, self.species)
+
+    @staticmethod
+    def get_best_compatible_species_of(genome, species_list: list[Species]) -> (Species, float):
+        species_list = [species for species in species_list if species.get_size() > 0]
+
+        if len(species_list) <= 0:
+            return None, None
 
-        return best_species, best_species_compatibility
+        # Compares the genome with the best genome of every species at once
+        compatibilities = genome.get_species_compatibilities(
+            [species.get_best_genome() for species in species_list])
+        best_index = int(np.argmin(compatibilities))
+
+        return species_list[best_index], float(compatibilities[best_index])
 
     def get_all_genomes(self):
         genomes = []
@@ -110,11 +314,130 @@ class Population:
 
         return genomes
 
+    def append_species(self, species: Species):
+        self.species.append(species)
+        self.species_numbers[species] = self.next_species_number
+        self.next_species_number += 1
+        self.add_species_statistics(species)
+
+    def pop_genome(self, species: Species):
+        '''
+        Removes the worst genome of the species
+        '''
+        self.remove_species_statistics(species)
+        self.remove_genome_order(species.pop_genome())
+        self.add_species_statistics(species)
+
+    def remove_genome(self, species: Species, genome):
+        self.remove_species_statistics(species)
+        species.remove_genome(genome)
+        self.remove_genome_order(genome)
+        self.add_species_statistics(species)
+
+    def remove_species_statistics(self, species: Species):
+        self.genomes_size -= species.get_size()
+
+        if self.genomes_size <= 0:
+            # Start again from zero, so no rounding errors are left over
+            self.average_fitness_sum = 0.0
+        elif species.get_size() > 0:
+            self.average_fitness_sum -= species.get_average_fitness()
+
+    def add_species_statistics(self, species: Species):
+        '''
+        Counts the species again after it changed. Pushes its best genome, if it is not on the heap yet
+        '''
+        self.genomes_size += species.get_size()
+
+        if species.get_size() <= 0:
+            return
+
+        self.average_fitness_sum += species.get_average_fitness()
+
+        if self.pushed_best_genomes.get(species) is species.get_best_genome():
+            return
+
+        if len(self.best_genomes) > 2 * len(self.species) + 16:
+            self.rebuild_best_genomes()
+        else:
+            self.push_best_genome(species)
+
+    def push_best_genome(self, species: Species):
+        best_genome = species.get_best_genome()
+        self.pushed_best_genomes[species] = best_genome
+        heapq.heappush(self.best_genomes, (-best_genome.get_fitness(), self.species_numbers[species],
+                                           next(self.best_genome_entries), species, best_genome))
+
+    def rebuild_best_genomes(self):
+        self.best_genomes.clear()
+        self.pushed_best_genomes.clear()
+
+        for species in self.species:
+            if species.get_size() > 0:
+                self.push_best_genome(species)
+
+    def is_best_genome_entry(self, entry) -> bool:
+        _, _, _, species, genome = entry
+        return species in self.species_numbers and species.get_size() > 0 and species.get_best_genome() is genome
+
+    def add_genome_order(self, species: Species, genomes: list, removed_genomes: list):
+        '''
+        :param genomes: Genomes that were added to the species
+        :param removed_genomes: Genomes that the species removed afterwards
+        '''
+        for genome in genomes:
+            entry = (-genome.get_fitness(), self.species_numbers[species], genome.get_net_cost(),
+                     next(self.genome_entry_numbers), genome)
+            bisect.insort(self.genome_order, entry)
+            self.genome_entries.setdefault(genome, []).append(entry)
+
+        for genome in removed_genomes:
+            self.remove_genome_order(genome)
+
+    def remove_genome_order(self, genome):
+        entries = self.genome_entries[genome]
+        entry = entries.pop()
+
+        if len(entries) <= 0:
+            del self.genome_entries[genome]
+
+        del self.genome_order[bisect.bisect_left(self.genome_order, entry)]
+
     def remove_species(self, species):
+        for genome in species.get_genomes():
+            self.remove_genome_order(genome)
+
+        self.remove_species_statistics(species)
         self.species.remove(species)
+        del self.species_numbers[species]
+        self.pushed_best_genomes.pop(species, None)
+
+        if self.species_index is not None:
+            self.species_index.remove(species)
 
     def clear(self):
         self.species.clear()
+        self.species_numbers.clear()
+        self.best_genomes.clear()
+        self.pushed_best_genomes.clear()
+        self.genomes_size = 0
+        self.average_fitness_sum = 0.0
+        self.genome_order.clear()
+        self.genome_entries.clear()
+
+        if self.species_index is not None:
+            self.species_index.clear()
 
     def get_top_genomes(self, num_genomes):
-        return sorted(self.get_all_genomes(), key=lambda genome: genome.get_fitness(), reverse=True)[:num_genomes]
+        return [entry[-1] for entry in self.genome_order[:num_genomes]]
+
+    def is_top_genome(self, genome, num_genomes) -> bool:
+        '''
+        Same as genome in get_top_genomes(num_genomes), but without creating the list
+        '''
+        entries = self.genome_entries.get(genome)
+
+        if entries is None:
+            return False
+
+        return bisect.bisect_left(self.genome_order, min(entries)) < num_genomes
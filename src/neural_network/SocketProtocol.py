@@ -0,0 +1,59 @@
+import pickle
+import socket
+import struct
+
+# Every message is a pickled dict with a "type", prefixed by its length as unsigned 4 byte big endian integer.
+# Pickle runs code while loading, so only connect servers and workers that trust each other
+LENGTH_FORMAT = '>I'
+LENGTH_SIZE = struct.calcsize(LENGTH_FORMAT)
+
+
+def send_message(connection: socket.socket, message: dict):
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    connection.sendall(struct.pack(LENGTH_FORMAT, len(data)) + data)
+
+
+def receive_message(connection: socket.socket) -> dict | None:
+    '''
+    :return: The next message or None if the connection was closed
+    '''
+    header = receive_bytes(connection, LENGTH_SIZE)
+
+    if header is None:
+        return None
+
+    data = receive_bytes(connection, struct.unpack(LENGTH_FORMAT, header)[0])
+
+    if data is None:
+        return None
+
+    return pickle.loads(data)
+
+
+def receive_bytes(connection: socket.socket, size) -> bytes | None:
+    chunks = []
+
+    while size > 0:
+        chunk = connection.recv(min(size, 1 << 20))
+
+        if len(chunk) <= 0:
+            return None
+
+        chunks.append(chunk)
+        size -= len(chunk)
+
+    return b''.join(chunks)
+
+
+def create_connection(address) -> socket.socket:
+    '''
+    :param address: Path of a Unix socket or (host, port) of a TCP socket
+    '''
+    if isinstance(address, str):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(address)
+        return connection
+
+    connection = socket.create_connection(address)
+    connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return connection
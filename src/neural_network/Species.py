@@ -1,4 +1,5 @@
 import bisect
+import heapq
 import random
 
 import numpy as np
@@ -12,6 +13,7 @@ class Species:
 
     def __init__(self):
         self.genomes: list[Genome] = []
+        self.fitness_sum = 0.0
         self.average_fitness = None
         self.previous_average_fitness = None
         self.generations_without_improvement = 0
@@ -19,22 +21,66 @@ class Species:
     def get_generations_without_improvement(self):
         return self.generations_without_improvement
 
-    def add_genome(self, genome: Genome):
-        bisect.insort(self.genomes, genome, key=lambda x: (-x.get_fitness(), x.get_net_cost()))
+    @staticmethod
+    def get_genome_order(genome: Genome):
+        '''
+        Genomes are sorted by fitness (descending), then by net cost (ascending)
+        '''
+        return -genome.get_fitness(), genome.get_net_cost()
+
+    def add_genome(self, genome: Genome) -> list[Genome]:
+        '''
+        :return: Genomes that were removed because the species is overpopulated
+        '''
+        bisect.insort(self.genomes, genome, key=Species.get_genome_order)
+        self.fitness_sum += genome.get_fitness()
 
         if self.average_fitness is None:
             self.average_fitness = self.get_average_fitness()
             self.previous_average_fitness = self.average_fitness
 
-        self.prune_overpopulation()
+        removed_genomes = self.prune_overpopulation()
         self.update_average_fitness()
         self.update_generations_without_improvement()
+        return removed_genomes
+
+    def add_genomes(self, genomes: list[Genome]) -> list[Genome]:
+        '''
+        Adds many genomes at once. The genomes are merged into the sorted list and the statistics are updated once
+        :return: Genomes that were removed because the species is overpopulated
+        '''
+        if len(genomes) <= 0:
+            return []
+
+        # Equal genomes keep the order they would get from add_genome
+        self.genomes = list(heapq.merge(self.genomes, sorted(genomes, key=Species.get_genome_order),
+                                        key=Species.get_genome_order))
+        self.fitness_sum += sum(genome.get_fitness() for genome in genomes)
+
+        if self.average_fitness is None:
+            self.average_fitness = self.get_average_fitness()
+            self.previous_average_fitness = self.average_fitness
 
-    def pop_genome(self):
-        self.genomes.pop()
+        removed_genomes = self.prune_overpopulation()
+        self.update_average_fitness()
+        self.update_generations_without_improvement(len(genomes))
+        return removed_genomes
+
+    def pop_genome(self) -> Genome:
+        genome = self.genomes.pop()
+        self.remove_fitness(genome)
+        return genome
 
     def remove_genome(self, genome):
         self.genomes.remove(genome)
+        self.remove_fitness(genome)
+
+    def remove_fitness(self, genome):
+        if self.get_size() <= 0:
+            # Start again from zero, so no rounding errors are left over
+            self.fitness_sum = 0.0
+        else:
+            self.fitness_sum -= genome.get_fitness()
 
     def get_genomes(self):
         return self.genomes
@@ -46,10 +92,7 @@ class Species:
         if self.get_size() <= 0:
             return None
 
-        sum_fitness = 0
-        for genome in self.genomes:
-            sum_fitness += genome.get_fitness()
-        return sum_fitness / self.get_size()
+        return self.fitness_sum / self.get_size()
 
     def get_best_fitness(self):
         if self.get_size() <= 0:
@@ -82,7 +125,10 @@ class Species:
         if new_average_fitness > self.average_fitness:
             self.average_fitness = new_average_fitness
 
-    def update_generations_without_improvement(self):
+    def update_generations_without_improvement(self, genome_size=1):
+        '''
+        :param genome_size: Number of genomes that were added since the last update
+        '''
 
         improved_percentage = (
                 (self.average_fitness - self.previous_average_fitness) / (self.previous_average_fitness + 0.00001))
@@ -90,7 +136,7 @@ class Species:
         if improved_percentage >= YaneConfig.get_improvement_threshold(yane_config):
             self.generations_without_improvement = 0
         else:
-            self.generations_without_improvement += 1 / YaneConfig.get_species_size_reference(yane_config)
+            self.generations_without_improvement += genome_size / YaneConfig.get_species_size_reference(yane_config)
 
     def get_random_genome(self) -> Genome:
         fraction = YaneConfig.get_reproduction_fraction(yane_config)
@@ -102,9 +148,13 @@ class Species:
 
         return random.choice(self.genomes[:reproduction_limit])
 
-    def prune_overpopulation(self):
+    def prune_overpopulation(self) -> list[Genome]:
+        removed_genomes = []
+
         while self.get_size() > YaneConfig.get_species_size_reference(yane_config):
-            self.pop_genome()
+            removed_genomes.append(self.pop_genome())
+
+        return removed_genomes
 
     def get_upper_genomes(self):
         fraction = YaneConfig.get_reproduction_fraction(yane_config)
@@ -0,0 +1,140 @@
+import numpy as np
+
+from src.neural_network.Genome import Genome
+from src.neural_network.Species import Species
+
+# Mersenne prime for the universal hash functions. Every value is reduced below it before a multiplication, so no
+# product overflows int64
+PRIME = 2 ** 31 - 1
+
+
+class SpeciesIndex:
+    '''
+    Finds the species that are probably compatible to a genome without comparing it to every species.
+
+    The gene ids of the best genome of every species are reduced to a MinHash signature, which is split into
+    bands. Species that share at least one band with a genome are candidates. Genomes with many common connections
+    share a band with a high probability, so the most compatible species is usually a candidate. The candidates
+    are compared exactly afterwards, which also takes the weight difference into account.
+    '''
+
+    def __init__(self, band_size=16, row_size=8, seed=0, exact_fallback=True):
+        '''
+        :param band_size: Number of bands. More bands find more candidates
+        :param row_size: Number of hashes per band. More rows find fewer, but more similar candidates
+        :param seed: Seed of the hash functions
+        :param exact_fallback: If true, all species are compared if no candidate is compatible. Never creates a new
+                species that the exact scan would not create, but is only faster for genomes that are compatible to
+                an existing species. If false, genomes without candidates always get a new species, no matter how
+                high the compatibility threshold of the population is
+        '''
+        random_generator = np.random.default_rng(seed)
+
+        self.exact_fallback = exact_fallback
+        self.band_size = band_size
+        self.row_size = row_size
+        self.hash_factors = random_generator.integers(1, PRIME, band_size * row_size, dtype=np.int64)
+        self.hash_offsets = random_generator.integers(0, PRIME, band_size * row_size, dtype=np.int64)
+        self.buckets: list[dict[bytes, set[Species]]] = [{} for _ in range(band_size)]
+
+        # Representative, band keys and insertion number of every indexed species
+        self.entries: dict[Species, tuple[Genome, list[bytes], int]] = {}
+        self.next_entry_number = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, species):
+        return species in self.entries
+
+    def get_exact_fallback(self):
+        return self.exact_fallback
+
+    def set_exact_fallback(self, exact_fallback):
+        self.exact_fallback = exact_fallback
+
+    def get_min_hashes(self, genome: Genome) -> np.ndarray:
+        '''
+        MinHash of all node and connection ids. Nodes and connections are counted both by the compatibility, so
+        both are hashed. Node ids are even and connection ids are odd to keep them apart. Innovation ids are
+        above 2 ** 62, so they are reduced before they are doubled
+        '''
+        signature = genome.get_signature()
+        node_ids = signature.get_node_ids() % PRIME * 2
+        connection_ids = signature.get_connection_ids() % PRIME * 2 + 1
+        gene_ids = np.concatenate((node_ids, connection_ids)) % PRIME
+
+        if len(gene_ids) <= 0:
+            return np.full(len(self.hash_factors), PRIME, dtype=np.int64)
+
+        hashes = (np.outer(gene_ids, self.hash_factors) + self.hash_offsets) % PRIME
+        return hashes.min(axis=0)
+
+    def get_band_keys(self, genome: Genome) -> list[bytes]:
+        bands = self.get_min_hashes(genome).reshape(self.band_size, self.row_size)
+        return [band.tobytes() for band in bands]
+
+    def update(self, species: Species):
+        '''
+        Indexes the species with its current best genome. Has to be called after the best genome changed
+        '''
+        entry = self.entries.get(species)
+        self.remove(species)
+
+        representative = species.get_best_genome()
+
+        if representative is None:
+            return
+
+        # Keep the insertion number, so the candidates are always returned in the same order
+        if entry is None:
+            entry_number = self.next_entry_number
+            self.next_entry_number += 1
+        else:
+            entry_number = entry[2]
+
+        band_keys = self.get_band_keys(representative)
+
+        for buckets, band_key in zip(self.buckets, band_keys):
+            buckets.setdefault(band_key, set()).add(species)
+
+        self.entries[species] = (representative, band_keys, entry_number)
+
+    def remove(self, species: Species):
+        entry = self.entries.pop(species, None)
+
+        if entry is None:
+            return
+
+        for buckets, band_key in zip(self.buckets, entry[1]):
+            bucket = buckets[band_key]
+            bucket.discard(species)
+
+            if len(bucket) <= 0:
+                del buckets[band_key]
+
+    def clear(self):
+        self.entries.clear()
+
+        for buckets in self.buckets:
+            buckets.clear()
+
+    def get_candidates(self, genome: Genome) -> list[Species]:
+        '''
+        :return: Species that share at least one band with the genome, in the order they were indexed
+        '''
+        candidates = set()
+
+        for buckets, band_key in zip(self.buckets, self.get_band_keys(genome)):
+            bucket = buckets.get(band_key)
+
+            if bucket is not None:
+                candidates |= bucket
+
+        # The best genome of a species can change without the population noticing, e.g. if it is removed
+        for species in list(candidates):
+            if species.get_best_genome() is not self.entries[species][0]:
+                self.update(species)
+
+        return sorted((species for species in candidates if species in self.entries),
+                      key=lambda species: self.entries[species][2])
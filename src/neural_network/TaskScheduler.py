@@ -0,0 +1,221 @@
+import itertools
+import time
+from collections import deque
+
+REPRODUCE = "reproduce"
+MUTATE = "mutate"
+EVALUATE = "evaluate"
+SPECIATE = "speciate"
+TASK_TYPES = [REPRODUCE, MUTATE, EVALUATE, SPECIATE]
+
+
+class WorkerInfo:
+    def __init__(self, capabilities):
+        self.capabilities = set(capabilities)
+        # Measured tasks per second of every task type
+        self.throughputs = {}
+        # Leased task ids and the time they were handed out
+        self.leases = {}
+
+
+class TaskScheduler:
+    '''
+    Queues typed tasks and hands them out to the workers that registered the capability for the task type.
+
+    Every worker gets the task type that it does fastest compared to the other capable workers. Slower workers get
+    smaller batches and leave the last batch of a queue to the fastest worker, so a slow worker does not hold up the
+    end of a stage. Workers without a measured throughput count as fastest until their first results arrive.
+    Handed out tasks are leased and go back to the front of their queue when the lease expires or the worker is
+    removed. Not thread safe.
+    '''
+
+    def __init__(self, lease_duration=60.0, smoothing=0.3):
+        '''
+        :param lease_duration: Seconds until a task that was handed out is handed out again
+        :param smoothing: Weight of the newest measurement in the throughput average
+        '''
+        self.lease_duration = lease_duration
+        self.smoothing = smoothing
+        self.task_ids = itertools.count()
+        self.workers: dict[int, WorkerInfo] = {}
+        self.queues = {task_type: deque() for task_type in TASK_TYPES}
+        # task_id -> (task_type, payload) of every task without result
+        self.tasks = {}
+        # task_id -> (worker_id, deadline)
+        self.leases = {}
+
+    def register_worker(self, worker_id, capabilities):
+        self.workers[worker_id] = WorkerInfo(capabilities)
+
+    def remove_worker(self, worker_id):
+        '''
+        Queues the leased tasks of the worker again
+        '''
+        worker = self.workers.pop(worker_id, None)
+
+        if worker is None:
+            return
+
+        for task_id in worker.leases:
+            self.release_task(task_id)
+
+    def get_throughput(self, worker_id, task_type):
+        '''
+        :return: Measured tasks per second or None if the worker did not finish a task of the type yet
+        '''
+        return self.workers[worker_id].throughputs.get(task_type)
+
+    def has_capable_worker(self, task_type):
+        return any(task_type in worker.capabilities for worker in self.workers.values())
+
+    def add_tasks(self, task_type, payloads) -> list:
+        '''
+        :return: Task id of every payload
+        '''
+        task_ids = []
+
+        for payload in payloads:
+            task_id = next(self.task_ids)
+            self.tasks[task_id] = (task_type, payload)
+            self.queues[task_type].append(task_id)
+            task_ids.append(task_id)
+
+        return task_ids
+
+    def take_queued_tasks(self, task_type) -> list:
+        '''
+        Removes all queued tasks of the type, e.g. to run them without workers
+        :return: List of (task_id, payload)
+        '''
+        tasks = []
+
+        while len(self.queues[task_type]) > 0:
+            task_id = self.queues[task_type].popleft()
+
+            if task_id in self.tasks and task_id not in self.leases:
+                tasks.append((task_id, self.tasks[task_id][1]))
+
+        return tasks
+
+    def take_tasks(self, worker_id, size) -> (str, list):
+        '''
+        Leases up to size tasks of one type to the worker
+        :return: Task type and list of (task_id, payload). The list is empty if there is nothing to do
+        '''
+        self.release_expired_leases()
+        worker = self.workers[worker_id]
+        best_type = None
+        best_speed = 0
+
+        for task_type in TASK_TYPES:
+            if task_type not in worker.capabilities or not self.has_queued_tasks(task_type):
+                continue
+
+            speed = self.get_relative_speed(worker_id, task_type)
+
+            # The last batch of a queue is left to the faster workers
+            if speed < 1 and len(self.queues[task_type]) <= size:
+                continue
+
+            if speed > best_speed:
+                best_type = task_type
+                best_speed = speed
+
+        if best_type is None:
+            return None, []
+
+        batch_size = max(1, int(round(size * best_speed)))
+        now = time.monotonic()
+        tasks = []
+
+        while len(self.queues[best_type]) > 0 and len(tasks) < batch_size:
+            task_id = self.queues[best_type].popleft()
+
+            if task_id not in self.tasks or task_id in self.leases:
+                continue
+
+            self.leases[task_id] = (worker_id, now + self.lease_duration)
+            worker.leases[task_id] = now
+            tasks.append((task_id, self.tasks[task_id][1]))
+
+        return best_type, tasks
+
+    def complete_tasks(self, worker_id, task_type, results) -> dict:
+        '''
+        Takes the results of the worker and updates its throughput. Results of tasks that already have a result are
+        ignored
+        :param results: List of (task_id, result)
+        :return: task_id -> result of the new results
+        '''
+        now = time.monotonic()
+        worker = self.workers.get(worker_id)
+        completed = {}
+        start_time = None
+
+        for task_id, result in results:
+            if worker is not None and task_id in worker.leases:
+                lease_time = worker.leases.pop(task_id)
+                start_time = lease_time if start_time is None else min(start_time, lease_time)
+
+            if task_id not in self.tasks:
+                continue
+
+            del self.tasks[task_id]
+            self.leases.pop(task_id, None)
+            completed[task_id] = result
+
+        if worker is not None and start_time is not None and len(results) > 0:
+            throughput = len(results) / max(now - start_time, 1e-6)
+            old_throughput = worker.throughputs.get(task_type)
+
+            if old_throughput is not None:
+                throughput = self.smoothing * throughput + (1 - self.smoothing) * old_throughput
+
+            worker.throughputs[task_type] = throughput
+
+        return completed
+
+    def cancel_tasks(self, task_ids):
+        for task_id in task_ids:
+            self.tasks.pop(task_id, None)
+            self.leases.pop(task_id, None)
+
+    def has_queued_tasks(self, task_type):
+        queue = self.queues[task_type]
+
+        # Queues can hold ids of finished or leased tasks, they are skipped when tasks are taken
+        while len(queue) > 0 and (queue[0] not in self.tasks or queue[0] in self.leases):
+            queue.popleft()
+
+        return len(queue) > 0
+
+    def get_relative_speed(self, worker_id, task_type):
+        '''
+        :return: Throughput of the worker divided by the throughput of the fastest capable worker, 1 if unknown
+        '''
+        throughput = self.get_throughput(worker_id, task_type)
+
+        if throughput is None:
+            return 1
+
+        fastest = max(worker.throughputs.get(task_type, 0) for worker in self.workers.values()
+                      if task_type in worker.capabilities)
+
+        return throughput / fastest if fastest > 0 else 1
+
+    def release_task(self, task_id):
+        lease = self.leases.pop(task_id, None)
+
+        if lease is not None and task_id in self.tasks:
+            self.queues[self.tasks[task_id][0]].appendleft(task_id)
+
+    def release_expired_leases(self):
+        now = time.monotonic()
+
+        for task_id in [task_id for task_id, (_, deadline) in self.leases.items() if deadline <= now]:
+            worker = self.workers.get(self.leases[task_id][0])
+
+            if worker is not None:
+                worker.leases.pop(task_id, None)
+
+            self.release_task(task_id)
@@ -16,7 +16,26 @@ def get_random_weight_shift(json_config):
     return weight_shift
 
 
-def get_random_activation_function(json_config):
+def get_weight_shift_min(json_config):
+    return json_config["weight_shift"][0]
+
+
+def get_weight_shift_max(json_config):
+    return json_config["weight_shift"][1]
+
+
+def get_activation_functions(json_config):
+    return json_config["activation_functions"]
+
+
+def get_random_activation_function(json_config, random_generator=None):
+    '''
+    :param random_generator: numpy random generator to draw from, the random module is used if None
+    '''
+    if random_generator is not None:
+        activation_functions = json_config["activation_functions"]
+        return activation_functions[random_generator.integers(len(activation_functions))]
+
     return random.choice(json_config["activation_functions"])
 
 
@@ -24,7 +43,14 @@ def get_binary_threshold(json_config):
     return json_config["binary_threshold"]
 
 
-def get_random_mutation_weight(json_config):
+def get_random_mutation_weight(json_config, random_generator=None):
+    '''
+    :param random_generator: numpy random generator to draw from, the random module is used if None
+    '''
+    if random_generator is not None:
+        return float(random_generator.uniform(get_mutation_weight_min(json_config),
+                                              get_mutation_weight_max(json_config)))
+
     return random.uniform(get_mutation_weight_min(json_config), get_mutation_weight_max(json_config))
 
 
@@ -88,6 +114,22 @@ def get_elitism(json_config):
     return json_config["elitism"]
 
 
+def get_dag_only(json_config):
+    return json_config.get("dag_only", False)
+
+
+def get_compact_genomes(json_config):
+    return json_config.get("compact_genomes", False)
+
+
+def get_crossover_fraction(json_config):
+    return json_config.get("crossover_fraction", 0.25)
+
+
+def get_species_index(json_config):
+    return json_config.get("species_index", False)
+
+
 config_name = 'yane_config.json'
 
 
@@ -116,7 +158,13 @@ def create_default_json_config():
         # The maximum amount of times a genome is allowed to make bad genomes in a row
         "max_bad_reproductions_in_row": 10,
         "improvement_threshold": 0.01,  # The minimum improvement that is required to consider a species improved
-        "elitism": 5  # The amount of genomes that will be protected from selection
+        "elitism": 5,  # The amount of genomes that will be protected from selection
+        "dag_only": False,  # if true, connections that would create a cycle are rejected
+        "compact_genomes": False,  # if true, genomes store their genes in numpy arrays (less memory, faster copy)
+        "crossover_fraction": 0.25,  # The fraction of the offspring that is created by crossover of two genomes
+        # if true, new genomes are only compared with the species that a locality sensitive hash index suggests.
+        # Only useful for many species (max_species_per_population in the hundreds)
+        "species_index": False
     }
     with open(config_name, 'w') as json_config_file:
         json.dump(json_config, json_config_file)
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from src.neural_network.CompactGenome import CompactGenome
+from src.neural_network.Node import Node
+
+
+@pytest.fixture(autouse=True)
+def input_positions(monkeypatch):
+    # The input positions of new input nodes are counted per process
+    monkeypatch.setattr(Node, "global_input_pos", 0)
+
+
+def test_tick_adds_the_input_nodes_to_the_genes():
+    genome = CompactGenome(random_generator=np.random.default_rng(0))
+    genome.set_number_of_outputs(2)
+
+    genome.tick([0.1, 0.2, 0.3])
+
+    assert genome.get_input_size() == 3
+
+
+def test_tick_after_mutate():
+    genome = CompactGenome(random_generator=np.random.default_rng(0))
+    genome.set_number_of_outputs(2)
+    genome.tick([0.1, 0.2, 0.3])
+
+    for _ in range(20):
+        genome.mutate()
+        outputs = genome.tick([0.1, 0.2, 0.3])
+
+        assert len(outputs) == 2
+        assert genome.get_input_size() == 3
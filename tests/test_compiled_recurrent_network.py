@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from src.examples.benchmark.genomes import create_genomes
+from src.neural_network.Genome import Genome
+from src.neural_network.InferenceHandle import InferenceHandle
+from src.neural_network.Node import Node
+
+stream_size = 4
+tick_size = 25
+
+
+@pytest.fixture(autouse=True)
+def input_positions(monkeypatch):
+    # The input positions of new input nodes are counted per process
+    monkeypatch.setattr(Node, "global_input_pos", 0)
+
+
+def clear_state(genome):
+    neural_network = genome.get_brain()
+
+    for node in neural_network.get_all_nodes():
+        node.set_value(0.0)
+
+    neural_network.next_trigger_nodes = []
+
+
+def test_tick_batch_matches_serial_tick():
+    rng = np.random.default_rng(1)
+    data = rng.normal(size=(tick_size, stream_size, 3))
+    # Some ticks without new input data and one stream is reset in the middle
+    has_data = [tick % 4 != 3 for tick in range(tick_size)]
+    reset_tick = tick_size // 2
+    reset_mask = np.array([False, True, False, False])
+
+    for genome in create_genomes(Genome, 20, 3, 2, mutations=5):
+        serial_outputs = np.zeros((tick_size, stream_size, 2))
+
+        for stream in range(stream_size):
+            clear_state(genome)
+
+            for tick in range(tick_size):
+                if tick == reset_tick and reset_mask[stream]:
+                    clear_state(genome)
+
+                serial_outputs[tick, stream] = genome.tick(data[tick, stream].tolist() if has_data[tick] else None)
+
+        for tick in range(tick_size):
+            outputs = genome.tick_batch(data[tick] if has_data[tick] else None,
+                                        reset_mask if tick == reset_tick else None)
+
+            assert outputs == pytest.approx(serial_outputs[tick], rel=1e-9, abs=1e-9)
+
+
+@pytest.mark.parametrize("dense_node_limit", [256, 0])
+def test_inference_handle_tick_matches_tick(monkeypatch, dense_node_limit):
+    monkeypatch.setattr(InferenceHandle, "dense_node_limit", dense_node_limit)
+    rng = np.random.default_rng(1)
+    data = rng.normal(size=(tick_size, 3))
+
+    for genome in create_genomes(Genome, 20, 3, 2, mutations=5):
+        # The handle starts with the current state of the neural network
+        genome.tick(data[0].tolist())
+        handle = genome.compile_for_latency()
+
+        for tick in range(tick_size):
+            tick_data = data[tick] if tick % 4 != 3 else None
+            outputs = genome.tick(tick_data.tolist() if tick_data is not None else None)
+
+            assert handle.tick(tick_data) == pytest.approx(outputs, rel=1e-9, abs=1e-9)
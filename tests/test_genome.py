@@ -0,0 +1,54 @@
+import random
+
+import numpy as np
+import pytest
+
+from src.neural_network.CompactGenome import CompactGenome
+from src.neural_network.Genome import Genome
+from src.neural_network.NeuroEvolution import NeuroEvolution
+from src.neural_network.Node import Node
+
+
+def create_mutated_genome(genome_class, random_seed, monkeypatch):
+    # The ids of new input and output nodes are counted per process
+    monkeypatch.setattr(Node, "global_node_id", 0)
+    monkeypatch.setattr(Node, "global_input_pos", 0)
+
+    # The random module must not change the mutations of a seeded genome
+    random.seed(random_seed)
+    genome = genome_class(random_generator=np.random.default_rng(3))
+    genome.set_number_of_outputs(2)
+    genome.add_missing_input_nodes(3)
+
+    for _ in range(100):
+        genome.mutate()
+
+    return genome
+
+
+@pytest.mark.parametrize("genome_class", [Genome, CompactGenome])
+def test_seeded_mutations_are_reproducible(genome_class, monkeypatch):
+    genome1 = create_mutated_genome(genome_class, 1, monkeypatch)
+    genome2 = create_mutated_genome(genome_class, 2, monkeypatch)
+
+    signature1 = genome1.get_signature()
+    signature2 = genome2.get_signature()
+
+    # Hidden nodes were added
+    assert len(signature1.get_node_ids()) > 5
+
+    assert np.array_equal(signature1.get_node_ids(), signature2.get_node_ids())
+    assert np.array_equal(signature1.get_connection_ids(), signature2.get_connection_ids())
+    assert np.array_equal(genome1.get_weights()[0], genome2.get_weights()[0])
+    assert np.array_equal(genome1.get_activation_codes(), genome2.get_activation_codes())
+    assert genome1.mutation_rates == genome2.mutation_rates
+    assert genome1.mutation_num == genome2.mutation_num
+
+
+def test_set_seed_keeps_the_random_module_state():
+    random.seed(0)
+    random_state = random.getstate()
+
+    NeuroEvolution().set_seed(1)
+
+    assert random.getstate() == random_state
@@ -0,0 +1,164 @@
+import random
+
+import pytest
+
+from src.examples.benchmark.genomes import create_genomes, create_query
+from src.neural_network.CompactGenome import CompactGenome
+from src.neural_network.Population import Population
+from src.neural_network.SpeciesIndex import SpeciesIndex
+
+compatibility_threshold = 5
+
+# Bound of the index compared with the exact scan over all species, for the compatible queries
+min_same_species_fraction = 0.95
+max_compatibility_gap = 1.0
+
+
+@pytest.fixture(scope="module")
+def species_queries():
+    genomes = create_genomes(CompactGenome, 600, 8, 2)
+    population = Population()
+    population.compatibility_threshold = compatibility_threshold
+
+    representatives = random.sample(genomes, 100)
+
+    for genome in representatives:
+        genome.set_fitness(0)
+        genome.set_net_cost(genome.calculate_net_cost())
+        population.add_species(genome)
+
+    # Like in training, most new genomes are children of a species, some are not
+    query_genomes = [create_query(representatives if random.random() < 0.8 else genomes) for _ in range(300)]
+    exact_results = [population.get_best_compatible_species_of(genome, population.get_species())
+                     for genome in query_genomes]
+
+    return population, query_genomes, exact_results
+
+
+def test_index_picks_the_species_of_the_exact_scan(species_queries):
+    population, query_genomes, exact_results = species_queries
+    population.set_species_index(SpeciesIndex())
+
+    same_species = 0
+    compatible = 0
+
+    for genome, (exact_species, exact_compatibility) in zip(query_genomes, exact_results):
+        index_species, index_compatibility = population.get_best_compatible_species(genome)
+
+        # Queries that are not compatible to any species create a new species with both
+        if exact_compatibility > compatibility_threshold:
+            continue
+
+        compatible += 1
+        same_species += index_species is exact_species
+
+        # The fallback never misses a compatible species, it can only take a slightly less compatible one
+        assert index_species is not None
+        assert index_compatibility <= compatibility_threshold
+        assert index_compatibility - exact_compatibility <= max_compatibility_gap
+
+    assert compatible > 0
+    assert same_species / compatible >= min_same_species_fraction
+
+
+def test_index_without_fallback_only_returns_candidates(species_queries):
+    population, query_genomes, _ = species_queries
+    species_index = SpeciesIndex(exact_fallback=False)
+    population.set_species_index(species_index)
+
+    for genome in query_genomes[:50]:
+        index_species, _ = population.get_best_compatible_species(genome)
+        assert index_species is None or index_species in species_index.get_candidates(genome)
+
+
+def test_copy_of_a_representative_finds_its_species(species_queries):
+    population, _, _ = species_queries
+    population.set_species_index(SpeciesIndex())
+
+    for species in population.get_species()[:20]:
+        index_species, compatibility = population.get_best_compatible_species(species.get_best_genome().copy())
+
+        assert compatibility == pytest.approx(0)
+        assert index_species.get_best_genome().get_species_compatibility(species.get_best_genome()) == \
+               pytest.approx(0)
+
+
+def create_batch_population(population, species_index):
+    batch_population = Population()
+    batch_population.compatibility_threshold = compatibility_threshold
+    batch_population.set_species_index(species_index)
+
+    for genome in create_batch_genomes([species.get_best_genome() for species in population.get_species()]):
+        batch_population.add_species(genome)
+
+    return batch_population
+
+
+def create_batch_genomes(query_genomes):
+    genomes = [genome.copy() for genome in query_genomes]
+
+    for genome in genomes:
+        genome.set_fitness(0)
+        genome.set_net_cost(genome.calculate_net_cost())
+
+    return genomes
+
+
+def test_add_genomes_looks_up_the_candidates_of_the_index(species_queries, monkeypatch):
+    population, query_genomes, _ = species_queries
+    species_index = SpeciesIndex()
+    batch_population = create_batch_population(population, species_index)
+    genomes = create_batch_genomes(query_genomes[:100])
+
+    looked_up_genomes = []
+    get_candidates = species_index.get_candidates
+
+    def get_recorded_candidates(genome):
+        looked_up_genomes.append(genome)
+        return get_candidates(genome)
+
+    monkeypatch.setattr(species_index, "get_candidates", get_recorded_candidates)
+    batch_population.add_genomes(genomes)
+
+    assert all(any(genome is looked_up for looked_up in looked_up_genomes) for genome in genomes)
+
+
+def get_species_positions(population, genomes):
+    '''
+    :return: Position of the species of every genome in the population, None if it was removed again
+    '''
+    positions = {}
+
+    for position, species in enumerate(population.get_species()):
+        for genome in species.get_genomes():
+            positions[id(genome)] = position
+
+    return [positions.get(id(genome)) for genome in genomes]
+
+
+def test_add_genomes_with_index_finds_the_species_of_the_exact_scan(species_queries):
+    population, query_genomes, _ = species_queries
+    exact_population = create_batch_population(population, None)
+    index_population = create_batch_population(population, SpeciesIndex())
+    exact_genomes = create_batch_genomes(query_genomes)
+    index_genomes = create_batch_genomes(query_genomes)
+
+    exact_population.add_genomes(exact_genomes)
+    index_population.add_genomes(index_genomes)
+
+    # Only the existing species have the same position in both populations, new species can be created in another
+    # order
+    species_size = population.get_species_size()
+    same_species = 0
+    compatible = 0
+
+    for exact_position, index_position in zip(get_species_positions(exact_population, exact_genomes),
+                                              get_species_positions(index_population, index_genomes)):
+        if exact_position is None or exact_position >= species_size:
+            continue
+
+        compatible += 1
+        same_species += index_position == exact_position
+
+    assert compatible > 0
+    assert same_species / compatible >= min_same_species_fraction